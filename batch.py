@@ -0,0 +1,380 @@
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Optional, Callable, Dict, Iterable, List
+from downloader import Downloader, TRANSFER_BROWSER, adopt_partial_download
+from expanders import CollectionExpander, Expansion
+from journal import JobJournal
+from resolver import SITE_URL
+from driver_pool import DriverPool
+from metrics import metrics
+from postprocess import PostProcessor
+from scheduler import JobQueue, PRIORITY_BULK, PRIORITY_INTERACTIVE
+from spotify_url import is_valid_spotify_track_url, extract_track_id
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+FINISHED_STATES = (DONE, FAILED, SKIPPED)
+
+RESOLVE = "resolving"
+TRANSFER = "transferring"
+FINALIZE = "finalizing"
+EXPAND = "expanding"
+
+
+def parse_url_list(text: str) -> List[str]:
+    urls = []
+    seen = set()
+    for token in re.split(r"[\s,;]+", text):
+        token = token.strip()
+        if token and token not in seen:
+            seen.add(token)
+            urls.append(token)
+    return urls
+
+
+def read_url_file(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if not line.lstrip().startswith("#")]
+    return parse_url_list("\n".join(lines))
+
+
+class DownloadJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, url: str, download_directory: str, key: Optional[str] = None,
+                 priority: int = PRIORITY_BULK):
+        self.id = next(self._ids)
+        self.key = key or uuid.uuid4().hex
+        self.priority = priority
+        self.url = url
+        self.track_id = extract_track_id(url)
+        self.download_directory = download_directory
+        self.state = QUEUED
+        self.progress = 0.0
+        self.message = "Queued"
+        self.error = None
+        self.stage = None
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "url": self.url,
+            "state": self.state,
+            "progress": self.progress,
+            "message": self.message,
+            "stage": self.stage,
+            "priority": self.priority,
+            "error": self.error,
+        }
+
+
+class DownloadQueue:
+    def __init__(self,
+                 download_directory: str,
+                 workers: int = 2,
+                 pool: Optional[DriverPool] = None,
+                 progress_callback: Optional[Callable] = None,
+                 transfer_mode: str = TRANSFER_BROWSER,
+                 site_url: str = SITE_URL,
+                 postprocessor: Optional[PostProcessor] = None,
+                 journal: Optional[JobJournal] = None,
+                 interactive_workers: int = 1):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.download_directory = download_directory
+        self.workers = workers
+        self.interactive_workers = interactive_workers
+        self.progress_callback = progress_callback
+        self.transfer_mode = transfer_mode
+        self.site_url = site_url
+        self.journal = journal
+
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else DriverPool(max_size=workers + interactive_workers)
+        self._owns_postprocessor = postprocessor is None
+        self.postprocessor = postprocessor if postprocessor is not None else PostProcessor()
+
+        self._queue = JobQueue()
+        self._jobs: List[DownloadJob] = []
+        self._expansions: List[Expansion] = []
+        self._active: Dict[str, DownloadJob] = {}
+        self._counts = {state: 0 for state in (QUEUED, RUNNING, DONE, FAILED, SKIPPED)}
+        self._progress_sum = 0.0
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def submit(self, url: str, download_directory: str = None, key: Optional[str] = None,
+               priority: int = PRIORITY_BULK) -> DownloadJob:
+        if not is_valid_spotify_track_url(url):
+            raise ValueError(f"Invalid Spotify track URL: {url}")
+        job = DownloadJob(url, download_directory or self.download_directory, key, priority)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Download queue is closed")
+            duplicate = self._active.get(job.track_id)
+            if duplicate is not None:
+                return duplicate
+            self._active[job.track_id] = job
+            self._jobs.append(job)
+            self._counts[QUEUED] += 1
+        self._journal(job)
+        self._ensure_workers()
+        self._queue.put(job, job.priority)
+        self._emit(job, {"message": job.message, "progress": 0.0, "status": "info"})
+        return job
+
+    def submit_many(self, urls: Iterable[str], download_directory: str = None,
+                    priority: int = PRIORITY_BULK) -> List[DownloadJob]:
+        return [self.submit(url, download_directory, priority=priority) for url in urls]
+
+    def expand(self, url: str, download_directory: str = None,
+               expander: Optional[CollectionExpander] = None) -> Expansion:
+        return self._expand(url, download_directory or self.download_directory, expander)
+
+    def _expand(self, url: str, download_directory: str, expander: Optional[CollectionExpander] = None,
+                key: Optional[str] = None, cursor: int = 0, resumed: Optional[dict] = None) -> Expansion:
+        resumed = resumed or {}
+        expansion = Expansion(url,
+                              lambda track: resumed.get(track) or self.submit(track, download_directory),
+                              expander=expander,
+                              on_update=lambda expansion: self._on_expansion_update(expansion, download_directory),
+                              key=key,
+                              cursor=cursor)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Download queue is closed")
+            self._expansions.append(expansion)
+        self._journal_expansion(expansion, download_directory)
+        return expansion.start()
+
+    def resume(self) -> List[DownloadJob]:
+        if self.journal is None:
+            return []
+        jobs, expansions = [], []
+        for record in self.journal.unfinished():
+            if record.get("state") == EXPAND:
+                expansions.append(record)
+                continue
+            directory = record.get("directory") or self.download_directory
+            try:
+                os.makedirs(directory, exist_ok=True)
+                part_path = adopt_partial_download(directory, record["key"], extract_track_id(record["url"]))
+                job = self.submit(record["url"], directory, key=record["key"])
+                if job.key != record["key"]:
+                    if part_path is not None:
+                        os.remove(part_path)
+                    self.journal.record(record["key"], record["url"], directory, SKIPPED, finished=True)
+                    continue
+                jobs.append(job)
+            except (ValueError, OSError) as e:
+                self.journal.record(record["key"], record["url"], directory, FAILED, finished=True, error=str(e))
+        resumed = {job.url: job for job in jobs}
+        for record in expansions:
+            directory = record.get("directory") or self.download_directory
+            try:
+                os.makedirs(directory, exist_ok=True)
+                self._expand(record["url"], directory, key=record["key"], cursor=record.get("cursor") or 0,
+                             resumed=resumed)
+            except (ValueError, OSError) as e:
+                self.journal.record(record["key"], record["url"], directory, FAILED, finished=True, error=str(e))
+        return jobs
+
+    @property
+    def jobs(self) -> List[DownloadJob]:
+        with self._lock:
+            return list(self._jobs)
+
+    @property
+    def expansions(self) -> List[Expansion]:
+        with self._lock:
+            return list(self._expansions)
+
+    def summary(self) -> dict:
+        with self._lock:
+            total = len(self._jobs)
+            progress = self._progress_sum / total if total else 0.0
+            expanding = sum(1 for expansion in self._expansions if not expansion.finished)
+            return dict(self._counts, total=total, progress=progress, expanding=expanding)
+
+    def join(self):
+        with self._lock:
+            expansions = list(self._expansions)
+        for expansion in expansions:
+            expansion.wait()
+        self._queue.join()
+
+    def clear_finished(self):
+        with self._lock:
+            self._jobs = [job for job in self._jobs if not job.finished]
+            self._expansions = [expansion for expansion in self._expansions if not expansion.finished]
+            for state in FINISHED_STATES:
+                self._counts[state] = 0
+            self._progress_sum = sum(job.progress for job in self._jobs)
+
+    def close(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        self._queue.close(discard=not wait)
+        if wait:
+            for thread in threads:
+                thread.join()
+        if self._owns_postprocessor and wait:
+            self.postprocessor.close()
+        if self._owns_pool:
+            self.pool.close()
+
+    def _ensure_workers(self):
+        with self._lock:
+            while len(self._threads) < self.workers + self.interactive_workers:
+                lane = PRIORITY_INTERACTIVE if len(self._threads) >= self.workers else None
+                thread = threading.Thread(target=self._worker_loop, args=(lane,), daemon=True)
+                self._threads.append(thread)
+                thread.start()
+
+    def _worker_loop(self, max_priority: Optional[int] = None):
+        while True:
+            job = self._queue.get(max_priority)
+            if job is None:
+                return
+            self._run_job(job)
+
+    @staticmethod
+    def _contribution(job: DownloadJob) -> float:
+        return 1.0 if job.finished else job.progress
+
+    def _update_job(self, job: DownloadJob, state: Optional[str] = None, progress: Optional[float] = None):
+        with self._lock:
+            before = self._contribution(job)
+            if state is not None and state != job.state:
+                self._counts[job.state] -= 1
+                self._counts[state] += 1
+                job.state = state
+            if progress is not None:
+                job.progress = progress
+            self._progress_sum += self._contribution(job) - before
+
+    def _start_job(self, job: DownloadJob) -> Downloader:
+        self._update_job(job, state=RUNNING)
+        job.started_at = time.time()
+        return Downloader(job.download_directory,
+                          progress_callback=lambda info: self._on_job_progress(job, info),
+                          pool=self.pool,
+                          transfer_mode=self.transfer_mode,
+                          site_url=self.site_url,
+                          job_id=job.id,
+                          job_key=job.key,
+                          priority=job.priority)
+
+    def _run_job(self, job: DownloadJob):
+        downloader = self._start_job(job)
+        started = time.perf_counter()
+        try:
+            self._set_stage(job, RESOLVE)
+            download_url = downloader.resolve_download(job.url)
+            if download_url is None:
+                ok = downloader.skipped
+            else:
+                self._set_stage(job, TRANSFER)
+                ok = downloader.start_transfer(download_url) and downloader.await_download()
+            if ok and not downloader.skipped:
+                self._set_stage(job, FINALIZE)
+                self._finalize_later(job, downloader, started)
+                return
+        except Exception as e:
+            ok = False
+            job.error = str(e)
+        self._complete_job(job, downloader, started, ok)
+
+    def _finalize_later(self, job: DownloadJob, downloader: Downloader, started: float):
+        downloader.finalize_later(self.postprocessor,
+                                  lambda future: self._on_finalized(job, downloader, started, future))
+
+    def _on_finalized(self, job: DownloadJob, downloader: Downloader, started: float, future):
+        error = future.exception()
+        if error is not None:
+            job.error = str(error)
+        self._complete_job(job, downloader, started, error is None)
+
+    def _complete_job(self, job: DownloadJob, downloader: Downloader, started: float, ok: bool):
+        try:
+            downloader.close()
+            metrics.record("job_total", time.perf_counter() - started, job_id=job.id, ok=ok)
+            self._finish_job(job, ok, downloader.skipped)
+        finally:
+            self._queue.task_done()
+
+    def _finish_job(self, job: DownloadJob, ok: bool, skipped: bool = False):
+        with self._lock:
+            if self._active.get(job.track_id) is job:
+                del self._active[job.track_id]
+        job.finished_at = time.time()
+        job.stage = None
+        if ok and skipped:
+            self._update_job(job, state=SKIPPED, progress=1.0)
+            self._emit(job, {"message": job.message, "progress": 1.0, "status": "success"})
+        elif ok:
+            self._update_job(job, state=DONE, progress=1.0)
+            self._emit(job, {"message": "Download completed successfully!", "progress": 1.0, "status": "success"})
+        else:
+            job.error = job.error or job.message
+            self._update_job(job, state=FAILED)
+            self._emit(job, {"message": f"Download failed: {job.error}", "progress": job.progress, "status": "error"})
+        self._journal(job)
+
+    def _set_stage(self, job: DownloadJob, stage: str):
+        job.stage = stage
+        self._journal(job)
+
+    def _journal(self, job: DownloadJob):
+        if self.journal is not None:
+            self.journal.record(job.key, job.url, job.download_directory, job.stage or job.state,
+                                finished=job.finished, error=job.error if job.state == FAILED else None)
+
+    def _on_job_progress(self, job: DownloadJob, info: dict):
+        job.message = info.get("message", "")
+        if info.get("progress") is not None:
+            self._update_job(job, progress=info["progress"])
+        if info.get("status") == "error":
+            job.error = job.message
+            return
+        self._emit(job, info)
+
+    def _journal_expansion(self, expansion: Expansion, download_directory: str):
+        if self.journal is not None:
+            self.journal.record(expansion.key, expansion.url, download_directory, EXPAND,
+                                finished=expansion.finished, error=expansion.error, cursor=expansion.cursor)
+
+    def _on_expansion_update(self, expansion: Expansion, download_directory: str):
+        self._journal_expansion(expansion, download_directory)
+        if not self.progress_callback:
+            return
+        message = f"Found {expansion.found} tracks in {expansion.kind}"
+        if expansion.known:
+            message += f", {expansion.known} already downloaded"
+        status = "info"
+        if expansion.error:
+            message += f" ({expansion.error})"
+            status = "error" if not expansion.found else "warning"
+        self.progress_callback({"message": message, "progress": None, "status": status,
+                                "job_id": f"{expansion.kind}:{expansion.collection_id}", "url": expansion.url,
+                                "expansion": expansion.to_dict(), "batch": self.summary()})
+
+    def _emit(self, job: DownloadJob, info: dict):
+        if self.progress_callback:
+            self.progress_callback(dict(info, job_id=job.id, url=job.url, state=job.state, batch=self.summary()))
@@ -0,0 +1,349 @@
+import argparse
+import json
+import os
+import platform
+import random
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from selenium.common import WebDriverException
+
+import history
+from batch import DownloadQueue
+from benchmarks.stub_site import StubSite
+from downloader import Downloader, TRANSFER_BROWSER, TRANSFER_HTTP
+from driver_pool import DriverPool, LitePageProfile
+from history import HistoryManager
+from history_store import STORE_TYPES, open_store
+from link_cache import LinkCache
+from metrics import metrics
+from pipeline import PipelinedDownloadQueue
+from resolver import HttpLinkResolver
+from spotify_url import track_url
+
+SUITES = ("driver", "page_load", "track", "batch", "history")
+TRACK_MODES = ("http", "http_cached", "browser")
+
+
+def summarize(samples: List[float]) -> dict:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "p50": ordered[len(ordered) // 2],
+        "p90": ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))],
+        "max": ordered[-1],
+    }
+
+
+def timed(function: Callable, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def random_track_id() -> str:
+    return "".join(random.choices(string.ascii_letters + string.digits, k=22))
+
+
+def bench_driver_start(args, workspace: Path) -> dict:
+    cold, warm = [], []
+    for _ in range(args.driver_runs):
+        pool = DriverPool(max_size=1, idle_timeout=0)
+        try:
+            lease_started = time.perf_counter()
+            pooled = pool.lease(str(workspace))
+            cold.append(time.perf_counter() - lease_started)
+            pool.release(pooled)
+            lease_started = time.perf_counter()
+            pooled = pool.lease(str(workspace))
+            warm.append(time.perf_counter() - lease_started)
+            pool.release(pooled)
+        finally:
+            pool.close()
+    return {"cold": summarize(cold), "warm": summarize(warm)}
+
+
+def bench_page_load(args, workspace: Path, site: StubSite) -> dict:
+    results = {}
+    for variant, lite in (("full", None), ("lite", LitePageProfile.for_site(site.url))):
+        pool = DriverPool(max_size=1, lite=lite)
+        samples = []
+        try:
+            with pool.leased(str(workspace)) as pooled:
+                for _ in range(args.page_loads):
+                    pooled.driver.delete_all_cookies()
+                    samples.append(timed(pooled.driver.get, site.url))
+        finally:
+            pool.close()
+        results[variant] = summarize(samples)
+    results["saved_p50"] = results["full"]["p50"] - results["lite"]["p50"]
+    return results
+
+
+def bench_track_latency(args, workspace: Path, site: StubSite) -> dict:
+    results = {}
+    pool = DriverPool(max_size=1)
+    link_cache = LinkCache(str(workspace / "track_link_cache.json"))
+    track_ids = [random_track_id() for _ in range(args.tracks)]
+    try:
+        for mode in sorted(args.modes, key=TRACK_MODES.index):
+            if mode == "http_cached" and "http" not in args.modes:
+                resolver = HttpLinkResolver(site.url)
+                for track_id in track_ids:
+                    link_cache.put(track_id, resolver.resolve(track_url(track_id)))
+            download_dir = workspace / f"tracks-{mode}"
+            download_dir.mkdir()
+            samples, failures = [], 0
+            for track_id in track_ids if mode != "browser" else [random_track_id() for _ in track_ids]:
+                downloader = Downloader(str(download_dir),
+                                        pool=pool,
+                                        transfer_mode=TRANSFER_BROWSER if mode == "browser" else TRANSFER_HTTP,
+                                        site_url=site.url,
+                                        use_http_resolver=mode != "browser",
+                                        link_cache=link_cache,
+                                        skip_existing=False)
+                started = time.perf_counter()
+                try:
+                    ok = downloader.download_from_url(track_url(track_id)) and \
+                        downloader.wait_for_download_completion()
+                except WebDriverException as e:
+                    results[mode] = {"error": str(e).splitlines()[0]}
+                    break
+                finally:
+                    downloader.close()
+                if ok:
+                    samples.append(time.perf_counter() - started)
+                else:
+                    failures += 1
+            else:
+                results[mode] = dict(summarize(samples), failures=failures)
+    finally:
+        pool.close()
+    return results
+
+
+def bench_batch(args, workspace: Path, site: StubSite) -> dict:
+    results = {}
+    for workers, pipelined in [(workers, False) for workers in args.concurrency] + \
+                              [(workers, True) for workers in args.concurrency]:
+        name = f"pipeline-{workers}" if pipelined else str(workers)
+        download_dir = workspace / f"batch-{name}"
+        download_dir.mkdir()
+        if pipelined:
+            queue = PipelinedDownloadQueue(str(download_dir),
+                                           transfer_workers=workers,
+                                           pool=DriverPool(max_size=1),
+                                           transfer_mode=TRANSFER_HTTP,
+                                           site_url=site.url)
+        else:
+            queue = DownloadQueue(str(download_dir),
+                                  workers=workers,
+                                  pool=DriverPool(max_size=workers),
+                                  transfer_mode=TRANSFER_HTTP,
+                                  site_url=site.url)
+        started = time.perf_counter()
+        try:
+            queue.submit_many(track_url(random_track_id()) for _ in range(args.batch_tracks))
+            queue.join()
+        finally:
+            queue.close()
+            queue.pool.close()
+        elapsed = time.perf_counter() - started
+        summary = queue.summary()
+        results[name] = {
+            "tracks": summary["total"],
+            "done": summary["done"],
+            "failed": summary["failed"],
+            "seconds": elapsed,
+            "tracks_per_second": summary["done"] / elapsed if elapsed else None,
+        }
+    return results
+
+
+def make_entries(count: int) -> List[dict]:
+    return [{
+        "title": f"Title {i}",
+        "artist": f"Artist {i % 997}",
+        "url": track_url(f"track{i:017d}"),
+        "file": f"/music/Artist {i % 997} - Title {i}.mp3",
+    } for i in range(count)]
+
+
+def bench_history(args, workspace: Path) -> dict:
+    results = {}
+    for size in args.history_sizes:
+        entries = make_entries(size)
+        probes = random.sample(range(size), min(size, args.history_lookups))
+        for backend in args.backends:
+            directory = workspace / f"history-{backend}-{size}"
+            directory.mkdir()
+            legacy_file = str(directory / history.HISTORY_FILE)
+            store = open_store(backend, legacy_file)
+            result = {"write_all": timed(store.replace_all, entries)}
+            store.close()
+
+            store = open_store(backend, legacy_file)
+            result["cold_first_page"] = timed(store.page, 0, 50)
+            result["load_all"] = timed(store.load_all)
+            result["find_by_track_id"] = timed(
+                lambda: [store.find_by_track_id(f"track{i:017d}") for i in probes]) / len(probes)
+            result["find_by_title_artist"] = timed(
+                lambda: [store.find_by_title_artist(f"Title {i}", f"Artist {i % 997}") for i in probes]) / len(probes)
+            result["search_prepare"] = timed(store.prepare_search, True)
+            result["search_page"] = timed(store.page, 0, 50, "artist 99")
+            result["search_page_refined"] = timed(store.page, 0, 50, "artist 996")
+            result["search_page_folded"] = timed(store.page, 0, 50, "ÁRTIST 996")
+            result["deep_page"] = timed(store.page, size - 50, 50)
+
+            manager = HistoryManager(store)
+            added = [{"title": f"New {i}", "artist": "Added", "url": track_url(f"added{i:017d}"), "file": ""}
+                     for i in range(args.history_appends)]
+
+            def append_and_flush():
+                for entry in added:
+                    manager.add(entry)
+                manager.flush()
+
+            result["append_per_entry"] = timed(append_and_flush) / len(added)
+            manager.close()
+            result["file_bytes"] = sum(f.stat().st_size for f in directory.iterdir() if f.is_file())
+            results[f"{backend}/{size}"] = result
+    return results
+
+
+def run_suite(name: str, function: Callable, *args) -> dict:
+    print(f"Running {name}...", file=sys.stderr)
+    try:
+        return function(*args)
+    except WebDriverException as e:
+        return {"error": str(e).splitlines()[0]}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                                       cwd=Path(__file__).resolve().parent,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(data, prefix: str = "") -> Dict[str, float]:
+    values = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            values.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        values[prefix.rstrip(".")] = data
+    return values
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    regressions = []
+    current = flatten(results["results"])
+    for key, previous in flatten(baseline.get("results", {})).items():
+        value = current.get(key)
+        if value is None or not previous or key.endswith((".n", ".tracks", ".done", ".failures", "file_bytes")):
+            continue
+        ratio = value / previous
+        worse = ratio < 1 - tolerance if key.endswith("per_second") else ratio > 1 + tolerance
+        if worse:
+            regressions.append(f"{key}: {previous:.6g} -> {value:.6g} ({ratio:.2f}x)")
+    return regressions
+
+
+def parse_args(argv=None):
+    def int_list(text):
+        return [int(part) for part in text.split(",") if part]
+
+    def name_list(choices):
+        def parse(text):
+            names = [part for part in text.split(",") if part]
+            unknown = set(names) - set(choices)
+            if unknown:
+                raise argparse.ArgumentTypeError(f"unknown: {', '.join(sorted(unknown))}")
+            return names
+        return parse
+
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local stub of the download site.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--suites", type=name_list(SUITES), default=list(SUITES))
+    parser.add_argument("--modes", type=name_list(TRACK_MODES), default=list(TRACK_MODES))
+    parser.add_argument("--backends", type=name_list(STORE_TYPES), default=list(STORE_TYPES))
+    parser.add_argument("--driver-runs", type=int, default=3)
+    parser.add_argument("--page-loads", type=int, default=5)
+    parser.add_argument("--tracks", type=int, default=5)
+    parser.add_argument("--batch-tracks", type=int, default=12)
+    parser.add_argument("--concurrency", type=int_list, default=[1, 2, 4])
+    parser.add_argument("--history-sizes", type=int_list, default=[10_000, 100_000])
+    parser.add_argument("--history-lookups", type=int, default=1000)
+    parser.add_argument("--history-appends", type=int, default=100)
+    parser.add_argument("--payload-size", type=int, default=3_000_000)
+    parser.add_argument("--rate", type=float, default=0, help="stub transfer rate in bytes per second")
+    parser.add_argument("--page-delay", type=float, default=0.0)
+    parser.add_argument("--no-consent", action="store_true")
+    parser.add_argument("--asset-delay", type=float, default=0.2, help="stub delay for stylesheets and ad scripts")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    output = Path(args.output).resolve()
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    original_cwd = os.getcwd()
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="spotify-bench-") as temp, \
+            StubSite(args.payload_size, args.rate, args.page_delay, not args.no_consent, args.asset_delay) as site:
+        workspace = Path(temp)
+        os.chdir(workspace)
+        try:
+            if "driver" in args.suites:
+                results["driver_start"] = run_suite("driver start", bench_driver_start, args, workspace)
+            if "page_load" in args.suites:
+                results["page_load"] = run_suite("page load", bench_page_load, args, workspace, site)
+            if "track" in args.suites:
+                results["track_latency"] = run_suite("per-track latency", bench_track_latency, args, workspace, site)
+            if "batch" in args.suites:
+                results["batch_throughput"] = run_suite("batch throughput", bench_batch, args, workspace, site)
+            if "history" in args.suites:
+                results["history"] = run_suite("history", bench_history, args, workspace)
+            history.flush_history()
+        finally:
+            os.chdir(original_cwd)
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "results": results,
+        "stages": metrics.snapshot(),
+    }
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"Results written to {output}", file=sys.stderr)
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,266 @@
+import html
+import re
+import struct
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs
+
+HOME_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<title>SpotiDown stub</title>
+<link rel="stylesheet" href="/static/site.css">
+<link rel="stylesheet" href="/static/fonts.css">
+<script src="/pagead/js/adsbygoogle.js"></script>
+</head>
+<body>
+{consent}
+<form id="search" action="/action" method="post">
+  <input type="hidden" name="token" value="stub-token">
+  <input id="url" name="url" type="text" placeholder="Spotify link">
+  <button id="send" type="submit">Download</button>
+</form>
+<div id="result"></div>
+<script>
+  function hook(form) {{
+    form.addEventListener("submit", async function (event) {{
+      event.preventDefault();
+      const response = await fetch(form.action, {{method: "POST", body: new URLSearchParams(new FormData(form))}});
+      const result = document.getElementById("result");
+      result.innerHTML = await response.text();
+      result.querySelectorAll("form").forEach(hook);
+    }});
+  }}
+  hook(document.getElementById("search"));
+  const consent = document.getElementById("consent");
+  if (consent) {{
+    consent.querySelector(".fc-button").addEventListener("click", function () {{ consent.remove(); }});
+  }}
+</script>
+</body>
+</html>
+"""
+
+CONSENT_BANNER = """<div id="consent" class="fc-consent-root"
+     style="position:fixed;top:0;left:0;width:100%;height:100%;background:rgba(0,0,0,0.6);z-index:1000">
+  <button class="fc-button fc-cta-consent"><p>Consent</p></button>
+</div>"""
+
+TRACK_PAGE = """<div class="spotify-info">
+  <img src="/cover/{track_id}.jpg" alt="cover">
+  <h3>{title}</h3>
+  <p>{artist}</p>
+</div>
+<form action="/action/track" method="post">
+  <input type="hidden" name="data" value="{track_id}">
+  <button type="submit">Download MP3</button>
+</form>
+"""
+
+LINK_PAGE = '<a class="abutton is-success" href="/dl/{track_id}.mp3">Download Mp3</a>\n'
+
+TRACK_ID = re.compile(r"track[/:]([A-Za-z0-9]+)")
+MPEG_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def _id3_frame(frame_id: str, text: str) -> bytes:
+    data = b"\x01" + text.encode("utf-16")
+    return frame_id.encode("ascii") + struct.pack(">I", len(data)) + b"\x00\x00" + data
+
+
+def _syncsafe(size: int) -> bytes:
+    return bytes(((size >> shift) & 0x7F) for shift in (21, 14, 7, 0))
+
+
+@lru_cache(maxsize=64)
+def mp3_payload(title: str, artist: str, size: int) -> bytes:
+    frames = _id3_frame("TIT2", title) + _id3_frame("TPE1", artist)
+    tag = b"ID3\x03\x00\x00" + _syncsafe(len(frames)) + frames
+    audio_size = max(size - len(tag), len(MPEG_FRAME))
+    audio = MPEG_FRAME * (audio_size // len(MPEG_FRAME) + 1)
+    return tag + audio[:audio_size]
+
+
+def track_title(track_id: str) -> str:
+    return f"Stub Track {track_id}"
+
+
+def track_artist(track_id: str) -> str:
+    return f"Stub Artist {track_id[:4]}"
+
+
+class StubSite:
+    def __init__(self,
+                 payload_size: int = 3_000_000,
+                 bytes_per_second: float = 0,
+                 page_delay: float = 0.0,
+                 consent: bool = True,
+                 asset_delay: float = 0.0,
+                 host: str = "127.0.0.1",
+                 port: int = 0):
+        self.payload_size = payload_size
+        self.bytes_per_second = bytes_per_second
+        self.page_delay = page_delay
+        self.consent = consent
+        self.asset_delay = asset_delay
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_type())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubSite":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def _count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def _count_bytes(self, sent: int):
+        with self._lock:
+            self.bytes_sent += sent
+
+    def _handler_type(self):
+        site = self
+
+        class StubHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                site._count_request()
+                path = self.path.split("?", 1)[0]
+                if path == "/":
+                    time.sleep(site.page_delay)
+                    page = HOME_PAGE.format(consent=CONSENT_BANNER if site.consent else "")
+                    self._send_html(page, {"Set-Cookie": "session=stub; Path=/"})
+                elif path.startswith("/dl/") and path.endswith(".mp3"):
+                    self._send_mp3(path[len("/dl/"):-len(".mp3")])
+                elif path.startswith(("/static/", "/pagead/")):
+                    time.sleep(site.asset_delay)
+                    content_type = "text/css" if path.endswith(".css") else "application/javascript"
+                    self._send(200, b"/* stub asset */\n", content_type)
+                elif path.startswith("/cover/"):
+                    self._send(200, b"\xff\xd8\xff\xd9", "image/jpeg")
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                site._count_request()
+                length = int(self.headers.get("Content-Length") or 0)
+                fields = parse_qs(self.rfile.read(length).decode("utf-8"))
+                time.sleep(site.page_delay)
+                if self.path == "/action":
+                    match = TRACK_ID.search((fields.get("url") or [""])[0])
+                    if match is None:
+                        self._send(400, b"invalid url", "text/plain")
+                        return
+                    track_id = match.group(1)
+                    self._send_html(TRACK_PAGE.format(track_id=track_id,
+                                                      title=html.escape(track_title(track_id)),
+                                                      artist=html.escape(track_artist(track_id))))
+                elif self.path == "/action/track":
+                    track_id = (fields.get("data") or [""])[0]
+                    self._send_html(LINK_PAGE.format(track_id=html.escape(track_id)))
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def _send_html(self, page: str, headers: Optional[dict] = None):
+                self._send(200, page.encode("utf-8"), "text/html; charset=utf-8", headers)
+
+            def _send(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_mp3(self, track_id: str):
+                title, artist = track_title(track_id), track_artist(track_id)
+                data = mp3_payload(title, artist, site.payload_size)
+                start = 0
+                match = re.match(r"bytes=(\d+)-", self.headers.get("Range") or "")
+                if match:
+                    start = int(match.group(1))
+                    if start >= len(data):
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{len(data)}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                self.send_header("Content-Length", str(len(data) - start))
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Disposition",
+                                 f'attachment; filename="SpotiDown.App - {artist} - {title}.mp3"')
+                self.end_headers()
+                self._stream(memoryview(data)[start:])
+
+            def _stream(self, body: memoryview, chunk_size: int = 64 * 1024):
+                started = time.monotonic()
+                sent = 0
+                try:
+                    while sent < len(body):
+                        chunk = body[sent:sent + chunk_size]
+                        self.wfile.write(chunk)
+                        sent += len(chunk)
+                        if site.bytes_per_second:
+                            ahead = sent / site.bytes_per_second - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                site._count_bytes(sent)
+
+        return StubHandler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the download site.")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--payload-size", type=int, default=3_000_000)
+    parser.add_argument("--rate", type=float, default=0, help="bytes per second, 0 for unlimited")
+    parser.add_argument("--page-delay", type=float, default=0.0)
+    parser.add_argument("--no-consent", action="store_true")
+    parser.add_argument("--asset-delay", type=float, default=0.0, help="delay for stylesheets and ad scripts")
+    args = parser.parse_args()
+
+    stub = StubSite(args.payload_size, args.rate, args.page_delay, not args.no_consent, args.asset_delay,
+                    port=args.port).start()
+    print(f"Stub site listening on {stub.url}")
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,410 @@
+import argparse
+import codecs
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+from typing import Optional, List, Iterable, TextIO
+from batch import DownloadQueue, DownloadJob, parse_url_list, read_url_file, FAILED
+from downloader import TRANSFER_BROWSER, TRANSFER_HTTP
+from driver_pool import DriverPool, MultiplexedDriverPool, LitePageProfile
+from expanders import Expansion, FixtureExpander, set_expander
+from governor import BrowserGovernor
+from history import flush_history
+from journal import JobJournal, JournalError
+from pipeline import PipelinedDownloadQueue
+from progress_bus import ProgressBus
+from resolver import SITE_URL
+from scheduler import transfer_scheduler, PRIORITIES, PRIORITY_BULK, HOST_CONCURRENCY
+from spotify_url import is_valid_spotify_url, is_valid_spotify_collection_url
+
+DEFAULT_ADDRESS = "127.0.0.1:8766"
+POLL_INTERVAL = 0.25
+
+
+def write_event(stream: TextIO, event: str, **fields):
+    stream.write(json.dumps(dict(fields, event=event), ensure_ascii=False, default=str) + "\n")
+    stream.flush()
+
+
+def collect_urls(urls: Iterable[str],
+                 url_file: Optional[str],
+                 stdin: TextIO,
+                 implicit_stdin: bool = True) -> List[str]:
+    collected = []
+    for url in urls:
+        if url == "-":
+            collected.extend(parse_url_list(stdin.read()))
+        else:
+            collected.extend(parse_url_list(url))
+    if url_file:
+        collected.extend(read_url_file(url_file))
+    if implicit_stdin and not collected and not urls and not url_file and not stdin.isatty():
+        collected.extend(parse_url_list(stdin.read()))
+    return list(dict.fromkeys(collected))
+
+
+def split_valid(urls: List[str]):
+    valid = [url for url in urls if is_valid_spotify_url(url)]
+    invalid = [url for url in urls if not is_valid_spotify_url(url)]
+    return valid, invalid
+
+
+def submit_urls(download_queue: DownloadQueue, urls: Iterable[str], directory: Optional[str] = None,
+                priority: int = PRIORITY_BULK):
+    jobs, expansions = [], []
+    for url in urls:
+        if is_valid_spotify_collection_url(url):
+            expansions.append(download_queue.expand(url, directory))
+        else:
+            jobs.append(download_queue.submit(url, directory, priority=priority))
+    return jobs, expansions
+
+
+def tracked_jobs(jobs: List[DownloadJob], expansions: Iterable[Expansion] = ()) -> List[DownloadJob]:
+    return list(dict.fromkeys(list(jobs) + [job for expansion in expansions for job in list(expansion.jobs)]))
+
+
+def stream_progress(subscription, jobs: List[DownloadJob], out: TextIO, quiet: bool = False,
+                    expansions: List[Expansion] = ()):
+    keys = {f"{expansion.kind}:{expansion.collection_id}" for expansion in expansions}
+
+    def write_updates(updates):
+        ids = keys | {job.id for job in tracked_jobs(jobs, expansions)}
+        for info in updates:
+            if info.get("job_id") in ids and not quiet:
+                write_event(out, "progress", **info)
+
+    while True:
+        write_updates(subscription.wait(POLL_INTERVAL))
+        if all(expansion.finished for expansion in expansions) and \
+                all(job.finished for job in tracked_jobs(jobs, expansions)):
+            write_updates(subscription.drain())
+            return
+
+
+def write_results(out: TextIO, jobs: List[DownloadJob], expansions: List[Expansion] = ()):
+    for expansion in expansions:
+        write_event(out, "expanded", **expansion.to_dict())
+    jobs = tracked_jobs(jobs, expansions)
+    for job in jobs:
+        write_event(out, "result", **job.to_dict())
+    counts = {}
+    for job in jobs:
+        counts[job.state] = counts.get(job.state, 0) + 1
+    write_event(out, "summary", total=len(jobs), **counts)
+
+
+def parse_address(address: str):
+    if hasattr(socket, "AF_UNIX") and (os.sep in address or address.endswith(".sock")):
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def create_pool(args) -> DriverPool:
+    lite = None
+    if args.lite:
+        lite = LitePageProfile.for_site(args.site_url,
+                                        restrict_hosts=args.transfer == TRANSFER_HTTP,
+                                        extra_hosts=args.allow_host)
+    size = args.workers + args.interactive_workers
+    if args.pipeline:
+        size = args.resolve_workers + args.interactive_workers
+        if args.transfer == TRANSFER_BROWSER:
+            size += args.workers + args.interactive_workers
+    governor = BrowserGovernor(max_rss=int(args.max_browser_memory * 1e6) if args.max_browser_memory else None)
+    if args.tabs:
+        return MultiplexedDriverPool(max_tabs=size, lite=lite, governor=governor)
+    return DriverPool(max_size=size, lite=lite, governor=governor)
+
+
+def close_pool(pool: DriverPool):
+    pool.close()
+    if pool.governor is not None:
+        pool.governor.close(at_exit=True)
+
+
+def open_journal(args) -> Optional[JobJournal]:
+    if not args.journal:
+        return None
+    try:
+        return JobJournal()
+    except JournalError as e:
+        write_event(sys.stdout, "warning", error=f"{e}; jobs are not journaled")
+        return None
+
+
+def create_queue(args, pool: DriverPool, bus: ProgressBus) -> DownloadQueue:
+    journal = open_journal(args)
+    if args.pipeline:
+        return PipelinedDownloadQueue(args.output_dir,
+                                      resolve_workers=args.resolve_workers,
+                                      transfer_workers=args.workers,
+                                      pool=pool,
+                                      progress_callback=bus.publish,
+                                      transfer_mode=args.transfer,
+                                      site_url=args.site_url,
+                                      journal=journal,
+                                      interactive_workers=args.interactive_workers)
+    return DownloadQueue(args.output_dir,
+                         workers=args.workers,
+                         pool=pool,
+                         progress_callback=bus.publish,
+                         transfer_mode=args.transfer,
+                         site_url=args.site_url,
+                         journal=journal,
+                         interactive_workers=args.interactive_workers)
+
+
+def close_journal(download_queue: DownloadQueue):
+    if download_queue.journal is not None:
+        download_queue.journal.close()
+
+
+def run_once(args, out: TextIO = sys.stdout) -> int:
+    urls, invalid = split_valid(collect_urls(args.urls, args.input, sys.stdin))
+    for url in invalid:
+        write_event(out, "rejected", url=url, error="Invalid Spotify track, album or playlist URL")
+    if not urls and not args.resume:
+        write_event(out, "summary", total=0)
+        return 2 if invalid else 0
+
+    bus = ProgressBus()
+    subscription = bus.subscribe()
+    pool = create_pool(args)
+    download_queue = create_queue(args, pool, bus)
+    interrupted = False
+    try:
+        jobs = download_queue.resume() if args.resume else []
+        expansions = download_queue.expansions
+        resumed = {job.url for job in jobs} | {expansion.url for expansion in expansions}
+        for job in jobs:
+            write_event(out, "resumed", id=job.id, url=job.url)
+        for expansion in expansions:
+            write_event(out, "resumed", url=expansion.url, cursor=expansion.cursor)
+        submitted, submitted_expansions = submit_urls(download_queue, (url for url in urls if url not in resumed),
+                                                      priority=PRIORITIES[args.priority])
+        jobs += submitted
+        expansions += submitted_expansions
+        stream_progress(subscription, jobs, out, args.quiet, expansions)
+        write_results(out, jobs, expansions)
+        failed = any(job.state == FAILED for job in tracked_jobs(jobs, expansions))
+        return 1 if invalid or failed or any(expansion.error for expansion in expansions) else 0
+    except KeyboardInterrupt:
+        interrupted = True
+        write_event(out, "interrupted", **download_queue.summary())
+        return 130
+    finally:
+        subscription.close()
+        download_queue.close(wait=not interrupted)
+        close_pool(pool)
+        flush_history()
+        close_journal(download_queue)
+
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    server: "DownloadDaemon"
+
+    def handle(self):
+        out = codecs.getwriter("utf-8")(self.wfile)
+        for line in self.rfile:
+            try:
+                request = json.loads(line.decode("utf-8"))
+                op = request.get("op")
+            except (ValueError, AttributeError):
+                write_event(out, "error", error="Malformed request")
+                continue
+            if op == "submit":
+                self.submit(request, out)
+            elif op == "status":
+                download_queue = self.server.download_queue
+                write_event(out, "status", **download_queue.summary(),
+                            jobs=[job.to_dict() for job in download_queue.jobs if not job.finished],
+                            browsers=download_queue.pool.memory_usage(),
+                            scheduler=transfer_scheduler.status())
+            elif op == "limit":
+                self.limit(request, out)
+            elif op == "shutdown":
+                write_event(out, "shutdown")
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            else:
+                write_event(out, "error", error=f"Unknown op: {op}")
+
+    def submit(self, request: dict, out: TextIO):
+        urls, invalid = split_valid(parse_url_list(" ".join(request.get("urls") or [])))
+        for url in invalid:
+            write_event(out, "rejected", url=url, error="Invalid Spotify track, album or playlist URL")
+        directory = request.get("directory")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        priority = PRIORITIES.get(request.get("priority"), PRIORITY_BULK)
+        subscription = self.server.bus.subscribe()
+        try:
+            jobs, expansions = submit_urls(self.server.download_queue, urls, directory, priority)
+            write_event(out, "accepted", jobs=[{"id": job.id, "url": job.url} for job in jobs],
+                        expanding=[expansion.url for expansion in expansions])
+            if request.get("wait", True):
+                stream_progress(subscription, jobs, out, request.get("quiet", False), expansions)
+                write_results(out, jobs, expansions)
+        finally:
+            subscription.close()
+            self.server.download_queue.clear_finished()
+
+    def limit(self, request: dict, out: TextIO):
+        try:
+            if "bandwidth" in request:
+                transfer_scheduler.set_bandwidth(float(request["bandwidth"] or 0))
+            if "host_limit" in request:
+                transfer_scheduler.set_host_limit(int(request["host_limit"] or 0))
+        except (TypeError, ValueError):
+            write_event(out, "error", error="Malformed limit")
+            return
+        write_event(out, "limit", **transfer_scheduler.status())
+
+
+class DownloadDaemon(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, family: int, download_queue: DownloadQueue, bus: ProgressBus):
+        self.address_family = family
+        self.download_queue = download_queue
+        self.bus = bus
+        super().__init__(address, DaemonHandler)
+
+
+def run_daemon(args) -> int:
+    family, address = parse_address(args.serve)
+    if family == socket.AF_UNIX and os.path.exists(address):
+        os.unlink(address)
+
+    bus = ProgressBus()
+    pool = create_pool(args)
+    download_queue = create_queue(args, pool, bus)
+    server = DownloadDaemon(address, family, download_queue, bus)
+    write_event(sys.stdout, "listening", address=args.serve)
+    for job in download_queue.resume():
+        write_event(sys.stdout, "resumed", id=job.id, url=job.url)
+    for expansion in download_queue.expansions:
+        write_event(sys.stdout, "resumed", url=expansion.url, cursor=expansion.cursor)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        download_queue.close(wait=False)
+        close_pool(pool)
+        flush_history()
+        close_journal(download_queue)
+        if family == socket.AF_UNIX and os.path.exists(address):
+            os.unlink(address)
+    return 0
+
+
+def run_client(args, out: TextIO = sys.stdout) -> int:
+    family, address = parse_address(args.connect)
+    urls = collect_urls(args.urls, args.input, sys.stdin, implicit_stdin=False)
+    if urls:
+        request = {"op": "submit", "urls": urls, "wait": not args.no_wait, "quiet": args.quiet,
+                   "priority": args.priority}
+        if args.output_dir_set:
+            request["directory"] = os.path.abspath(args.output_dir)
+    elif args.limit_rate is not None or args.host_connections is not None:
+        request = {"op": "limit"}
+        if args.limit_rate is not None:
+            request["bandwidth"] = args.limit_rate * 1000
+        if args.host_connections is not None:
+            request["host_limit"] = args.host_connections
+    else:
+        request = {"op": "status"}
+
+    failed = False
+    with socket.socket(family, socket.SOCK_STREAM) as connection:
+        connection.connect(address)
+        connection.sendall((json.dumps(request) + "\n").encode("utf-8"))
+        connection.shutdown(socket.SHUT_WR)
+        with connection.makefile("r", encoding="utf-8") as replies:
+            for line in replies:
+                out.write(line)
+                out.flush()
+                event = json.loads(line)
+                failed = failed or event.get("event") == "rejected" or event.get("state") == FAILED
+    return 1 if failed else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Download Spotify tracks without the desktop UI. "
+                                                 "Progress is printed as JSON lines.")
+    parser.add_argument("urls", nargs="*", help="track, album or playlist URLs, or - to read them from stdin")
+    parser.add_argument("-i", "--input", help="file with one URL per line")
+    parser.add_argument("-o", "--output-dir", help="download directory (default: current directory)")
+    parser.add_argument("-w", "--workers", type=int, default=2,
+                        help="concurrent downloads; with --pipeline, concurrent transfers")
+    parser.add_argument("--transfer", choices=(TRANSFER_HTTP, TRANSFER_BROWSER), default=TRANSFER_HTTP)
+    parser.add_argument("--site-url", default=SITE_URL)
+    parser.add_argument("--lite", action="store_true",
+                        help="block stylesheets, fonts, images and trackers in the browser; with HTTP transfers, "
+                             "also restrict it to the site's hosts")
+    parser.add_argument("--tabs", action="store_true",
+                        help="run concurrent browser jobs as tabs of a single Chrome process")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="resolve the next tracks while earlier ones transfer and get tagged")
+    parser.add_argument("--resolve-workers", type=int, default=1,
+                        help="concurrent link resolutions with --pipeline")
+    parser.add_argument("--max-browser-memory", type=float, default=1500, metavar="MB",
+                        help="recycle a browser whose process tree uses more memory than this (0 to disable)")
+    parser.add_argument("--priority", choices=tuple(PRIORITIES), default="bulk",
+                        help="interactive jobs jump the queue and are never held back by the bandwidth cap")
+    parser.add_argument("--interactive-workers", type=int, default=1,
+                        help="workers reserved for interactive jobs")
+    parser.add_argument("--limit-rate", type=float, metavar="KB/S",
+                        help="cap the combined speed of bulk HTTP transfers (0 for no cap); "
+                             "with --connect and no URLs, change a running daemon's cap")
+    parser.add_argument("--host-connections", type=int, metavar="N",
+                        help=f"concurrent requests per download host (default {HOST_CONCURRENCY}, 0 for no limit)")
+    parser.add_argument("--allow-host", action="append", default=[], metavar="HOST",
+                        help="extra host the browser may reach in --lite mode")
+    parser.add_argument("--resume", action="store_true",
+                        help="also restart jobs left unfinished by an earlier run (the daemon always does)")
+    parser.add_argument("--no-journal", dest="journal", action="store_false",
+                        help="do not record jobs in the crash-recovery journal")
+    parser.add_argument("--expander-fixture", metavar="FILE",
+                        help="expand albums and playlists from a JSON file mapping ids to track ids")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print results and the summary")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--serve", nargs="?", const=DEFAULT_ADDRESS, metavar="ADDRESS",
+                      help=f"run as a daemon on host:port or a unix socket path (default {DEFAULT_ADDRESS})")
+    mode.add_argument("--connect", nargs="?", const=DEFAULT_ADDRESS, metavar="ADDRESS",
+                      help="send URLs to a running daemon (stdin only with -); without URLs, print its status")
+    parser.add_argument("--no-wait", action="store_true", help="with --connect, return once jobs are accepted")
+    args = parser.parse_args(argv)
+    args.output_dir_set = args.output_dir is not None
+    args.output_dir = os.path.abspath(args.output_dir or os.getcwd())
+    if not args.connect:
+        os.makedirs(args.output_dir, exist_ok=True)
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.expander_fixture:
+        set_expander(FixtureExpander(path=args.expander_fixture))
+    if not args.connect:
+        if args.limit_rate is not None:
+            transfer_scheduler.set_bandwidth(args.limit_rate * 1000)
+        if args.host_connections is not None:
+            transfer_scheduler.set_host_limit(args.host_connections)
+    if args.serve:
+        return run_daemon(args)
+    if args.connect:
+        return run_client(args)
+    return run_once(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
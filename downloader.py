@@ -1,47 +1,124 @@
+import hashlib
 import os
+import shutil
 import time
+import uuid
 from typing import Optional, Callable
-from selenium import webdriver
 from selenium.common import (
     TimeoutException,
+    WebDriverException,
     ElementClickInterceptedException,
+    ElementNotInteractableException,
     NoSuchElementException,
+    StaleElementReferenceException,
 )
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as ec
-from mutagen.easyid3 import EasyID3
-from history import add_entry
+from urllib3.exceptions import HTTPError
+from history import add_entry, find_entry, find_entry_by_track_id, relink_entry
+from link_cache import LinkCache, get_link_cache
+from metrics import metrics
+from postprocess import PostProcessor, clean_filename, embed_cover, move_into_library, read_tags, write_tags
+from driver_pool import DriverPool, PooledDriver
+from spotify_url import extract_track_id
+from timeouts import AdaptiveTimeouts, adaptive_timeouts, STAGE_WAIT
+from scheduler import TransferScheduler, transfer_scheduler, PRIORITY_BULK
+from resolver import HttpLinkResolver, ResolveError, ResolvedLink, SITE_URL
+from transfer import HttpTransfer, TransferError, PART_SUFFIX
+from watcher import DownloadWatcher, mark_finalized, TEMP_SUFFIX
+
+TRANSFER_BROWSER = "browser"
+TRANSFER_HTTP = "http"
+STAGING_DIRECTORY = ".staging"
+CONSENT_XPATH = '//button[contains(@class, "fc-button") and .//p[text()="Consent"]]'
+
+def preload_modules():
+    import selenium.webdriver.support.ui
+    import selenium.webdriver.support.expected_conditions
+    import mutagen.easyid3
+    import mutagen.id3
+
+def staging_name(job_key=None, job_id=None) -> str:
+    if job_key is not None:
+        return f"job-{job_key}"
+    return f"job-{job_id}" if job_id is not None else uuid.uuid4().hex
+
+def partial_name(track_id: str, job_key=None, job_id=None) -> str:
+    return f"{track_id}.{staging_name(job_key, job_id)}"
+
+def adopt_partial_download(download_directory: str, job_key: str, track_id: Optional[str]) -> Optional[str]:
+    staging_directory = os.path.join(download_directory, STAGING_DIRECTORY, staging_name(job_key))
+    if not os.path.isdir(staging_directory):
+        return None
+    part_path = None
+    if track_id is not None:
+        partials = [os.path.join(staging_directory, name) for name in os.listdir(staging_directory)
+                    if name.endswith(TEMP_SUFFIX)]
+        partials = [path for path in partials if os.path.getsize(path) > 0]
+        if partials:
+            largest = max(partials, key=os.path.getsize)
+            part_path = os.path.join(download_directory, partial_name(track_id, job_key) + PART_SUFFIX)
+            if not os.path.exists(part_path) or os.path.getsize(part_path) < os.path.getsize(largest):
+                os.replace(largest, part_path)
+    shutil.rmtree(staging_directory, ignore_errors=True)
+    return part_path
 
 class Downloader:
-    def __init__(self, download_directory: str = None, progress_callback: Optional[Callable] = None):
+    PROGRESS_INTERVAL = 0.5
+
+    def __init__(self,
+                 download_directory: str = None,
+                 progress_callback: Optional[Callable] = None,
+                 pool: Optional[DriverPool] = None,
+                 transfer_mode: str = TRANSFER_BROWSER,
+                 site_url: str = SITE_URL,
+                 use_http_resolver: bool = True,
+                 link_cache: Optional[LinkCache] = None,
+                 skip_existing: bool = True,
+                 job_id=None,
+                 timeouts: Optional[AdaptiveTimeouts] = None,
+                 job_key: Optional[str] = None,
+                 priority: int = PRIORITY_BULK,
+                 scheduler: Optional[TransferScheduler] = None):
+        if transfer_mode not in (TRANSFER_BROWSER, TRANSFER_HTTP):
+            raise ValueError(f"Unknown transfer mode: {transfer_mode}")
         self.song_url = None
+        self.job_id = job_id
+        self.job_key = job_key
+        self.priority = priority
+        self.scheduler = scheduler if scheduler is not None else transfer_scheduler
+        self.timeouts = timeouts if timeouts is not None else adaptive_timeouts
         self.download_directory = download_directory
         self.progress_callback = progress_callback
+        self.transfer_mode = transfer_mode
+        self.site_url = site_url
+        self.resolver = HttpLinkResolver(site_url) if use_http_resolver else None
+        self.resolved_link: Optional[ResolvedLink] = None
+        self.link_cache = link_cache if link_cache is not None else get_link_cache()
+        self.skip_existing = skip_existing
+        self.skipped = False
+        self.downloaded_file: Optional[str] = None
+        self.estimated_size: Optional[int] = None
+        self._watcher: Optional[DownloadWatcher] = None
+        self._staging_directory: Optional[str] = None
+        self._transfer_headers: Optional[dict] = None
+        self._link_rejected = False
+        self._from_cache = False
 
-        chrome_preferences = {
-            "download.default_directory": self.download_directory,
-            "download.prompt_for_download": False,
-            "download.directory_upgrade": True,
-            "safebrowsing.enabled": True,
-            "profile.managed_default_content_settings.images": 2,
-        }
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else DriverPool(max_size=1, idle_timeout=0)
+        self._lease: Optional[PooledDriver] = None
 
-        chrome_options = Options()
-        chrome_options.add_experimental_option("prefs", chrome_preferences)
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-extensions")
-        chrome_options.add_argument("--disable-popup-blocking")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.page_load_strategy = "eager"
+    @property
+    def driver(self):
+        if self._lease is None:
+            self._update_progress("Starting browser...", 0.0)
+            with self._stage("browser_lease") as stage:
+                self._lease = self.pool.lease(self.download_directory)
+                stage.labels["warm"] = self._lease.last_used > self._lease.created_at
+        return self._lease.driver
 
-        self.driver = webdriver.Chrome(service=ChromeService(), options=chrome_options)
-        self.driver.set_page_load_timeout(30)
+    def _stage(self, name: str, **labels):
+        return metrics.stage(name, job_id=self.job_id, **labels)
 
     def _update_progress(self, message: str, progress: float = None, status: str = "info"):
         if self.progress_callback:
@@ -51,132 +128,444 @@ class Downloader:
                 "status": status,
             })
 
-    def _accept_consent_if_present(self):
+    def _accept_consent_if_present(self) -> bool:
+        if self._lease is None or self._lease.consent_accepted:
+            return False
         try:
-            self._update_progress("Locating consent button...", 0.1)
-            button = WebDriverWait(self.driver, 5).until(
-                ec.element_to_be_clickable(
-                    (By.XPATH, '//button[contains(@class, "fc-button") and .//p[text()="Consent"]]')
-                )
-            )
-            button.click()
-            self._update_progress("Consent accepted", 0.15)
-        except (TimeoutException, ElementClickInterceptedException, NoSuchElementException):
-            self._update_progress("Consent button not found", 0.15)
-
-    def download_from_url(self, song_url: str):
+            buttons = self._lease.driver.find_elements(By.XPATH, CONSENT_XPATH)
+            button = next((b for b in buttons if b.is_displayed() and b.is_enabled()), None)
+            if button is None:
+                return False
+            with self._stage("consent"):
+                button.click()
+        except (ElementClickInterceptedException, ElementNotInteractableException,
+                NoSuchElementException, StaleElementReferenceException):
+            return False
+        self._lease.consent_accepted = True
+        self._update_progress("Consent accepted", 0.15)
+        return True
+
+    def _wait_for(self, stage: str, condition: Callable, default: float = STAGE_WAIT):
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        timeout = self.timeouts.stage_wait(stage, default)
+
+        def until(driver):
+            self._accept_consent_if_present()
+            return condition(driver)
+
+        try:
+            with self._stage(stage, timeout=round(timeout, 3)):
+                result = WebDriverWait(self.driver, timeout).until(until)
+        except TimeoutException:
+            self.timeouts.observe_timeout(stage)
+            retry = self.timeouts.retry_wait(default)
+            if retry <= timeout:
+                raise
+            with self._stage(stage, timeout=round(retry, 3), retry=True):
+                result = WebDriverWait(self.driver, retry).until(until)
+        self.timeouts.observe_success(stage)
+        return result
+
+    def _click(self, element):
+        try:
+            element.click()
+        except ElementClickInterceptedException:
+            if not self._accept_consent_if_present():
+                raise
+            element.click()
+
+    def download_from_url(self, song_url: str) -> bool:
+        download_url = self.resolve_download(song_url)
+        if download_url is None:
+            return self.skipped
+        return self.start_transfer(download_url)
+
+    def resolve_download(self, song_url: str) -> Optional[str]:
         self.song_url = song_url
-        self._update_progress("Opening downloader site...", 0.0)
+        self.downloaded_file = None
+        self.estimated_size = None
+        self.resolved_link = None
+        self._transfer_headers = None
+        self._link_rejected = False
+        self._from_cache = False
+        self.skipped = False
+
+        track_id = extract_track_id(song_url)
+        if self.skip_existing and track_id is not None:
+            existing = self._existing_download(song_url, track_id)
+            if existing is not None:
+                self.skipped = True
+                self.downloaded_file = existing
+                self._update_progress(f"Already downloaded: {os.path.basename(existing)}", 1.0, "success")
+                return None
+
+        download_url = self._cached_download_url(track_id)
+        self._from_cache = download_url is not None
+        if download_url is None:
+            download_url = self._resolve(song_url, track_id)
+        return download_url
+
+    def start_transfer(self, download_url: str) -> bool:
+        track_id = extract_track_id(self.song_url)
+        if self.transfer_mode == TRANSFER_HTTP or self._has_partial_transfer(track_id):
+            if self._transfer_over_http(download_url):
+                return True
+            if not (self._from_cache and self._link_rejected):
+                return False
+            self._update_progress("Cached link expired, resolving again...", 0.1)
+            download_url = self._resolve(self.song_url, track_id)
+            return download_url is not None and self._transfer_over_http(download_url)
+
+        if self._from_cache and not self._check_cached_link(download_url, track_id):
+            self._update_progress("Cached link expired, resolving again...", 0.1)
+            download_url = self._resolve(self.song_url, track_id)
+            if download_url is None:
+                return False
+
+        self._update_progress("Starting file download...", 0.6)
+        self._close_watcher()
         try:
-            self.driver.get("https://spotidown.app")
+            driver = self.driver
+            staging_directory = self._staging()
+            self._lease.set_download_directory(staging_directory)
+            self._watcher = DownloadWatcher(staging_directory).start()
+            with self._stage("start_download"):
+                driver.get(download_url)
         except TimeoutException:
-            self._update_progress("Failed to load initial page", 0.0, "error")
-            return
+            self._close_watcher()
+            self._update_progress("Failed to initiate download", 0.6, "error")
+            return False
+        return True
+
+    def _has_partial_transfer(self, track_id: Optional[str]) -> bool:
+        return track_id is not None and os.path.exists(
+            os.path.join(self.download_directory, partial_name(track_id, self.job_key, self.job_id) + PART_SUFFIX))
+
+    def _staging(self) -> str:
+        if self._staging_directory is None:
+            self._staging_directory = os.path.join(self.download_directory, STAGING_DIRECTORY,
+                                                   staging_name(self.job_key, self.job_id))
+        os.makedirs(self._staging_directory, exist_ok=True)
+        return self._staging_directory
+
+    def _remove_staging(self):
+        if self._staging_directory is not None:
+            shutil.rmtree(self._staging_directory, ignore_errors=True)
+            self._staging_directory = None
+
+    def _existing_download(self, song_url: str, track_id: str) -> Optional[str]:
+        entry = find_entry_by_track_id(track_id)
+        if entry is not None and entry.get("file") and os.path.exists(entry["file"]):
+            return entry["file"]
 
-        self._accept_consent_if_present()
+        if entry is not None:
+            title, artist = entry.get("title"), entry.get("artist")
+        else:
+            cached = self.link_cache.get(track_id)
+            title, artist = (cached.title, cached.artist) if cached is not None else (None, None)
+
+        if title:
+            match = find_entry(title, artist)
+            if match is not None and match.get("file") and os.path.exists(match["file"]):
+                self._relink(song_url, entry, title, artist, match["file"])
+                return match["file"]
+
+        if entry is not None and entry.get("file") and self.download_directory:
+            moved = os.path.join(self.download_directory, os.path.basename(entry["file"].replace("\\", "/")))
+            if os.path.exists(moved):
+                self._relink(song_url, entry, title, artist, moved)
+                return moved
+        return None
+
+    @staticmethod
+    def _relink(song_url: str, entry: Optional[dict], title: str, artist: str, filepath: str):
+        if entry is not None:
+            relink_entry(song_url, filepath)
+        else:
+            add_entry(title, artist, song_url, filepath)
+
+    def _cached_download_url(self, track_id: Optional[str]) -> Optional[str]:
+        if track_id is None:
+            return None
+        link = self.link_cache.get(track_id)
+        if link is None:
+            return None
+        self.resolved_link = link
+        self._update_progress("Using cached download link", 0.5)
+        return link.download_url
+
+    def _check_cached_link(self, download_url: str, track_id: str) -> bool:
+        try:
+            status, size = HttpTransfer().probe(download_url, self._default_request_headers())
+        except HTTPError:
+            return True
+        if 400 <= status < 500:
+            self.link_cache.invalidate(track_id)
+            return False
+        self.estimated_size = size
+        return True
+
+    def _default_request_headers(self) -> dict:
+        return self.resolver.request_headers() if self.resolver is not None else {}
+
+    def _resolve(self, song_url: str, track_id: Optional[str]) -> Optional[str]:
+        self.resolved_link = None
+        self._transfer_headers = None
+        download_url = self._resolve_over_http(song_url) if self.resolver is not None else None
+        if download_url is None:
+            download_url = self._resolve_in_browser(song_url)
+            if download_url is None:
+                return None
+        if track_id is not None:
+            self.link_cache.put(track_id, self.resolved_link)
+        return download_url
+
+    def _resolve_over_http(self, song_url: str) -> Optional[str]:
+        self._update_progress("Resolving download link...", 0.1)
+        try:
+            with self.scheduler.host_slot(self.site_url, self.priority), self._stage("http_resolve"):
+                link = self.resolver.resolve(song_url)
+        except ResolveError as e:
+            self._update_progress(f"Quick resolve failed ({e}), using browser...", 0.1, "warning")
+            return None
+        self.resolved_link = link
+        self._transfer_headers = self.resolver.request_headers()
+        self._update_progress("Download link resolved", 0.5)
+        return link.download_url
+
+    def warm_up(self) -> bool:
+        preload_modules()
+        if self.resolver is not None:
+            try:
+                self.resolver.http.request("HEAD", self.site_url.rstrip("/") + "/", timeout=5.0, retries=False)
+            except HTTPError:
+                pass
+        try:
+            if self._open_site() is None:
+                return False
+            self._lease.ready_url = self.site_url
+            return True
+        except (WebDriverException, RuntimeError):
+            return False
+        finally:
+            if self._lease is not None:
+                self.pool.release(self._lease, count_job=False)
+                self._lease = None
+
+    def _open_site(self):
+        from selenium.webdriver.support import expected_conditions as ec
+
+        driver = self.driver
+        ready = self._lease.ready_url == self.site_url
+        self._lease.ready_url = None
+        if not ready:
+            self._update_progress("Opening downloader site...", 0.0)
+            try:
+                with self._stage("page_load.lite" if self._lease.lite else "page_load.full"):
+                    driver.get(self.site_url)
+            except TimeoutException:
+                self._update_progress("Failed to load initial page", 0.0, "error")
+                return None
+            self._accept_consent_if_present()
 
         self._update_progress("Locating URL input field...", 0.2)
         try:
-            url_input = WebDriverWait(self.driver, 5).until(
-                ec.visibility_of_element_located((By.ID, "url"))
-            )
+            return self._wait_for("url_input", ec.visibility_of_element_located((By.ID, "url")))
         except TimeoutException:
             self._update_progress("URL input field not found", 0.2, "error")
-            return
+            return None
+
+    def _resolve_in_browser(self, song_url: str) -> Optional[str]:
+        from selenium.webdriver.support import expected_conditions as ec
+
+        url_input = self._open_site()
+        if url_input is None:
+            return None
 
         url_input.clear()
         url_input.send_keys(song_url)
 
         self._update_progress("Submitting URL...", 0.3)
         try:
-            send_button = WebDriverWait(self.driver, 5).until(
-                ec.element_to_be_clickable((By.ID, "send"))
-            )
-            send_button.click()
-        except TimeoutException:
+            self._click(self._wait_for("submit", ec.element_to_be_clickable((By.ID, "send"))))
+        except (TimeoutException, ElementClickInterceptedException):
             self._update_progress("Send button not found", 0.3, "error")
-            return
+            return None
 
         self._update_progress("Locating download button...", 0.4)
         try:
-            download_button = WebDriverWait(self.driver, 5).until(
-                ec.element_to_be_clickable((By.XPATH, '//button[contains(.,"Download MP3")]'))
-            )
-            download_button.click()
-        except TimeoutException:
+            self._click(self._wait_for("mp3_button",
+                                       ec.element_to_be_clickable((By.XPATH, '//button[contains(.,"Download MP3")]'))))
+        except (TimeoutException, ElementClickInterceptedException):
             self._update_progress("Download MP3 button not found", 0.4, "error")
-            return
+            return None
 
         self._update_progress("Locating download link...", 0.5)
         try:
-            download_link = WebDriverWait(self.driver, 5).until(
-                ec.presence_of_element_located(
-                    (By.XPATH, '//a[contains(@class,"abutton") and contains(.,"Download Mp3")]')
-                )
-            )
+            download_link = self._wait_for("download_link", ec.presence_of_element_located(
+                (By.XPATH, '//a[contains(@class,"abutton") and contains(.,"Download Mp3")]')
+            ))
             download_url = download_link.get_attribute("href")
         except TimeoutException:
             self._update_progress("Download link not found", 0.5, "error")
-            return
+            return None
 
+        self.resolved_link = ResolvedLink(download_url)
+        return download_url
+
+    def _browser_request_headers(self) -> dict:
+        headers = {
+            "User-Agent": self.driver.execute_script("return navigator.userAgent"),
+            "Referer": self.driver.current_url,
+        }
+        cookies = "; ".join(f"{c['name']}={c['value']}" for c in self.driver.get_cookies())
+        if cookies:
+            headers["Cookie"] = cookies
+        return headers
+
+    def _transfer_request_headers(self) -> dict:
+        if self._transfer_headers is not None:
+            return self._transfer_headers
+        if self._lease is not None:
+            return self._browser_request_headers()
+        return self._default_request_headers()
+
+    def _transfer_over_http(self, download_url: str) -> bool:
         self._update_progress("Starting file download...", 0.6)
+        transfer = HttpTransfer()
+        stem = extract_track_id(self.song_url) or hashlib.sha1(download_url.encode()).hexdigest()[:16]
+        part_name = partial_name(stem, self.job_key, self.job_id)
+
+        def on_chunk(done: int, total: Optional[int], speed: float):
+            self.estimated_size = total
+            if total:
+                eta = (total - done) / speed if speed > 0 else None
+                progress = min(0.6 + (done / total) * 0.39, 0.99)
+                message = f"Downloaded {done / 1e6:.2f} MB of {total / 1e6:.2f} MB, Speed {speed / 1e3:.2f} KB/s"
+                if eta is not None:
+                    message += f", ETA {eta:.1f}s"
+            else:
+                progress = min(0.6 + (done / 10e6) * 0.3, 0.9)
+                message = f"Downloaded {done / 1e6:.2f} MB, Speed {speed / 1e3:.2f} KB/s"
+            self._update_progress(message, progress)
+
         try:
-            self.driver.get(download_url)
-        except TimeoutException:
-            self._update_progress("Failed to initiate download", 0.6, "error")
+            headers = self._transfer_request_headers()
+            with self.scheduler.host_slot(download_url, self.priority), \
+                    self._stage("transfer", mode=TRANSFER_HTTP) as stage:
+                self.downloaded_file = transfer.download(download_url,
+                                                         self.download_directory,
+                                                         part_name,
+                                                         headers=headers,
+                                                         progress_callback=on_chunk,
+                                                         throttle=self.scheduler.throttle(self.priority))
+                stage.labels["bytes"] = transfer.total_size
+            self.timeouts.observe_throughput(transfer.total_size, stage.elapsed)
+        except TransferError as e:
+            if e.status is not None and 400 <= e.status < 500:
+                self._link_rejected = True
+                track_id = extract_track_id(self.song_url)
+                if track_id is not None:
+                    self.link_cache.invalidate(track_id)
+            self._update_progress(f"Transfer failed: {e}", 0.6, "warning" if self._link_rejected else "error")
+            return False
+        except (HTTPError, OSError) as e:
+            self._update_progress(f"Transfer failed: {e}", 0.6, "error")
+            return False
+        self.estimated_size = transfer.total_size
+        return True
+
+    def _finalize_download(self, old_path: str):
+        clean_name = clean_filename(os.path.basename(old_path))
+
+        with self._stage("id3_parse"):
+            title, artist = read_tags(old_path, self.resolved_link)
+        with self._stage("tag_write"):
+            write_tags(old_path, title, artist)
+        if self.resolved_link is not None and self.resolved_link.cover_url:
+            with self._stage("cover_embed"):
+                embed_cover(old_path, self.resolved_link.cover_url)
+
+        with self._stage("rename"):
+            new_path = move_into_library(
+                old_path, self.download_directory, clean_name,
+                before_move=lambda target: mark_finalized(self.download_directory, os.path.basename(target)))
+        self.downloaded_file = new_path
+        with self._stage("history_write"):
+            add_entry(title, artist, self.song_url, new_path)
+        self._remove_staging()
+
+    def wait_for_download_completion(self,
+                                     timeout: Optional[float] = None,
+                                     estimated_size: Optional[int] = None) -> bool:
+        if self.skipped:
+            return True
+        if not self.downloaded_file and not self.await_download(timeout, estimated_size):
+            return False
+        self.finalize_download()
+        return True
+
+    def finalize_download(self):
+        self._finalize_download(self.downloaded_file)
+        self._update_progress("Download completed successfully!", 1.0, "success")
+
+    def finalize_later(self, postprocessor: PostProcessor, callback: Optional[Callable] = None):
+        self.release_browser()
+        self._update_progress("Tagging and filing...", 0.95)
+        return postprocessor.submit(self.finalize_download, callback)
+
+    def release_browser(self):
+        if self._lease is None:
             return
+        if self.transfer_mode == TRANSFER_HTTP and self._transfer_headers is None:
+            try:
+                self._transfer_headers = self._browser_request_headers()
+            except WebDriverException:
+                pass
+        self.pool.release(self._lease)
+        self._lease = None
 
-        time.sleep(1)
+    def await_download(self, timeout: Optional[float] = None, estimated_size: Optional[int] = None) -> bool:
+        if self.downloaded_file:
+            return True
 
-    def wait_for_download_completion(self, timeout: int = 60, estimated_size: Optional[int] = None):
+        estimated_size = estimated_size or self.estimated_size
         self._update_progress("Waiting for download to finish...", 0.65)
-        start_time = time.time()
-        end_time = start_time + timeout
+        if timeout is None:
+            timeout = self.timeouts.transfer_timeout(estimated_size)
+        end_time = time.time() + timeout
+
+        if self._watcher is None:
+            self._watcher = DownloadWatcher(self._staging_directory or self.download_directory).start()
+        watcher = self._watcher
 
         previous_size = None
         previous_time = None
+        wait_started = time.perf_counter()
 
-        while time.time() < end_time:
-            files = os.listdir(self.download_directory)
-            temp_files = [f for f in files if f.lower().endswith(".crdownload")]
-
-            if not temp_files:
-                mp3_files = [f for f in files if f.lower().endswith(".mp3")]
-                if mp3_files:
-                    self._update_progress("Download completed successfully!", 1.0, "success")
-                    for file in mp3_files:
-                        if file.startswith("SpotiDown.App - "):
-                            old_path = os.path.join(self.download_directory, file)
-                            clean_name = file.replace("SpotiDown.App - ", "")
-                            new_path = os.path.join(self.download_directory, clean_name)
-
-                            try:
-                                audio = EasyID3(old_path)
-                                artist = audio.get('artist', [''])[0]
-                                title = audio.get('title', [''])[0]
-                            except KeyError:
-                                filename_without_ext = os.path.splitext(clean_name)[0]
-                                if " - " in filename_without_ext:
-                                    artist, title = filename_without_ext.split(" - ", 1)
-                                else:
-                                    artist, title = "", filename_without_ext
-
-                            add_entry(title, artist, self.song_url, new_path)
-
-                            os.rename(old_path, new_path)
-                    return
-
-            if temp_files:
-                temp_file = temp_files[0]
-                temp_path = os.path.join(self.download_directory, temp_file)
-                current_size = os.path.getsize(temp_path)
-                current_time = time.time()
+        try:
+            while time.time() < end_time:
+                if watcher.wait(min(self.PROGRESS_INTERVAL, end_time - time.time())):
+                    elapsed = time.perf_counter() - wait_started
+                    size = os.path.getsize(watcher.completed_path)
+                    metrics.record("transfer", elapsed, job_id=self.job_id, mode=TRANSFER_BROWSER, bytes=size)
+                    self.timeouts.observe_throughput(size, elapsed)
+                    self.downloaded_file = watcher.completed_path
+                    return True
+
+                current_size = watcher.temp_size()
+                if current_size is None:
+                    self._update_progress("Searching for temporary download file...", 0.65)
+                    continue
 
+                current_time = time.time()
                 if previous_size is not None and current_time > previous_time:
                     bytes_delta = current_size - previous_size
                     time_delta = current_time - previous_time
 
                     if bytes_delta > 0:
+                        end_time = max(end_time, current_time + self.timeouts.stall_timeout)
                         speed = bytes_delta / time_delta
                         if estimated_size:
                             remaining = estimated_size - current_size
@@ -200,12 +589,22 @@ class Downloader:
 
                 previous_size = current_size
                 previous_time = current_time
-            else:
-                self._update_progress("Searching for temporary download file...", 0.65)
-
-            time.sleep(0.5)
+        finally:
+            self._close_watcher()
 
         self._update_progress("Download did not complete within the time limit", 0.9, "error")
+        return False
+
+    def _close_watcher(self):
+        if self._watcher is not None:
+            self._watcher.close()
+            self._watcher = None
 
     def close(self):
-        self.driver.quit()
\ No newline at end of file
+        self._close_watcher()
+        self._remove_staging()
+        if self._lease is not None:
+            self.pool.release(self._lease)
+            self._lease = None
+        if self._owns_pool:
+            self.pool.close()
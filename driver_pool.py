@@ -0,0 +1,447 @@
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from typing import Optional, Callable, Dict, Iterable, List, Set, Tuple, TYPE_CHECKING
+from urllib.parse import urlparse
+from selenium.common import WebDriverException, NoSuchWindowException
+from governor import BrowserGovernor, owner_environment
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+DEFAULT_BLOCKED_PATTERNS = (
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.mp4", "*.webm",
+    "*adsbygoogle*", "*googlesyndication.com*", "*doubleclick.net*", "*adservice.google.*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*fundingchoicesmessages.google.com*",
+    "*facebook.net*", "*hotjar.com*", "*clarity.ms*", "*cloudflareinsights.com*",
+    "*fonts.googleapis.com*", "*fonts.gstatic.com*",
+)
+
+
+class LitePageProfile:
+    def __init__(self,
+                 allowed_hosts: Iterable[str] = (),
+                 blocked_patterns: Iterable[str] = DEFAULT_BLOCKED_PATTERNS):
+        self.allowed_hosts = tuple(allowed_hosts)
+        self.blocked_patterns = tuple(blocked_patterns)
+
+    @classmethod
+    def for_site(cls,
+                 site_url: str,
+                 restrict_hosts: bool = True,
+                 extra_hosts: Iterable[str] = (),
+                 blocked_patterns: Iterable[str] = DEFAULT_BLOCKED_PATTERNS) -> "LitePageProfile":
+        if not restrict_hosts:
+            return cls((), blocked_patterns)
+        host = urlparse(site_url).hostname or ""
+        return cls((host, "*." + host) + tuple(extra_hosts), blocked_patterns)
+
+    def chrome_arguments(self) -> List[str]:
+        if not self.allowed_hosts:
+            return []
+        rules = ["MAP * ~NOTFOUND"] + [f"EXCLUDE {host}" for host in self.allowed_hosts]
+        return ["--host-resolver-rules=" + ", ".join(rules)]
+
+    def apply(self, driver: "webdriver.Chrome"):
+        if self.blocked_patterns:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(self.blocked_patterns)})
+
+
+def create_chrome_driver(download_directory: str = None,
+                         lite: Optional[LitePageProfile] = None) -> "webdriver.Chrome":
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service as ChromeService
+    from selenium.webdriver.chrome.options import Options
+
+    chrome_preferences = {
+        "download.default_directory": download_directory,
+        "download.prompt_for_download": False,
+        "download.directory_upgrade": True,
+        "safebrowsing.enabled": True,
+        "profile.managed_default_content_settings.images": 2,
+    }
+
+    chrome_options = Options()
+    chrome_options.add_experimental_option("prefs", chrome_preferences)
+    chrome_options.add_argument("--headless")
+    chrome_options.add_argument("--disable-gpu")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-extensions")
+    chrome_options.add_argument("--disable-popup-blocking")
+    chrome_options.add_argument("--window-size=1920,1080")
+    chrome_options.page_load_strategy = "eager"
+    if lite is not None:
+        for argument in lite.chrome_arguments():
+            chrome_options.add_argument(argument)
+
+    driver = webdriver.Chrome(service=ChromeService(env=owner_environment()), options=chrome_options)
+    driver.set_page_load_timeout(30)
+    if lite is not None:
+        try:
+            lite.apply(driver)
+        except WebDriverException:
+            driver.quit()
+            raise
+    return driver
+
+
+def set_download_behavior(driver: "webdriver.Chrome", download_directory: str):
+    context = getattr(driver, "browser_context_id", None)
+    if context is None:
+        driver.execute_cdp_cmd("Page.setDownloadBehavior", {
+            "behavior": "allow",
+            "downloadPath": download_directory,
+        })
+    else:
+        driver.execute_cdp_cmd("Browser.setDownloadBehavior", {
+            "behavior": "allow",
+            "downloadPath": download_directory,
+            "browserContextId": context,
+        })
+
+
+class PooledDriver:
+    def __init__(self, driver: "webdriver.Chrome", download_directory: str = None, lite: bool = False):
+        self.driver = driver
+        self.lite = lite
+        self.download_directory = download_directory
+        self.jobs = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.consent_accepted = False
+        self.ready_url: Optional[str] = None
+        self.rss: Optional[int] = None
+
+    def is_alive(self) -> bool:
+        try:
+            return bool(self.driver.window_handles)
+        except WebDriverException:
+            return False
+
+    def set_download_directory(self, download_directory: str):
+        if not download_directory or download_directory == self.download_directory:
+            return
+        set_download_behavior(self.driver, download_directory)
+        self.download_directory = download_directory
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except WebDriverException:
+            pass
+
+
+class DriverPool:
+    def __init__(self,
+                 max_size: int = 2,
+                 idle_timeout: float = 300.0,
+                 max_jobs_per_driver: int = 25,
+                 driver_factory: Optional[Callable[[Optional[str]], "webdriver.Chrome"]] = None,
+                 lite: Optional[LitePageProfile] = None,
+                 governor: Optional[BrowserGovernor] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_jobs_per_driver = max_jobs_per_driver
+        self.lite = lite
+        self.driver_factory = driver_factory or partial(create_chrome_driver, lite=lite)
+        self.governor = governor
+
+        self._idle: List[PooledDriver] = []
+        self._live: Set[PooledDriver] = set()
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._reaper = None
+
+    @property
+    def size(self) -> int:
+        with self._condition:
+            return self._size
+
+    @property
+    def idle_count(self) -> int:
+        with self._condition:
+            return len(self._idle)
+
+    def memory_usage(self) -> List[dict]:
+        if self.governor is None:
+            return []
+        with self._condition:
+            live = list(self._live)
+        return self.governor.usage(live)
+
+    def lease(self, download_directory: str = None, timeout: Optional[float] = None) -> PooledDriver:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            pooled, stale = self._acquire_slot(deadline)
+            self._quit_all(stale)
+
+            if pooled is None:
+                try:
+                    pooled = PooledDriver(self.driver_factory(download_directory), download_directory, self.lite is not None)
+                except Exception:
+                    self._discard_slot()
+                    raise
+                with self._condition:
+                    self._live.add(pooled)
+                self._start_reaper()
+                return pooled
+
+            if pooled.is_alive():
+                try:
+                    pooled.set_download_directory(download_directory)
+                    return pooled
+                except WebDriverException:
+                    pass
+
+            self._retire(pooled)
+            self._discard_slot()
+
+    def release(self, pooled: PooledDriver, healthy: bool = True, count_job: bool = True):
+        if count_job:
+            pooled.jobs += 1
+        pooled.last_used = time.monotonic()
+        over_limit = healthy and self.governor is not None and self.governor.over_limit(pooled)
+        with self._condition:
+            recycle = self._closed or not healthy or over_limit or pooled.jobs >= self.max_jobs_per_driver
+            if recycle:
+                self._size -= 1
+            else:
+                self._idle.append(pooled)
+            self._condition.notify()
+        if recycle:
+            self._retire(pooled)
+        if over_limit:
+            self._on_over_limit()
+
+    @contextmanager
+    def leased(self, download_directory: str = None, timeout: Optional[float] = None):
+        pooled = self.lease(download_directory, timeout)
+        healthy = True
+        try:
+            yield pooled
+        except WebDriverException:
+            healthy = False
+            raise
+        finally:
+            self.release(pooled, healthy)
+
+    def evict_idle(self):
+        with self._condition:
+            stale = self._pop_expired_locked()
+        self._quit_all(stale)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            stale = self._idle
+            self._idle = []
+            self._size -= len(stale)
+            self._condition.notify_all()
+        self._stopped.set()
+        self._quit_all(stale)
+
+    def _acquire_slot(self, deadline: Optional[float]) -> Tuple[Optional[PooledDriver], List[PooledDriver]]:
+        with self._condition:
+            stale = self._pop_expired_locked()
+            while True:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                if self._idle:
+                    return self._idle.pop(), stale
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, stale
+
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("No browser available in the driver pool")
+                self._condition.wait(remaining)
+
+    def _discard_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _pop_expired_locked(self) -> List[PooledDriver]:
+        now = time.monotonic()
+        expired = [p for p in self._idle if now - p.last_used >= self.idle_timeout]
+        if expired:
+            self._idle = [p for p in self._idle if p not in expired]
+            self._size -= len(expired)
+            self._condition.notify_all()
+        return expired
+
+    def _quit_all(self, drivers: List[PooledDriver]):
+        for pooled in drivers:
+            self._retire(pooled)
+
+    def _retire(self, pooled: PooledDriver):
+        with self._condition:
+            self._live.discard(pooled)
+        pooled.quit()
+
+    def _on_over_limit(self):
+        pass
+
+    def _start_reaper(self):
+        with self._condition:
+            if self._reaper is not None or self.idle_timeout <= 0:
+                return
+            self._reaper = threading.Thread(target=self._reap_idle, daemon=True)
+        self._reaper.start()
+
+    def _reap_idle(self):
+        interval = max(self.idle_timeout / 2, 1.0)
+        while not self._stopped.wait(interval):
+            self.evict_idle()
+
+
+class TabbedBrowser:
+    def __init__(self,
+                 browser_factory: Callable[[Optional[str]], "webdriver.Chrome"] = create_chrome_driver,
+                 lite: Optional[LitePageProfile] = None):
+        self.browser_factory = browser_factory
+        self.lite = lite
+        self.driver: Optional["webdriver.Chrome"] = None
+        self._handles = set()
+        self._contexts: Dict[str, str] = {}
+        self._home: Optional[str] = None
+        self._current: Optional[str] = None
+        self._lock = threading.RLock()
+
+    @property
+    def tab_count(self) -> int:
+        with self._lock:
+            return len(self._handles)
+
+    def open_tab(self, download_directory: str = None) -> "webdriver.Chrome":
+        with self._lock:
+            self._ensure_browser(download_directory)
+            handle = self._open_isolated_tab()
+
+            tab = copy.copy(self.driver)
+            tab.browser_context_id = self._contexts[handle]
+            tab.execute = lambda command, params=None: self._execute(handle, command, params)
+            tab.quit = lambda: self.close_tab(handle)
+            try:
+                if download_directory:
+                    set_download_behavior(tab, download_directory)
+                if self.lite is not None:
+                    self.lite.apply(tab)
+            except WebDriverException:
+                self.close_tab(handle)
+                raise
+            return tab
+
+    def close_tab(self, handle: str):
+        with self._lock:
+            if handle not in self._handles:
+                return
+            self._handles.discard(handle)
+            context = self._contexts.pop(handle, None)
+            self._current = None
+            if not self._handles:
+                self.quit()
+                return
+            try:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+                self.driver.switch_to.window(self._home)
+                self._current = self._home
+                if context is not None:
+                    self.driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context})
+            except WebDriverException:
+                pass
+
+    def quit(self):
+        with self._lock:
+            driver, self.driver = self.driver, None
+            self._handles.clear()
+            self._contexts.clear()
+            self._home = None
+            self._current = None
+        if driver is not None:
+            try:
+                driver.quit()
+            except WebDriverException:
+                pass
+
+    def _ensure_browser(self, download_directory: Optional[str]):
+        if self.driver is not None:
+            try:
+                if self.driver.window_handles:
+                    return
+            except WebDriverException:
+                pass
+            self.quit()
+        self.driver = self.browser_factory(download_directory)
+        self._home = self.driver.current_window_handle
+
+    def _open_isolated_tab(self) -> str:
+        if self._current != self._home:
+            self.driver.switch_to.window(self._home)
+            self._current = self._home
+        before = set(self.driver.window_handles)
+        context = self.driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+        try:
+            self.driver.execute_cdp_cmd("Target.createTarget", {"url": "about:blank", "browserContextId": context})
+            opened = set(self.driver.window_handles) - before
+            if len(opened) != 1:
+                raise WebDriverException("Could not find the tab opened in its own browser context")
+        except WebDriverException:
+            self.driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context})
+            raise
+        handle = opened.pop()
+        self.driver.switch_to.window(handle)
+        self._handles.add(handle)
+        self._contexts[handle] = context
+        self._current = handle
+        return handle
+
+    def _execute(self, handle: str, command: str, params: Optional[dict] = None):
+        with self._lock:
+            if handle not in self._handles or self.driver is None:
+                raise NoSuchWindowException(f"Tab {handle} is closed")
+            if self._current != handle:
+                self.driver.switch_to.window(handle)
+                self._current = handle
+            return self.driver.execute(command, params)
+
+
+class MultiplexedDriverPool(DriverPool):
+    def __init__(self,
+                 max_tabs: int = 4,
+                 idle_timeout: float = 300.0,
+                 max_jobs_per_driver: int = 25,
+                 browser_factory: Optional[Callable[[Optional[str]], "webdriver.Chrome"]] = None,
+                 lite: Optional[LitePageProfile] = None,
+                 governor: Optional[BrowserGovernor] = None):
+        self.browser = TabbedBrowser(browser_factory or partial(create_chrome_driver, lite=lite), lite)
+        super().__init__(max_size=max_tabs,
+                         idle_timeout=idle_timeout,
+                         max_jobs_per_driver=max_jobs_per_driver,
+                         driver_factory=self.browser.open_tab,
+                         lite=lite,
+                         governor=governor)
+
+    def close(self):
+        super().close()
+        if self.browser.tab_count == 0:
+            self.browser.quit()
+
+    def _on_over_limit(self):
+        with self._condition:
+            idle = self._idle
+            self._idle = []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        self._quit_all(idle)
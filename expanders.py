@@ -0,0 +1,184 @@
+import codecs
+import json
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional, Callable, Dict, Iterator, List
+import urllib3
+from urllib3.exceptions import HTTPError
+from history import find_entry_by_track_id
+from resolver import USER_AGENT
+from spotify_url import parse_collection_url, track_url
+from transfer import shared_pool_manager
+
+EMBED_URL = "https://open.spotify.com/embed/{kind}/{collection_id}"
+TRACK_URI = re.compile(r"spotify:track:([A-Za-z0-9]{22})")
+TRACK_URI_LENGTH = len("spotify:track:") + 22
+EMBED_TRACK_LIMIT = 100
+STREAM_CHUNK = 16 * 1024
+
+
+class ExpandError(Exception):
+    pass
+
+
+class CollectionExpander(ABC):
+    @abstractmethod
+    def expand(self, kind: str, collection_id: str) -> Iterator[str]:
+        pass
+
+
+class SpotifyEmbedExpander(CollectionExpander):
+    def __init__(self,
+                 embed_url: str = EMBED_URL,
+                 timeout: float = 15.0,
+                 http: Optional[urllib3.PoolManager] = None,
+                 track_limit: int = EMBED_TRACK_LIMIT):
+        self.embed_url = embed_url
+        self.timeout = timeout
+        self.http = http if http is not None else shared_pool_manager()
+        self.track_limit = track_limit
+
+    def expand(self, kind: str, collection_id: str) -> Iterator[str]:
+        url = self.embed_url.format(kind=kind, collection_id=collection_id)
+        try:
+            response = self.http.request("GET", url, headers={"User-Agent": USER_AGENT},
+                                         preload_content=False, timeout=self.timeout)
+        except HTTPError as e:
+            raise ExpandError(f"Could not load {kind}: {e}") from e
+        seen = set()
+        try:
+            if response.status != 200:
+                raise ExpandError(f"HTTP {response.status} while loading {kind}")
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            buffer = ""
+            for chunk in response.stream(STREAM_CHUNK):
+                buffer += decoder.decode(chunk)
+                end = 0
+                for match in TRACK_URI.finditer(buffer):
+                    end = match.end()
+                    if match.group(1) not in seen:
+                        seen.add(match.group(1))
+                        yield match.group(1)
+                buffer = buffer[max(end, len(buffer) - TRACK_URI_LENGTH):]
+        except HTTPError as e:
+            raise ExpandError(f"Could not load {kind}: {e}") from e
+        finally:
+            response.release_conn()
+        if self.track_limit and len(seen) >= self.track_limit:
+            raise ExpandError(f"The embed page lists only the first {len(seen)} tracks; "
+                              f"the rest of the {kind} was not queued")
+
+
+class FixtureExpander(CollectionExpander):
+    def __init__(self, collections: Optional[Dict[str, List[str]]] = None,
+                 path: Optional[str] = None, delay: float = 0.0):
+        self.collections = dict(collections or {})
+        if path is not None:
+            with open(path, "r", encoding="utf-8") as f:
+                self.collections.update(json.load(f))
+        self.delay = delay
+
+    def expand(self, kind: str, collection_id: str) -> Iterator[str]:
+        tracks = self.collections.get(f"{kind}:{collection_id}", self.collections.get(collection_id))
+        if tracks is None:
+            raise ExpandError(f"Unknown {kind}: {collection_id}")
+        for track_id in tracks:
+            if self.delay:
+                time.sleep(self.delay)
+            yield track_id
+
+
+_expander: Optional[CollectionExpander] = None
+
+
+def get_expander() -> CollectionExpander:
+    global _expander
+    if _expander is None:
+        _expander = SpotifyEmbedExpander()
+    return _expander
+
+
+def set_expander(expander: Optional[CollectionExpander]):
+    global _expander
+    _expander = expander
+
+
+class Expansion:
+    def __init__(self,
+                 url: str,
+                 submit: Callable[[str], object],
+                 expander: Optional[CollectionExpander] = None,
+                 skip_known: bool = True,
+                 on_update: Optional[Callable[["Expansion"], None]] = None,
+                 key: Optional[str] = None,
+                 cursor: int = 0):
+        parsed = parse_collection_url(url)
+        if parsed is None:
+            raise ValueError(f"Invalid Spotify playlist or album URL: {url}")
+        self.url = url
+        self.key = key or uuid.uuid4().hex
+        self.cursor = cursor
+        self.kind, self.collection_id = parsed
+        self.expander = expander if expander is not None else get_expander()
+        self.skip_known = skip_known
+        self.on_update = on_update
+        self.jobs: List[object] = []
+        self.found = 0
+        self.known = 0
+        self.error: Optional[str] = None
+        self._submit = submit
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def start(self) -> "Expansion":
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "kind": self.kind,
+            "found": self.found,
+            "known": self.known,
+            "queued": len(self.jobs),
+            "cursor": self.cursor,
+            "finished": self.finished,
+            "error": self.error,
+        }
+
+    def _run(self):
+        seen = set()
+        try:
+            for track_id in self.expander.expand(self.kind, self.collection_id):
+                if track_id in seen:
+                    continue
+                seen.add(track_id)
+                self.found += 1
+                if self.found <= self.cursor:
+                    continue
+                if self.skip_known and find_entry_by_track_id(track_id) is not None:
+                    self.known += 1
+                else:
+                    self.jobs.append(self._submit(track_url(track_id)))
+                self.cursor = self.found
+                self._notify()
+        except (ExpandError, ValueError, RuntimeError) as e:
+            self.error = str(e)
+        finally:
+            self._done.set()
+            self._notify()
+
+    def _notify(self):
+        if self.on_update is not None:
+            self.on_update(self)
@@ -0,0 +1,222 @@
+import os
+import signal
+import threading
+import time
+from typing import Optional, Dict, Iterable, List, Tuple
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+OWNER_VARIABLE = "SPOTIFY_DOWNLOADER_OWNER"
+BROWSER_NAMES = ("chrome", "chromium", "chromedriver", "headless_shell")
+MAX_BROWSER_RSS = 1_500_000_000
+SAMPLE_INTERVAL = 5.0
+
+PROCFS = os.path.isdir("/proc/self")
+SUPPORTED = psutil is not None or PROCFS
+
+
+def owner_environment() -> Dict[str, str]:
+    return dict(os.environ, **{OWNER_VARIABLE: str(os.getpid())})
+
+
+def driver_pid(driver) -> Optional[int]:
+    process = getattr(getattr(driver, "service", None), "process", None)
+    return getattr(process, "pid", None)
+
+
+def _read_proc(pid: int, name: str) -> Optional[bytes]:
+    try:
+        with open(f"/proc/{pid}/{name}", "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _all_pids() -> List[int]:
+    if psutil is not None:
+        return psutil.pids()
+    if PROCFS:
+        return [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    return []
+
+
+def _stat_ppid(stat: bytes) -> int:
+    return int(stat[stat.rfind(b")") + 2:].split()[1])
+
+
+def _parent_map() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    if psutil is not None:
+        for process in psutil.process_iter(["pid", "ppid"]):
+            children.setdefault(process.info["ppid"], []).append(process.info["pid"])
+        return children
+    for pid in _all_pids():
+        stat = _read_proc(pid, "stat")
+        if stat is None:
+            continue
+        children.setdefault(_stat_ppid(stat), []).append(pid)
+    return children
+
+
+def process_tree(pid: int) -> List[int]:
+    children = _parent_map()
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, ()))
+    return tree
+
+
+def process_rss(pid: int) -> int:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return 0
+    statm = _read_proc(pid, "statm")
+    return int(statm.split()[1]) * os.sysconf("SC_PAGE_SIZE") if statm else 0
+
+
+def tree_rss(pid: int) -> Tuple[int, int]:
+    tree = process_tree(pid)
+    return sum(process_rss(member) for member in tree), len(tree)
+
+
+def _process_name(pid: int) -> str:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).name()
+        except psutil.Error:
+            return ""
+    comm = _read_proc(pid, "comm")
+    return comm.decode("utf-8", "replace").strip() if comm else ""
+
+
+def _process_owner(pid: int) -> Optional[str]:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).environ().get(OWNER_VARIABLE)
+        except psutil.Error:
+            return None
+    environ = _read_proc(pid, "environ")
+    if not environ:
+        return None
+    prefix = OWNER_VARIABLE.encode("ascii") + b"="
+    for item in environ.split(b"\0"):
+        if item.startswith(prefix):
+            return item[len(prefix):].decode("ascii", "replace")
+    return None
+
+
+def _pid_alive(pid: int) -> bool:
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_child(pid: int) -> bool:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).ppid() == os.getpid()
+        except psutil.Error:
+            return False
+    stat = _read_proc(pid, "stat")
+    return stat is not None and _stat_ppid(stat) == os.getpid()
+
+
+def _kill(pid: int) -> bool:
+    child = hasattr(os, "WNOHANG") and _is_child(pid)
+    try:
+        os.kill(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+    except (ProcessLookupError, PermissionError):
+        return False
+    if child:
+        try:
+            os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            pass
+    return True
+
+
+def reap_orphans(at_exit: bool = False) -> List[int]:
+    own = str(os.getpid())
+    reaped = []
+    for pid in _all_pids():
+        if pid == os.getpid():
+            continue
+        owner = _process_owner(pid)
+        if owner is None or (owner == own and not at_exit):
+            continue
+        if owner != own and owner.isdigit() and _pid_alive(int(owner)):
+            continue
+        name = _process_name(pid).lower()
+        if any(browser in name for browser in BROWSER_NAMES) and _kill(pid):
+            reaped.append(pid)
+    return reaped
+
+
+class BrowserGovernor:
+    def __init__(self,
+                 max_rss: Optional[int] = MAX_BROWSER_RSS,
+                 sample_interval: float = SAMPLE_INTERVAL,
+                 reap_on_start: bool = True):
+        self.max_rss = max_rss
+        self.sample_interval = sample_interval
+        self.recycled = 0
+        self.reaped = reap_orphans() if reap_on_start and SUPPORTED else []
+        self._samples: Dict[int, Tuple[float, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def sample(self, pid: int, max_age: Optional[float] = None) -> Tuple[int, int]:
+        max_age = self.sample_interval if max_age is None else max_age
+        now = time.monotonic()
+        with self._lock:
+            cached = self._samples.get(pid)
+        if cached is not None and now - cached[0] < max_age:
+            return cached[1], cached[2]
+        rss, processes = tree_rss(pid) if SUPPORTED else (0, 0)
+        with self._lock:
+            self._samples[pid] = (now, rss, processes)
+        return rss, processes
+
+    def over_limit(self, pooled) -> bool:
+        pid = driver_pid(pooled.driver)
+        if pid is None or not self.max_rss or not SUPPORTED:
+            return False
+        pooled.rss, _ = self.sample(pid)
+        if pooled.rss <= self.max_rss:
+            return False
+        with self._lock:
+            self.recycled += 1
+            self._samples.pop(pid, None)
+        return True
+
+    def usage(self, drivers: Iterable) -> List[dict]:
+        browsers: Dict[int, dict] = {}
+        for pooled in drivers:
+            pid = driver_pid(pooled.driver)
+            if pid is None:
+                continue
+            browser = browsers.get(pid)
+            if browser is None:
+                rss, processes = self.sample(pid)
+                browser = browsers[pid] = {"pid": pid, "rss": rss, "processes": processes, "sessions": 0, "jobs": 0}
+            browser["sessions"] += 1
+            browser["jobs"] += pooled.jobs
+        return list(browsers.values())
+
+    def close(self, at_exit: bool = False):
+        with self._lock:
+            self._samples.clear()
+        if at_exit and SUPPORTED:
+            reap_orphans(at_exit=True)
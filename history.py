@@ -1,37 +1,159 @@
-import json
+import atexit
+import threading
 from pathlib import Path
 from datetime import datetime
+from typing import Optional, List, Tuple
+from history_search import query_terms, entry_matches
+from history_store import HistoryStore, BACKEND_JSONL, open_store, entry_key
+from spotify_url import extract_track_id
 
 HISTORY_FILE = "download_history.json"
+HISTORY_BACKEND = BACKEND_JSONL
+FLUSH_DELAY = 1.0
+FLUSH_BATCH_SIZE = 20
+
+class HistoryManager:
+    def __init__(self, store: HistoryStore, flush_delay: float = FLUSH_DELAY, batch_size: int = FLUSH_BATCH_SIZE):
+        self.store = store
+        self.flush_delay = flush_delay
+        self.batch_size = batch_size
+        self._pending: List[dict] = []
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+
+    def entries(self) -> List[dict]:
+        with self._lock:
+            return self.store.load_all() + list(self._pending)
+
+    def page(self, offset: int, limit: int, query: str = "") -> Tuple[int, List[dict]]:
+        with self._lock:
+            stored_total, entries = self.store.page(offset, limit, query)
+            terms = query_terms(query)
+            pending = [e for e in self._pending if entry_matches(e, terms)]
+            if len(entries) < limit:
+                start = max(offset - stored_total, 0)
+                entries = entries + pending[start:start + limit - len(entries)]
+            return stored_total + len(pending), entries
+
+    def search(self, query: str, limit: int = 50) -> List[dict]:
+        return self.page(0, limit, query)[1]
+
+    def prepare_search(self):
+        self.store.prepare_search()
+
+    def find_by_title_artist(self, title, artist) -> Optional[dict]:
+        with self._lock:
+            entry = self.store.find_by_title_artist(title, artist)
+            if entry is not None:
+                return entry
+            key = entry_key(title, artist)
+            return next((e for e in self._pending if entry_key(e.get("title"), e.get("artist")) == key), None)
+
+    def find_by_track_id(self, track_id: str) -> Optional[dict]:
+        with self._lock:
+            for entry in reversed(self._pending):
+                if extract_track_id(entry.get("url") or "") == track_id:
+                    return entry
+            return self.store.find_by_track_id(track_id)
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def replace_all(self, entries: List[dict]):
+        with self._lock:
+            self._cancel_timer()
+            self._pending = []
+            self.store.replace_all(list(entries))
+
+    def relink(self, track_id: str, filepath: str):
+        with self._lock:
+            self.flush()
+            self.store.relink(track_id, filepath)
+
+    def flush(self):
+        with self._lock:
+            self._cancel_timer()
+            if not self._pending:
+                return
+            batch = self._pending
+            self.store.append(batch)
+            self._pending = []
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self.store.close()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            if self._timer is not threading.current_thread():
+                self._timer.cancel()
+            self._timer = None
+
+_manager: Optional[HistoryManager] = None
+_manager_config = None
+_manager_lock = threading.Lock()
+
+def get_manager() -> HistoryManager:
+    global _manager, _manager_config
+    with _manager_lock:
+        config = (HISTORY_BACKEND, str(Path(HISTORY_FILE).resolve()))
+        if _manager is None or config != _manager_config:
+            if _manager is not None:
+                _manager.close()
+            _manager = HistoryManager(open_store(HISTORY_BACKEND, HISTORY_FILE))
+            _manager_config = config
+        return _manager
+
+def get_store() -> HistoryStore:
+    return get_manager().store
+
+def flush_history():
+    with _manager_lock:
+        manager = _manager
+    if manager is not None:
+        manager.flush()
+
+atexit.register(flush_history)
 
 def load_history():
-    history_file = Path(HISTORY_FILE)
-    if history_file.exists():
-        with open(history_file, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return data.get("download_history", [])
-    return []
+    return get_manager().entries()
+
+def history_page(offset, limit, query=""):
+    return get_manager().page(offset, limit, query)
+
+def search_history(query, limit=50):
+    return get_manager().search(query, limit)
+
+def prepare_history_search():
+    get_manager().prepare_search()
 
 def save_history(history):
-    history_file = Path(HISTORY_FILE)
-    data = {"download_history": history}
-    with open(history_file, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    get_manager().replace_all(history)
 
 def find_entry(title, artist):
-    history = load_history()
-    for entry in history:
-        if entry.get("title") == title and entry.get("artist") == artist:
-            return entry
-    return None
+    return get_manager().find_by_title_artist(title, artist)
+
+def find_entry_by_track_id(track_id):
+    return get_manager().find_by_track_id(track_id)
 
 def add_entry(title, artist, url, filepath):
-    history = load_history()
     entry = {
         "title": title,
         "artist": artist,
         "url": url,
         "file": str(filepath)
     }
-    history.append(entry)
-    save_history(history)
\ No newline at end of file
+    get_manager().add(entry)
+
+def relink_entry(url, filepath):
+    track_id = extract_track_id(url)
+    if track_id:
+        get_manager().relink(track_id, filepath)
@@ -0,0 +1,213 @@
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Optional, Callable, Dict, Iterable, Iterator, List, Sequence, Set
+from spotify_url import extract_track_id
+
+WORD = re.compile(r"\w+")
+COMBINING = re.compile("[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+UNDECOMPOSED = str.maketrans({"ø": "o", "æ": "ae", "œ": "oe", "ð": "d", "đ": "d", "ł": "l", "þ": "th", "ı": "i"})
+GRAM = 3
+BUILD_CHUNK = 1000
+DEADLINE_STRIDE = 256
+
+
+def fold(text) -> str:
+    text = str(text or "")
+    if text.isascii():
+        return " ".join(WORD.findall(text.lower()))
+    decomposed = unicodedata.normalize("NFKD", text.casefold().translate(UNDECOMPOSED))
+    return " ".join(WORD.findall(COMBINING.sub("", decomposed)))
+
+
+def entry_words(entry: dict) -> str:
+    return " ".join(filter(None, (fold(entry.get("title")), fold(entry.get("artist")))))
+
+
+def entry_track_id(entry: dict) -> Optional[str]:
+    track_id = extract_track_id(entry.get("url") or "")
+    return track_id.casefold() if track_id else None
+
+
+def query_terms(query: str) -> List[str]:
+    track_id = extract_track_id(query or "")
+    if track_id:
+        return [track_id.casefold()]
+    return fold(query).split()
+
+
+def term_matches(words: str, track_id: Optional[str], term: str) -> bool:
+    if term == track_id:
+        return True
+    if len(term) >= GRAM:
+        return term in words
+    return words.startswith(term) or " " + term in words
+
+
+def entry_matches(entry: dict, terms: List[str]) -> bool:
+    if not terms:
+        return True
+    if not isinstance(entry, dict):
+        return False
+    words, track_id = entry_words(entry), entry_track_id(entry)
+    return all(term_matches(words, track_id, term) for term in terms)
+
+
+def grams(word: str) -> Set[str]:
+    return {word[i:i + GRAM] for i in range(len(word) - GRAM + 1)}
+
+
+def _unique(positions: Iterator[int]) -> Iterator[int]:
+    last = None
+    for position in positions:
+        if position != last:
+            last = position
+            yield position
+
+
+class SearchResult:
+    def __init__(self, candidates: Iterable[int], size: int, match: Optional[Callable[[int], bool]] = None):
+        self.size = size
+        self._match = match
+        self._consumed = 0
+        if match is None and isinstance(candidates, (array, list, range)):
+            self._positions: Sequence[int] = candidates
+            self._source: Optional[Iterator[int]] = None
+        else:
+            self._positions = []
+            self._source = iter(candidates)
+
+    @property
+    def complete(self) -> bool:
+        return self._source is None
+
+    @property
+    def total(self) -> int:
+        found = len(self._positions)
+        if self._source is None:
+            return found
+        remaining = max(self.size - self._consumed, 0)
+        estimate = round(remaining * found / self._consumed) if self._consumed else remaining
+        return found + max(estimate, 1)
+
+    def fetch(self, count: int, deadline: Optional[float] = None):
+        positions, match = self._positions, self._match
+        if self._source is None or len(positions) >= count:
+            return
+        for position in self._source:
+            self._consumed += 1
+            if match is None or match(position):
+                positions.append(position)
+                if len(positions) >= count:
+                    if self._consumed >= self.size:
+                        self._source = None
+                    return
+            if deadline is not None and self._consumed % DEADLINE_STRIDE == 0 and time.monotonic() > deadline:
+                return
+        self._source = None
+
+    def page(self, offset: int, limit: int, deadline: Optional[float] = None) -> List[int]:
+        self.fetch(offset + limit, deadline)
+        return list(self._positions[offset:offset + limit])
+
+    def positions(self) -> List[int]:
+        self.fetch(self.size)
+        return list(self._positions)
+
+
+class SearchIndex:
+    def __init__(self, entries: Iterable[dict] = ()):
+        self._texts: List[str] = []
+        self._track_ids: List[Optional[str]] = []
+        self._postings: Dict[str, array] = {}
+        self._prefixes: Dict[str, array] = {}
+        self._track_postings: Dict[str, array] = {}
+        self._vocabulary: Dict[str, Set[str]] = {}
+        self._build_lock = threading.Lock()
+        for entry in entries:
+            self.add(entry)
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def add(self, entry: dict):
+        position = len(self._texts)
+        words, track_id = (entry_words(entry), entry_track_id(entry)) if isinstance(entry, dict) else ("", None)
+        self._track_ids.append(track_id)
+        self._texts.append(" " + words)
+        unique = set(words.split())
+        for word in unique:
+            posting = self._postings.get(word)
+            if posting is None:
+                posting = self._postings[word] = array("i")
+                for gram in grams(word):
+                    self._vocabulary.setdefault(gram, set()).add(word)
+            posting.append(position)
+        for prefix in {word[:n] for word in unique for n in range(1, GRAM)}:
+            self._prefixes.setdefault(prefix, array("i")).append(position)
+        if track_id:
+            self._track_postings.setdefault(track_id, array("i")).append(position)
+
+    def catch_up(self, entries: Sequence[dict], stop: int):
+        with self._build_lock:
+            for position in range(len(self._texts), min(stop, len(entries))):
+                self.add(entries[position])
+
+    def matches(self, position: int, terms: List[str]) -> bool:
+        words, track_id = self._texts[position], self._track_ids[position]
+        return all(term_matches(words, track_id, term) for term in terms)
+
+    def matching_words(self, term: str) -> List[str]:
+        groups = sorted((self._vocabulary.get(gram, ()) for gram in grams(term)), key=len)
+        if not groups or not groups[0]:
+            return []
+        candidates = groups[0].intersection(*groups[1:])
+        return [word for word in candidates if term in word]
+
+    def _term_postings(self, term: str) -> List[array]:
+        if len(term) < GRAM:
+            prefix = self._prefixes.get(term)
+            return [prefix] if prefix else []
+        postings = [self._postings[word] for word in self.matching_words(term)]
+        if term in self._track_postings:
+            postings.append(self._track_postings[term])
+        return postings
+
+    def search(self, query: str) -> SearchResult:
+        terms = list(dict.fromkeys(query_terms(query)))
+        if not terms:
+            return SearchResult(range(len(self._texts)), len(self._texts))
+        postings = {}
+        for term in terms:
+            postings[term] = self._term_postings(term)
+            if not postings[term]:
+                return SearchResult([], 0)
+        terms.sort(key=lambda t: sum(len(posting) for posting in postings[t]))
+        first = postings[terms[0]]
+        candidates = first[0] if len(first) == 1 else _unique(heapq.merge(*first))
+        size = sum(len(posting) for posting in first)
+        texts, track_ids = self._texts, self._track_ids
+        checks = [(term if len(term) >= GRAM else " " + term, term) for term in terms[1:]]
+        if not checks:
+            return SearchResult(candidates, size)
+        if len(checks) == 1:
+            needle, term = checks[0]
+            return SearchResult(candidates, size, lambda i: needle in texts[i] or track_ids[i] == term)
+        return SearchResult(candidates, size,
+                            lambda i: all(needle in texts[i] or track_ids[i] == term for needle, term in checks))
+
+
+def scan(entries: List[dict], query: str, partial: Optional[SearchIndex] = None) -> SearchResult:
+    terms = query_terms(query)
+
+    def match(position: int) -> bool:
+        if partial is None:
+            return entry_matches(entries[position], terms)
+        if position >= len(partial):
+            partial.catch_up(entries, position + BUILD_CHUNK)
+        return partial.matches(position, terms)
+
+    return SearchResult(range(len(entries)), len(entries), match)
@@ -0,0 +1,425 @@
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, List, Iterable, Tuple
+from history_search import SearchIndex, SearchResult, scan, BUILD_CHUNK
+from spotify_url import extract_track_id
+
+BACKEND_JSON = "json"
+BACKEND_JSONL = "jsonl"
+BACKEND_SQLITE = "sqlite"
+
+ENTRY_FIELDS = ("title", "artist", "url", "file")
+SCAN_BUDGET = 0.05
+
+
+def entry_key(title, artist):
+    return (title or "").strip().casefold(), (artist or "").strip().casefold()
+
+
+def _write_atomic(path: Path, text: str):
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class HistoryIndex:
+    def __init__(self, entries: Iterable[dict] = ()):
+        self.by_track_id = {}
+        self.by_title_artist = {}
+        for entry in entries:
+            self.add(entry)
+
+    def add(self, entry: dict):
+        if not isinstance(entry, dict):
+            return
+        track_id = extract_track_id(entry.get("url") or "")
+        if track_id:
+            self.by_track_id[track_id] = entry
+        self.by_title_artist.setdefault(entry_key(entry.get("title"), entry.get("artist")), entry)
+
+
+class HistoryStore(ABC):
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._entries: Optional[List[dict]] = None
+        self._index: Optional[HistoryIndex] = None
+        self._search: Optional[SearchIndex] = None
+        self._search_build: Optional[threading.Thread] = None
+        self._partial_search: Optional[SearchIndex] = None
+        self._stamp = None
+        self._last_match: Optional[Tuple[str, SearchResult]] = None
+
+    def stamp(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def is_empty(self) -> bool:
+        return not self.path.exists()
+
+    def load_all(self) -> List[dict]:
+        with self._lock:
+            self._refresh()
+            return list(self._entries)
+
+    def find_by_track_id(self, track_id: str) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self._index.by_track_id.get(track_id)
+
+    def find_by_title_artist(self, title, artist) -> Optional[dict]:
+        with self._lock:
+            self._refresh()
+            return self._index.by_title_artist.get(entry_key(title, artist))
+
+    def page(self, offset: int, limit: int, query: str = "") -> Tuple[int, List[dict]]:
+        query = query.strip()
+        with self._lock:
+            self._refresh()
+            if not query:
+                return len(self._entries), self._entries[offset:offset + limit]
+            self._start_search_build()
+            result = self._matching(query)
+            deadline = None if self._search is not None else time.monotonic() + SCAN_BUDGET
+            positions = result.page(offset, limit, deadline)
+            return result.total, [self._entries[i] for i in positions]
+
+    def prepare_search(self, wait: bool = False):
+        with self._lock:
+            self._refresh()
+            build = self._start_search_build()
+        if wait and build is not None:
+            build.join()
+
+    def _start_search_build(self) -> Optional[threading.Thread]:
+        if self._search is None and self._search_build is None:
+            self._partial_search = SearchIndex()
+            self._search_build = threading.Thread(target=self._build_search,
+                                                  args=(self._entries, len(self._entries), self._partial_search),
+                                                  daemon=True)
+            self._search_build.start()
+        return self._search_build
+
+    def _build_search(self, entries: List[dict], snapshot: int, index: SearchIndex):
+        for stop in range(BUILD_CHUNK, snapshot + BUILD_CHUNK, BUILD_CHUNK):
+            index.catch_up(entries, min(stop, snapshot))
+        with self._lock:
+            if self._search_build is threading.current_thread():
+                self._search_build = None
+            if self._partial_search is index:
+                self._partial_search = None
+            if self._search is None and self._entries is entries:
+                index.catch_up(entries, len(entries))
+                self._search = index
+                self._last_match = None
+
+    def _matching(self, query: str) -> SearchResult:
+        if self._last_match is not None and self._last_match[0] == query:
+            return self._last_match[1]
+        if self._search is not None:
+            result = self._search.search(query)
+        else:
+            result = scan(self._entries, query, self._partial_search)
+        self._last_match = (query, result)
+        return result
+
+    def append(self, entries: List[dict]):
+        with self._lock:
+            self._refresh()
+            self._write_append(entries)
+            self._extend_cache(entries)
+
+    def replace_all(self, entries: List[dict]):
+        with self._lock:
+            self._write_all(entries)
+            self._set_cache(list(entries))
+
+    def relink(self, track_id: str, filepath: str):
+        with self._lock:
+            entries = self.load_all()
+            for entry in entries:
+                if isinstance(entry, dict) and extract_track_id(entry.get("url") or "") == track_id:
+                    entry["file"] = str(filepath)
+            self.replace_all(entries)
+
+    def close(self):
+        pass
+
+    def _refresh(self):
+        stamp = self.stamp()
+        if self._entries is None or stamp != self._stamp:
+            self._set_cache(self._read_all())
+
+    def _set_cache(self, entries: List[dict]):
+        self._entries = entries
+        self._index = HistoryIndex(entries)
+        self._search = None
+        self._search_build = None
+        self._partial_search = None
+        self._last_match = None
+        self._stamp = self.stamp()
+
+    def _extend_cache(self, entries: List[dict]):
+        self._entries.extend(entries)
+        for entry in entries:
+            self._index.add(entry)
+            if self._search is not None:
+                self._search.add(entry)
+        self._last_match = None
+        self._stamp = self.stamp()
+
+    @abstractmethod
+    def _read_all(self) -> List[dict]:
+        pass
+
+    @abstractmethod
+    def _write_all(self, entries: List[dict]):
+        pass
+
+    def _write_append(self, entries: List[dict]):
+        self._write_all(self._entries + list(entries))
+
+
+class JsonHistoryStore(HistoryStore):
+    def _read_all(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data.get("download_history", [])
+
+    def _write_all(self, entries: List[dict]):
+        _write_atomic(self.path, json.dumps({"download_history": entries}, indent=4, ensure_ascii=False))
+
+
+class JsonLinesHistoryStore(HistoryStore):
+    def __init__(self, path: str, compact_after: int = 500):
+        super().__init__(path)
+        self.compact_after = compact_after
+        self._garbage = 0
+
+    def _read_all(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        entries = []
+        self._garbage = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    self._garbage += 1
+                    continue
+                if not isinstance(record, dict):
+                    self._garbage += 1
+                    continue
+                if record.get("op") == "relink":
+                    self._garbage += 1
+                    for entry in entries:
+                        if extract_track_id(entry.get("url") or "") == record.get("track_id"):
+                            entry["file"] = record.get("file")
+                else:
+                    entries.append(record)
+        return entries
+
+    def _write_all(self, entries: List[dict]):
+        _write_atomic(self.path, "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries))
+        self._garbage = 0
+
+    def _write_append(self, entries: List[dict]):
+        self._append_lines(entries)
+
+    def _append_lines(self, records: List[dict]):
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+        with open(self.path, "a+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    data = b"\n" + data
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def relink(self, track_id: str, filepath: str):
+        with self._lock:
+            self._refresh()
+            self._append_lines([{"op": "relink", "track_id": track_id, "file": str(filepath)}])
+            self._garbage += 1
+            for entry in self._entries:
+                if extract_track_id(entry.get("url") or "") == track_id:
+                    entry["file"] = str(filepath)
+            self._last_match = None
+            self._stamp = self.stamp()
+            if self._garbage >= self.compact_after:
+                self.compact()
+
+    def compact(self):
+        with self._lock:
+            self._refresh()
+            self._write_all(self._entries)
+            self._stamp = self.stamp()
+
+
+class SqliteHistoryStore(HistoryStore):
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT,
+            artist TEXT,
+            url TEXT,
+            file TEXT,
+            track_id TEXT,
+            title_key TEXT,
+            artist_key TEXT
+        );
+        CREATE INDEX IF NOT EXISTS history_track_id ON history (track_id);
+        CREATE INDEX IF NOT EXISTS history_artist_title ON history (artist_key, title_key);
+    """
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._connection: Optional[sqlite3.Connection] = None
+        self._changes = 0
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._connect().execute("SELECT 1 FROM history LIMIT 1").fetchone() is None
+
+    def stamp(self):
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0], self._changes
+
+    def find_by_track_id(self, track_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT title, artist, url, file FROM history WHERE track_id = ? ORDER BY id DESC LIMIT 1",
+                (track_id,)).fetchone()
+        return dict(zip(ENTRY_FIELDS, row)) if row else None
+
+    def find_by_title_artist(self, title, artist) -> Optional[dict]:
+        title_key, artist_key = entry_key(title, artist)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT title, artist, url, file FROM history WHERE artist_key = ? AND title_key = ? "
+                "ORDER BY id LIMIT 1",
+                (artist_key, title_key)).fetchone()
+        return dict(zip(ENTRY_FIELDS, row)) if row else None
+
+    def page(self, offset: int, limit: int, query: str = "") -> Tuple[int, List[dict]]:
+        if query.strip():
+            return super().page(offset, limit, query)
+        with self._lock:
+            connection = self._connect()
+            total = connection.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+            rows = connection.execute("SELECT title, artist, url, file FROM history ORDER BY id LIMIT ? OFFSET ?",
+                                      (limit, offset)).fetchall()
+        return total, [dict(zip(ENTRY_FIELDS, row)) for row in rows]
+
+    def append(self, entries: List[dict]):
+        with self._lock:
+            cached = self._entries is not None and self.stamp() == self._stamp
+            self._write_append(entries)
+            if cached:
+                self._extend_cache(entries)
+            else:
+                self._entries = None
+
+    def relink(self, track_id: str, filepath: str):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("UPDATE history SET file = ? WHERE track_id = ?", (str(filepath), track_id))
+            self._changes += 1
+            self._entries = None
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def _read_all(self) -> List[dict]:
+        rows = self._connect().execute("SELECT title, artist, url, file FROM history ORDER BY id").fetchall()
+        return [dict(zip(ENTRY_FIELDS, row)) for row in rows]
+
+    @staticmethod
+    def _row(entry: dict) -> tuple:
+        title_key, artist_key = entry_key(entry.get("title"), entry.get("artist"))
+        return (entry.get("title"), entry.get("artist"), entry.get("url"), entry.get("file"),
+                extract_track_id(entry.get("url") or ""), title_key, artist_key)
+
+    def _write_all(self, entries: List[dict]):
+        connection = self._connect()
+        with connection:
+            connection.execute("DELETE FROM history")
+            connection.executemany(
+                "INSERT INTO history (title, artist, url, file, track_id, title_key, artist_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(e) for e in entries if isinstance(e, dict)])
+        self._changes += 1
+
+    def _write_append(self, entries: List[dict]):
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO history (title, artist, url, file, track_id, title_key, artist_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(e) for e in entries])
+        self._changes += 1
+
+
+STORE_TYPES = {
+    BACKEND_JSON: (JsonHistoryStore, ".json"),
+    BACKEND_JSONL: (JsonLinesHistoryStore, ".jsonl"),
+    BACKEND_SQLITE: (SqliteHistoryStore, ".sqlite3"),
+}
+
+
+def open_store(backend: str, legacy_file: str) -> HistoryStore:
+    if backend not in STORE_TYPES:
+        raise ValueError(f"Unknown history backend: {backend}")
+    store_type, suffix = STORE_TYPES[backend]
+    legacy_path = Path(legacy_file)
+    store = store_type(str(legacy_path.with_suffix(suffix)))
+    if backend != BACKEND_JSON:
+        migrate_legacy_json(legacy_path, store)
+    return store
+
+
+def backup_path(path: Path) -> Path:
+    backup = path.with_name(path.name + ".migrated")
+    counter = 1
+    while backup.exists():
+        backup = path.with_name(f"{path.name}.migrated.{counter}")
+        counter += 1
+    return backup
+
+
+def migrate_legacy_json(legacy_path: Path, store: HistoryStore):
+    if not legacy_path.exists() or not store.is_empty():
+        return
+    entries = JsonHistoryStore(str(legacy_path)).load_all()
+    store.replace_all([e for e in entries if isinstance(e, dict)])
+    legacy_path.replace(backup_path(legacy_path))
@@ -0,0 +1,283 @@
+import math
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import customtkinter as ctk
+
+
+class HistoryRow(ctk.CTkFrame):
+    def __init__(self, master, colors: dict, height: int, on_open_url: Callable, on_open_file: Callable):
+        super().__init__(master,
+                         height=height,
+                         fg_color=colors['card'],
+                         corner_radius=10,
+                         border_width=1,
+                         border_color=colors['border'])
+        self.colors = colors
+        self.on_open_url = on_open_url
+        self.on_open_file = on_open_file
+        self.entry: Optional[dict] = None
+        self.pack_propagate(False)
+
+        main_frame = ctk.CTkFrame(self, fg_color="transparent")
+        main_frame.pack(fill="both", expand=True, padx=15, pady=10)
+        main_frame.grid_columnconfigure(1, weight=1)
+
+        track_icon = ctk.CTkLabel(main_frame, text="🎵", font=ctk.CTkFont(size=16))
+        track_icon.grid(row=0, column=0, sticky="nw", padx=(0, 10))
+
+        info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
+        info_frame.grid(row=0, column=1, sticky="ew")
+        info_frame.grid_columnconfigure(0, weight=1)
+
+        self.header = ctk.CTkLabel(info_frame,
+                                   text="",
+                                   font=ctk.CTkFont(size=14, weight="bold"),
+                                   text_color=colors['text_primary'],
+                                   anchor="w")
+        self.header.grid(row=0, column=0, sticky="w", pady=(0, 5))
+
+        self.url_label = ctk.CTkLabel(info_frame,
+                                      text="",
+                                      font=ctk.CTkFont(size=11),
+                                      text_color=colors['primary'],
+                                      anchor="w",
+                                      cursor="hand2")
+        self.url_label.grid(row=1, column=0, sticky="w", pady=(0, 3))
+        self.url_label.bind("<Button-1>", self._open_url)
+
+        self.file_label = ctk.CTkLabel(info_frame,
+                                       text="",
+                                       font=ctk.CTkFont(size=11),
+                                       anchor="w")
+        self.file_label.grid(row=2, column=0, sticky="w")
+        self.file_label.bind("<Button-1>", self._open_file)
+
+    def show(self, entry: dict):
+        self.entry = entry
+        title = entry.get("title", "Unknown Title")
+        artist = entry.get("artist", "Unknown Artist")
+        url = entry.get("url", "")
+        file_path = entry.get("file", "")
+
+        header_text = f"{artist} - {title}"
+        if len(header_text) > 60:
+            header_text = header_text[:57] + "..."
+        self.header.configure(text=header_text)
+
+        display_url = url[:60] + "..." if len(url) > 60 else url
+        self.url_label.configure(text=f"🔗 {display_url}" if url else "")
+
+        if file_path and os.path.exists(file_path):
+            file_name = Path(file_path).name
+            if len(file_name) > 60:
+                file_name = file_name[:57] + "..."
+            self.file_label.configure(text=f"📁 {file_name}",
+                                      text_color=self.colors['text_secondary'],
+                                      cursor="hand2")
+        else:
+            self.file_label.configure(text="File not found", text_color=self.colors['error'], cursor="")
+
+    def _open_url(self, _event):
+        if self.entry and self.entry.get("url"):
+            self.on_open_url(self.entry["url"])
+
+    def _open_file(self, _event):
+        file_path = self.entry.get("file") if self.entry else None
+        if file_path and os.path.exists(file_path):
+            self.on_open_file(file_path)
+
+
+class HistoryListView(ctk.CTkFrame):
+    ROW_HEIGHT = 92
+    ROW_GAP = 10
+    PAGE_SIZE = 50
+    MAX_CACHED_PAGES = 8
+    SEARCH_DELAY_MS = 60
+    SEARCH_POLL_MS = 30
+
+    def __init__(self,
+                 master,
+                 colors: dict,
+                 loader: Callable[[int, int, str], Tuple[int, List[dict]]],
+                 on_open_url: Callable,
+                 on_open_file: Callable):
+        super().__init__(master, fg_color="transparent")
+        self.colors = colors
+        self.loader = loader
+        self.on_open_url = on_open_url
+        self.on_open_file = on_open_file
+
+        self.query = ""
+        self.total = 0
+        self.first_index = 0
+        self._pages: Dict[int, List[dict]] = {}
+        self._rows: List[HistoryRow] = []
+        self._search_job = None
+        self._poll_job = None
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+
+        self.search_entry = ctk.CTkEntry(self,
+                                         placeholder_text="🔍 Search by title, artist or link...",
+                                         font=ctk.CTkFont(size=13),
+                                         height=36,
+                                         fg_color=colors['background'],
+                                         border_color=colors['border'],
+                                         placeholder_text_color=colors['text_secondary'])
+        self.search_entry.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 10))
+        self.search_entry.bind("<KeyRelease>", self._on_search_key)
+
+        self.viewport = ctk.CTkFrame(self, fg_color=colors['background'], corner_radius=8)
+        self.viewport.grid(row=1, column=0, sticky="nsew")
+        self.viewport.bind("<Configure>", self._on_resize)
+
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky="ns", padx=(5, 0))
+
+        self.empty_label = ctk.CTkLabel(self.viewport,
+                                        text="",
+                                        font=ctk.CTkFont(size=16, weight="bold"),
+                                        text_color=colors['text_secondary'])
+
+        for widget in (self.viewport, self.scrollbar):
+            widget.bind("<Enter>", self._bind_wheel)
+            widget.bind("<Leave>", self._unbind_wheel)
+
+    def refresh(self):
+        self._pages.clear()
+        self.total, first_page = self.loader(0, self.PAGE_SIZE, self.query)
+        self._pages[0] = first_page
+        self._poll_if_short(0, first_page)
+        self.first_index = min(self.first_index, self._max_first_index())
+        self._render()
+
+    def reset(self):
+        self.first_index = 0
+        self.refresh()
+
+    @property
+    def visible_rows(self) -> int:
+        height = max(self.viewport.winfo_height(), self.ROW_HEIGHT)
+        return max(1, math.ceil(height / (self.ROW_HEIGHT + self.ROW_GAP)))
+
+    def scroll_to(self, index: int):
+        index = max(0, min(index, self._max_first_index()))
+        if index != self.first_index:
+            self.first_index = index
+            self._render()
+
+    def _max_first_index(self) -> int:
+        full_rows = max(1, self.viewport.winfo_height() // (self.ROW_HEIGHT + self.ROW_GAP))
+        return max(0, self.total - full_rows)
+
+    def _entry_at(self, index: int) -> Optional[dict]:
+        page_number = index // self.PAGE_SIZE
+        page = self._pages.get(page_number)
+        if page is None:
+            if len(self._pages) >= self.MAX_CACHED_PAGES:
+                farthest = max(self._pages, key=lambda n: abs(n - page_number))
+                del self._pages[farthest]
+            self.total, page = self.loader(page_number * self.PAGE_SIZE, self.PAGE_SIZE, self.query)
+            self._pages[page_number] = page
+            self._poll_if_short(page_number, page)
+        offset = index - page_number * self.PAGE_SIZE
+        return page[offset] if offset < len(page) else None
+
+    def _poll_if_short(self, page_number: int, page: List[dict]):
+        if self._poll_job is None and len(page) < min(self.PAGE_SIZE, self.total - page_number * self.PAGE_SIZE):
+            self._poll_job = self.after(self.SEARCH_POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        self.refresh()
+
+    def _ensure_rows(self, count: int):
+        while len(self._rows) < count:
+            row = HistoryRow(self.viewport, self.colors, self.ROW_HEIGHT, self.on_open_url, self.on_open_file)
+            for widget in self._widget_tree(row):
+                widget.bind("<Enter>", self._bind_wheel, add="+")
+            self._rows.append(row)
+
+    def _render(self):
+        rows_needed = self.visible_rows
+        self._ensure_rows(rows_needed)
+
+        if self.total == 0:
+            self.empty_label.configure(text="No matching downloads" if self.query else "📭 No downloads yet")
+            self.empty_label.place(relx=0.5, rely=0.3, anchor="center")
+        else:
+            self.empty_label.place_forget()
+
+        y = 0
+        for i, row in enumerate(self._rows):
+            entry = self._entry_at(self.first_index + i) if i < rows_needed else None
+            if entry is None or not isinstance(entry, dict):
+                row.place_forget()
+                continue
+            row.show(entry)
+            row.place(relx=0.5, y=y + self.ROW_GAP, anchor="n", relwidth=0.97)
+            y += self.ROW_HEIGHT + self.ROW_GAP
+
+        if self.first_index > self._max_first_index():
+            self.first_index = self._max_first_index()
+            self._render()
+            return
+
+        if self.total:
+            start = self.first_index / self.total
+            end = min(1.0, (self.first_index + rows_needed) / self.total)
+            self.scrollbar.set(start, end)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _on_resize(self, _event):
+        self._render()
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total))
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.scroll_to(self.first_index + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if getattr(event, "num", None) == 4:
+            delta = -1
+        elif getattr(event, "num", None) == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.scroll_to(self.first_index + delta)
+
+    def _bind_wheel(self, _event=None):
+        self.bind_all("<MouseWheel>", self._on_wheel)
+        self.bind_all("<Button-4>", self._on_wheel)
+        self.bind_all("<Button-5>", self._on_wheel)
+
+    def _unbind_wheel(self, _event=None):
+        self.unbind_all("<MouseWheel>")
+        self.unbind_all("<Button-4>")
+        self.unbind_all("<Button-5>")
+
+    def _on_search_key(self, _event):
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(self.SEARCH_DELAY_MS, self._apply_search)
+
+    def _apply_search(self):
+        self._search_job = None
+        query = self.search_entry.get().strip()
+        if query != self.query:
+            self.query = query
+            self.reset()
+
+    @staticmethod
+    def _widget_tree(widget) -> list:
+        widgets = [widget]
+        for child in widget.winfo_children():
+            widgets.extend(HistoryListView._widget_tree(child))
+        return widgets
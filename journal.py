@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, List
+import history
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+JOURNAL_FILE = "download_jobs.jsonl"
+LOCK_SUFFIX = ".lock"
+
+
+class JournalError(Exception):
+    pass
+
+
+def default_journal_path() -> str:
+    return str(Path(history.HISTORY_FILE).resolve().with_name(JOURNAL_FILE))
+
+
+def _lock_file(path: str):
+    lock = open(path, "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            lock.seek(0)
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        lock.close()
+        raise JournalError(f"Job journal {path[:-len(LOCK_SUFFIX)]} is in use by another process")
+    return lock
+
+
+class JobJournal:
+    def __init__(self, path: Optional[str] = None, sync: bool = True, compact_after: int = 500):
+        self.path = path or default_journal_path()
+        self.sync = sync
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        self._pending: Dict[str, dict] = {}
+        self._appended = 0
+        self._file = None
+        self._lock_handle = _lock_file(self.path + LOCK_SUFFIX)
+        self._load()
+        self.compact()
+
+    def record(self, key: str, url: str, directory: str, state: str, finished: bool = False,
+               error: Optional[str] = None, cursor: Optional[int] = None):
+        entry = {"key": key, "url": url, "directory": directory, "state": state, "ts": time.time()}
+        if finished:
+            entry["finished"] = True
+        if error:
+            entry["error"] = error
+        if cursor is not None:
+            entry["cursor"] = cursor
+        with self._lock:
+            if self._file is None:
+                return
+            if finished:
+                self._pending.pop(key, None)
+            else:
+                self._pending[key] = entry
+            self._reopen_if_replaced()
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            if self.sync:
+                os.fsync(self._file.fileno())
+            self._appended += 1
+            if self._appended >= self.compact_after:
+                self._rewrite()
+
+    def unfinished(self) -> List[dict]:
+        with self._lock:
+            return list(self._pending.values())
+
+    def compact(self):
+        with self._lock:
+            self._rewrite()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._lock_handle is not None:
+                self._lock_handle.close()
+                self._lock_handle = None
+
+    def _reopen_if_replaced(self):
+        try:
+            replaced = not os.path.samestat(os.fstat(self._file.fileno()), os.stat(self.path))
+        except FileNotFoundError:
+            replaced = True
+        if replaced:
+            self._rewrite()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        key = entry["key"]
+                    except (ValueError, KeyError, TypeError):
+                        continue
+                    if entry.get("finished"):
+                        self._pending.pop(key, None)
+                    else:
+                        self._pending[key] = entry
+        except FileNotFoundError:
+            pass
+
+    def _rewrite(self):
+        if self._file is not None:
+            self._file.close()
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for entry in self._pending.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._appended = 0
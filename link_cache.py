@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+from resolver import ResolvedLink
+
+CACHE_FILE = "link_cache.json"
+
+
+class LinkCache:
+    def __init__(self, path: str = CACHE_FILE, ttl: float = 3600.0, max_entries: int = 500):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._loaded = False
+        self._lock = threading.RLock()
+
+    def get(self, track_id: str) -> Optional[ResolvedLink]:
+        with self._lock:
+            self._load()
+            entry = self._entries.get(track_id)
+            if entry is None:
+                return None
+            if time.time() - entry.get("resolved_at", 0) > self.ttl:
+                del self._entries[track_id]
+                self._save()
+                return None
+            self._entries.move_to_end(track_id)
+            return ResolvedLink(entry["download_url"],
+                                title=entry.get("title"),
+                                artist=entry.get("artist"),
+                                cover_url=entry.get("cover_url"))
+
+    def put(self, track_id: str, link: ResolvedLink):
+        with self._lock:
+            self._load()
+            self._entries[track_id] = {
+                "download_url": link.download_url,
+                "title": link.title,
+                "artist": link.artist,
+                "cover_url": link.cover_url,
+                "resolved_at": time.time(),
+            }
+            self._entries.move_to_end(track_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def invalidate(self, track_id: str):
+        with self._lock:
+            self._load()
+            if self._entries.pop(track_id, None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._loaded = True
+            self._save()
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        entries = data.get("links", {}) if isinstance(data, dict) else {}
+        now = time.time()
+        for track_id, entry in entries.items():
+            if isinstance(entry, dict) and entry.get("download_url") and now - entry.get("resolved_at", 0) <= self.ttl:
+                self._entries[track_id] = entry
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _save(self):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump({"links": self._entries}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+
+_default_cache: Optional[LinkCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_link_cache() -> LinkCache:
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LinkCache()
+        return _default_cache
@@ -0,0 +1,194 @@
+import bisect
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Callable, Dict, List
+
+BUCKET_BOUNDS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Histogram:
+    def __init__(self, sample_size: int = 2048):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.samples = deque(maxlen=sample_size)
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": dict(zip([str(b) for b in BUCKET_BOUNDS] + ["+Inf"], self.counts)),
+        }
+
+
+class StageTimer:
+    def __init__(self, registry: "MetricsRegistry", stage: str, job_id=None, **labels):
+        self.registry = registry
+        self.stage = stage
+        self.job_id = job_id
+        self.labels = labels
+        self.started = None
+        self.elapsed = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.elapsed = time.perf_counter() - self.started
+        if exc_type is not None:
+            self.labels.setdefault("error", exc_type.__name__)
+        self.registry.record(self.stage, self.elapsed, job_id=self.job_id, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._reporters: Dict[str, Callable[[], object]] = {}
+        self._sink = None
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def stage(self, stage: str, job_id=None, **labels) -> StageTimer:
+        return StageTimer(self, stage, job_id, **labels)
+
+    def record(self, stage: str, seconds: float, job_id=None, **labels):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            if "error" in labels:
+                histogram.errors += 1
+            else:
+                histogram.observe(seconds)
+            if self._sink is not None:
+                record = {"ts": time.time(), "job": job_id, "stage": stage, "seconds": round(seconds, 6)}
+                record.update(labels)
+                self._sink.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def histogram(self, stage: str) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get(stage)
+
+    def percentile(self, stage: str, q: float) -> Optional[float]:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            return histogram.percentile(q) if histogram else None
+
+    def count(self, stage: str) -> int:
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            return histogram.count if histogram else 0
+
+    def stages(self) -> List[str]:
+        with self._lock:
+            return sorted(self._histograms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            snapshot = {stage: histogram.summary() for stage, histogram in sorted(self._histograms.items())}
+            reporters = dict(self._reporters)
+        savings = self.savings()
+        if savings:
+            snapshot["savings"] = savings
+        for name, reporter in reporters.items():
+            snapshot[name] = reporter()
+        return snapshot
+
+    def add_reporter(self, name: str, reporter: Callable[[], object]):
+        with self._lock:
+            self._reporters[name] = reporter
+
+    def savings(self, baseline: str = "full", variant: str = "lite") -> Dict[str, dict]:
+        with self._lock:
+            stages = {name.rpartition(".")[0] for name in self._histograms if name.endswith("." + variant)}
+            compared = {}
+            for stage in sorted(stages):
+                before = self._histograms.get(f"{stage}.{baseline}")
+                after = self._histograms[f"{stage}.{variant}"]
+                if before is None or not before.count or not after.count:
+                    continue
+                compared[stage] = {
+                    f"{baseline}_p50": before.percentile(0.5),
+                    f"{variant}_p50": after.percentile(0.5),
+                    "saved_p50": before.percentile(0.5) - after.percentile(0.5),
+                    "saved_mean": before.total / before.count - after.total / after.count,
+                }
+            return compared
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def open_sink(self, path: str):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+            self._sink = open(path, "a", encoding="utf-8", buffering=1)
+
+    def close_sink(self):
+        with self._lock:
+            if self._sink is not None:
+                self._sink.close()
+                self._sink = None
+
+    def serve(self, port: int = 8765, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        if self._server is not None:
+            return self._server
+        registry = self
+
+        class StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/stats"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(registry.snapshot(), indent=2).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), StatsHandler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self._server
+
+    def stop_server(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+metrics = MetricsRegistry()
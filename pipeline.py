@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Optional, Callable, Dict, List
+from batch import DownloadQueue, DownloadJob, RESOLVE, TRANSFER, FINALIZE
+from downloader import TRANSFER_BROWSER, TRANSFER_HTTP
+from driver_pool import DriverPool
+from journal import JobJournal
+from metrics import metrics
+from postprocess import PostProcessor
+from resolver import SITE_URL
+from scheduler import JobQueue, PRIORITY_INTERACTIVE
+
+
+class PipelinedDownloadQueue(DownloadQueue):
+    def __init__(self,
+                 download_directory: str,
+                 resolve_workers: int = 1,
+                 transfer_workers: int = 2,
+                 finalize_workers: int = 1,
+                 pool: Optional[DriverPool] = None,
+                 progress_callback: Optional[Callable] = None,
+                 transfer_mode: str = TRANSFER_HTTP,
+                 site_url: str = SITE_URL,
+                 transfer_capacity: Optional[int] = None,
+                 finalize_capacity: Optional[int] = None,
+                 postprocessor: Optional[PostProcessor] = None,
+                 journal: Optional[JobJournal] = None,
+                 interactive_workers: int = 1):
+        if min(resolve_workers, transfer_workers, finalize_workers) < 1:
+            raise ValueError("every stage needs at least one worker")
+        owns_pool = pool is None
+        owns_postprocessor = postprocessor is None
+        if postprocessor is None:
+            postprocessor = PostProcessor(workers=finalize_workers, capacity=finalize_capacity or finalize_workers)
+        if pool is None:
+            browsers = resolve_workers + interactive_workers
+            if transfer_mode == TRANSFER_BROWSER:
+                browsers += transfer_workers + interactive_workers
+            pool = DriverPool(max_size=browsers)
+        super().__init__(download_directory,
+                         workers=resolve_workers,
+                         pool=pool,
+                         progress_callback=progress_callback,
+                         transfer_mode=transfer_mode,
+                         site_url=site_url,
+                         postprocessor=postprocessor,
+                         journal=journal,
+                         interactive_workers=interactive_workers)
+        self._owns_pool = owns_pool
+        self._owns_postprocessor = owns_postprocessor
+        self.stage_workers = {RESOLVE: resolve_workers, TRANSFER: transfer_workers, FINALIZE: finalize_workers}
+        self._transfers = JobQueue(maxsize=transfer_capacity or transfer_workers)
+        self._stage_threads: Dict[str, List[threading.Thread]] = {RESOLVE: [], TRANSFER: []}
+
+    def close(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+            stage_threads = {stage: list(threads) for stage, threads in self._stage_threads.items()}
+        for stage, stage_queue in ((RESOLVE, self._queue), (TRANSFER, self._transfers)):
+            stage_queue.close(discard=not wait)
+            for thread in stage_threads[stage] if wait else ():
+                thread.join()
+        if self._owns_postprocessor and wait:
+            self.postprocessor.close()
+        if self._owns_pool:
+            self.pool.close()
+
+    def _ensure_workers(self):
+        targets = {RESOLVE: self._worker_loop, TRANSFER: self._transfer_loop}
+        with self._lock:
+            for stage in targets:
+                threads = self._stage_threads[stage]
+                while len(threads) < self.stage_workers[stage] + self.interactive_workers:
+                    lane = PRIORITY_INTERACTIVE if len(threads) >= self.stage_workers[stage] else None
+                    thread = threading.Thread(target=targets[stage], args=(lane,), daemon=True)
+                    threads.append(thread)
+                    self._threads.append(thread)
+                    thread.start()
+
+    def _run_job(self, job: DownloadJob):
+        downloader = self._start_job(job)
+        started = time.perf_counter()
+        self._set_stage(job, RESOLVE)
+        try:
+            download_url = downloader.resolve_download(job.url)
+            if download_url is None:
+                self._complete_job(job, downloader, started, downloader.skipped)
+                return
+            if self.transfer_mode == TRANSFER_HTTP:
+                downloader.release_browser()
+        except Exception as e:
+            job.error = str(e)
+            self._complete_job(job, downloader, started, False)
+            return
+        self._transfers.put((job, downloader, started, download_url, time.perf_counter()), job.priority)
+
+    def _transfer_loop(self, max_priority: Optional[int] = None):
+        while True:
+            item = self._transfers.get(max_priority)
+            if item is None:
+                return
+            job, downloader, started, download_url, queued_at = item
+            metrics.record("pipeline_wait.transfer", time.perf_counter() - queued_at, job_id=job.id)
+            self._set_stage(job, TRANSFER)
+            try:
+                ok = downloader.start_transfer(download_url) and downloader.await_download()
+            except Exception as e:
+                ok = False
+                job.error = str(e)
+            if not ok:
+                self._complete_job(job, downloader, started, False)
+                continue
+            self._set_stage(job, FINALIZE)
+            try:
+                self._finalize_later(job, downloader, started)
+            except Exception as e:
+                job.error = str(e)
+                self._complete_job(job, downloader, started, False)
@@ -0,0 +1,186 @@
+import os
+import queue
+import re
+import threading
+import unicodedata
+from concurrent.futures import Future
+from typing import Optional, Callable, List, Tuple
+from urllib3.exceptions import HTTPError
+from resolver import ResolvedLink
+from transfer import shared_pool_manager, move_to_unique_path, safe_filename
+
+SITE_PREFIX = "SpotiDown.App - "
+COVER_TIMEOUT = 10.0
+MAX_COVER_SIZE = 5_000_000
+
+def normalize_tag(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    value = unicodedata.normalize("NFC", value)
+    return re.sub(r"\s+", " ", value).strip()
+
+
+def clean_filename(name: str) -> str:
+    return safe_filename(name.replace(SITE_PREFIX, ""))
+
+
+def tags_from_filename(name: str) -> Tuple[str, str]:
+    stem = os.path.splitext(name)[0]
+    if " - " in stem:
+        artist, title = stem.split(" - ", 1)
+    else:
+        artist, title = "", stem
+    return normalize_tag(title), normalize_tag(artist)
+
+
+def read_tags(path: str, link: Optional[ResolvedLink] = None) -> Tuple[str, str]:
+    from mutagen import MutagenError
+    from mutagen.easyid3 import EasyID3
+
+    title = artist = ""
+    try:
+        audio = EasyID3(path)
+        title = normalize_tag(audio.get("title", [""])[0])
+        artist = normalize_tag(audio.get("artist", [""])[0])
+    except (KeyError, MutagenError):
+        pass
+    if link is not None:
+        title = title or normalize_tag(link.title)
+        artist = artist or normalize_tag(link.artist)
+    if not title:
+        fallback_title, fallback_artist = tags_from_filename(clean_filename(os.path.basename(path)))
+        title, artist = fallback_title, artist or fallback_artist
+    return title, artist
+
+
+def write_tags(path: str, title: str, artist: str) -> bool:
+    from mutagen import MutagenError
+    from mutagen.easyid3 import EasyID3
+    from mutagen.id3 import ID3NoHeaderError
+
+    try:
+        try:
+            audio = EasyID3(path)
+        except ID3NoHeaderError:
+            audio = EasyID3()
+        current = (audio.get("title", [""])[0], audio.get("artist", [""])[0])
+        if current == (title, artist):
+            return False
+        if title:
+            audio["title"] = title
+        if artist:
+            audio["artist"] = artist
+        audio.save(path)
+        return True
+    except (KeyError, MutagenError):
+        return False
+
+
+def fetch_cover(cover_url: str) -> Optional[Tuple[bytes, str]]:
+    try:
+        response = shared_pool_manager().request("GET", cover_url, timeout=COVER_TIMEOUT, preload_content=False)
+    except HTTPError:
+        return None
+    try:
+        if response.status != 200:
+            return None
+        data = response.read(MAX_COVER_SIZE + 1)
+    except HTTPError:
+        return None
+    finally:
+        response.release_conn()
+    if not data or len(data) > MAX_COVER_SIZE:
+        return None
+    mime = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if not mime.startswith("image/"):
+        mime = "image/png" if data.startswith(b"\x89PNG") else "image/jpeg"
+    return data, mime
+
+
+def embed_cover(path: str, cover_url: Optional[str]) -> bool:
+    if not cover_url:
+        return False
+    from mutagen import MutagenError
+    from mutagen.id3 import ID3, APIC, ID3NoHeaderError
+
+    try:
+        try:
+            tags = ID3(path)
+        except ID3NoHeaderError:
+            tags = ID3()
+        if tags.getall("APIC"):
+            return False
+        cover = fetch_cover(cover_url)
+        if cover is None:
+            return False
+        data, mime = cover
+        tags.add(APIC(encoding=3, mime=mime, type=3, desc="Cover", data=data))
+        tags.save(path)
+        return True
+    except MutagenError:
+        return False
+
+
+def move_into_library(source_path: str, directory: str, name: str,
+                      before_move: Optional[Callable[[str], None]] = None) -> str:
+    target = os.path.join(directory, name)
+    if os.path.abspath(source_path) == os.path.abspath(target):
+        return target
+    return move_to_unique_path(source_path, directory, name, before_move)
+
+
+class PostProcessor:
+    def __init__(self, workers: int = 1, capacity: int = 0):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self._queue: "queue.Queue[Optional[Tuple[Callable, Future]]]" = queue.Queue(maxsize=capacity)
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+
+    def submit(self, finalize: Callable[[], object],
+               callback: Optional[Callable[[Future], None]] = None) -> Future:
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Post-processor is closed")
+            self._ensure_workers()
+        self._queue.put((finalize, future))
+        return future
+
+    def join(self):
+        self._queue.join()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def _ensure_workers(self):
+        for _ in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._worker_loop, daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker_loop(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                finalize, future = item
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(finalize())
+                except Exception as e:
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
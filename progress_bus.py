@@ -0,0 +1,82 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Optional, Callable, List, Hashable
+
+
+class Subscription:
+    def __init__(self, bus: "ProgressBus"):
+        self._bus = bus
+        self._pending: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _offer(self, key: Hashable, info: dict):
+        with self._condition:
+            self._pending.pop(key, None)
+            self._pending[key] = info
+            self._condition.notify()
+
+    def drain(self) -> List[dict]:
+        with self._condition:
+            updates = list(self._pending.values())
+            self._pending.clear()
+            return updates
+
+    def wait(self, timeout: Optional[float] = None) -> List[dict]:
+        with self._condition:
+            if not self._pending and not self._closed:
+                self._condition.wait(timeout)
+        return self.drain()
+
+    def pump(self, callback: Callable[[dict], None], interval: float):
+        def run():
+            while not self._closed:
+                for info in self.wait():
+                    callback(info)
+                self._condition_sleep(interval)
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+
+    def _condition_sleep(self, interval: float):
+        with self._condition:
+            if not self._closed:
+                self._condition.wait_for(lambda: self._closed, interval)
+
+    def close(self):
+        self._bus._unsubscribe(self)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+
+class ProgressBus:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions: List[Subscription] = []
+        self._sequence = itertools.count(1)
+
+    def publish(self, info: dict):
+        key = info.get("job_id")
+        with self._lock:
+            state = dict(info, seq=next(self._sequence))
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription._offer(key, state)
+
+    def subscribe(self,
+                  callback: Optional[Callable[[dict], None]] = None,
+                  interval: float = 0.25) -> Subscription:
+        subscription = Subscription(self)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        if callback is not None:
+            subscription.pump(callback, interval)
+        return subscription
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
@@ -0,0 +1,205 @@
+import json
+from html.parser import HTMLParser
+from typing import Optional, Dict, List
+from urllib.parse import urlencode, urljoin
+import urllib3
+from transfer import shared_pool_manager
+
+SITE_URL = "https://spotidown.app"
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+class ResolveError(Exception):
+    pass
+
+
+class ResolvedLink:
+    def __init__(self,
+                 download_url: str,
+                 title: Optional[str] = None,
+                 artist: Optional[str] = None,
+                 cover_url: Optional[str] = None):
+        self.download_url = download_url
+        self.title = title
+        self.artist = artist
+        self.cover_url = cover_url
+
+
+class _Form:
+    def __init__(self, action: str, method: str):
+        self.action = action
+        self.method = method.upper()
+        self.fields: Dict[str, str] = {}
+        self.input_ids: Dict[str, str] = {}
+        self.buttons: List[dict] = []
+
+
+class _PageParser(HTMLParser):
+    HEADINGS = ("h1", "h2", "h3")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.forms: List[_Form] = []
+        self.links: List[dict] = []
+        self.images: List[str] = []
+        self.headings: List[str] = []
+        self.paragraphs_after_heading: List[str] = []
+        self._form: Optional[_Form] = None
+        self._button: Optional[dict] = None
+        self._link: Optional[dict] = None
+        self._text_target: Optional[str] = None
+        self._text: List[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {k: v or "" for k, v in attrs}
+        if tag == "form":
+            self._form = _Form(attrs.get("action", ""), attrs.get("method", "get"))
+            self.forms.append(self._form)
+        elif tag == "input" and self._form is not None:
+            name = attrs.get("name")
+            if attrs.get("id"):
+                self._form.input_ids[attrs["id"]] = name or attrs["id"]
+            if name and attrs.get("type", "text").lower() not in ("submit", "button", "image"):
+                self._form.fields[name] = attrs.get("value", "")
+        elif tag == "button":
+            self._button = {"id": attrs.get("id"), "name": attrs.get("name"),
+                            "value": attrs.get("value", ""), "text": "", "form": self._form}
+        elif tag == "a":
+            self._link = {"href": attrs.get("href", ""), "class": attrs.get("class", ""), "text": ""}
+        elif tag == "img" and attrs.get("src"):
+            self.images.append(attrs["src"])
+        elif tag in self.HEADINGS or (tag == "p" and len(self.paragraphs_after_heading) < len(self.headings)):
+            self._text_target = tag
+            self._text = []
+
+    def handle_endtag(self, tag):
+        if tag == "form":
+            self._form = None
+        elif tag == "button" and self._button is not None:
+            if self._button["form"] is not None:
+                self._button["form"].buttons.append(self._button)
+            self._button = None
+        elif tag == "a" and self._link is not None:
+            self.links.append(self._link)
+            self._link = None
+        elif tag == self._text_target:
+            text = " ".join("".join(self._text).split())
+            if tag == "p":
+                self.paragraphs_after_heading.append(text)
+            elif text:
+                self.headings.append(text)
+            self._text_target = None
+
+    def handle_data(self, data):
+        if self._button is not None:
+            self._button["text"] += data
+        if self._link is not None:
+            self._link["text"] += data
+        if self._text_target is not None:
+            self._text.append(data)
+
+
+def _parse(html: str) -> _PageParser:
+    parser = _PageParser()
+    parser.feed(html)
+    parser.close()
+    return parser
+
+
+class HttpLinkResolver:
+    def __init__(self,
+                 base_url: str = SITE_URL,
+                 http: Optional[urllib3.PoolManager] = None,
+                 timeout: float = 15.0):
+        self.base_url = base_url.rstrip("/")
+        self.http = http if http is not None else shared_pool_manager()
+        self.timeout = timeout
+        self.cookies: Dict[str, str] = {}
+        self.referer = self.base_url + "/"
+
+    def request_headers(self) -> Dict[str, str]:
+        headers = {"User-Agent": USER_AGENT, "Referer": self.referer}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        return headers
+
+    def resolve(self, song_url: str) -> ResolvedLink:
+        home = _parse(self._request("GET", self.base_url + "/"))
+        form = next((f for f in home.forms if "url" in f.input_ids), None)
+        if form is None:
+            raise ResolveError("URL form not found")
+
+        fields = dict(form.fields)
+        fields[form.input_ids["url"]] = song_url
+        send = next((b for b in form.buttons if b["id"] == "send"), None)
+        if send and send["name"]:
+            fields[send["name"]] = send["value"]
+        result = _parse(self._submit(form, fields, self.base_url + "/"))
+
+        link = self._find_download_link(result)
+        if link is None:
+            mp3_form = next((f for f in result.forms
+                             if any("download mp3" in b["text"].lower() for b in f.buttons)), None)
+            if mp3_form is None:
+                raise ResolveError("Download MP3 button not found")
+            mp3_fields = dict(mp3_form.fields)
+            button = next(b for b in mp3_form.buttons if "download mp3" in b["text"].lower())
+            if button["name"]:
+                mp3_fields[button["name"]] = button["value"]
+            link = self._find_download_link(_parse(self._submit(mp3_form, mp3_fields, self.base_url + "/")))
+            if link is None:
+                raise ResolveError("Download link not found")
+
+        return ResolvedLink(
+            download_url=urljoin(self.base_url + "/", link["href"]),
+            title=result.headings[0] if result.headings else None,
+            artist=result.paragraphs_after_heading[0] if result.paragraphs_after_heading else None,
+            cover_url=urljoin(self.base_url + "/", result.images[0]) if result.images else None,
+        )
+
+    @staticmethod
+    def _find_download_link(page: _PageParser) -> Optional[dict]:
+        for link in page.links:
+            if "abutton" in link["class"].split() and "download mp3" in link["text"].lower() and link["href"]:
+                return link
+        return None
+
+    def _submit(self, form: _Form, fields: Dict[str, str], page_url: str) -> str:
+        action = urljoin(page_url, form.action or page_url)
+        if form.method == "POST":
+            return self._request("POST", action, body=urlencode(fields),
+                                 content_type="application/x-www-form-urlencoded")
+        separator = "&" if "?" in action else "?"
+        return self._request("GET", action + separator + urlencode(fields))
+
+    def _request(self, method: str, url: str, body: Optional[str] = None, content_type: Optional[str] = None) -> str:
+        headers = self.request_headers()
+        if content_type:
+            headers["Content-Type"] = content_type
+        try:
+            response = self.http.request(method, url, body=body, headers=headers, timeout=self.timeout)
+        except urllib3.exceptions.HTTPError as e:
+            raise ResolveError(f"Request to {url} failed: {e}") from e
+
+        for header in response.headers.getlist("Set-Cookie"):
+            name, _, value = header.split(";", 1)[0].partition("=")
+            if name.strip():
+                self.cookies[name.strip()] = value.strip()
+        if response.status >= 400:
+            raise ResolveError(f"HTTP {response.status} from {url}")
+        self.referer = url
+
+        text = response.data.decode("utf-8", errors="replace")
+        if "json" in response.headers.get("Content-Type", ""):
+            try:
+                payload = json.loads(text)
+            except ValueError as e:
+                raise ResolveError("Invalid JSON response") from e
+            if isinstance(payload, dict):
+                if payload.get("error"):
+                    raise ResolveError(str(payload.get("message") or payload["error"]))
+                text = str(payload.get("data") or payload.get("html") or "")
+        return text
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Callable, Dict, List, Tuple
+from urllib.parse import urlparse
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+PRIORITIES = {"interactive": PRIORITY_INTERACTIVE, "bulk": PRIORITY_BULK}
+
+HOST_CONCURRENCY = 4
+
+
+class JobQueue:
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self._heap: List[Tuple[int, int, object]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._unfinished = 0
+        self._closed = False
+
+    def put(self, item, priority: int = PRIORITY_BULK):
+        with self._condition:
+            while self.maxsize and priority >= PRIORITY_BULK and len(self._heap) >= self.maxsize \
+                    and not self._closed:
+                self._condition.wait()
+            heapq.heappush(self._heap, (priority, next(self._sequence), item))
+            self._unfinished += 1
+            self._condition.notify_all()
+
+    def get(self, max_priority: Optional[int] = None):
+        with self._condition:
+            while True:
+                if self._heap and (max_priority is None or self._heap[0][0] <= max_priority):
+                    item = heapq.heappop(self._heap)[2]
+                    self._condition.notify_all()
+                    return item
+                if self._closed:
+                    return None
+                self._condition.wait()
+
+    def qsize(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def task_done(self):
+        with self._condition:
+            self._unfinished -= 1
+            if self._unfinished <= 0:
+                self._condition.notify_all()
+
+    def join(self):
+        with self._condition:
+            while self._unfinished > 0:
+                self._condition.wait()
+
+    def close(self, discard: bool = False):
+        with self._condition:
+            self._closed = True
+            if discard:
+                self._unfinished -= len(self._heap)
+                self._heap.clear()
+            self._condition.notify_all()
+
+
+class TokenBucket:
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None):
+        self._condition = threading.Condition()
+        self.rate: Optional[float] = None
+        self.burst = 0.0
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: Optional[float], burst: Optional[float] = None):
+        with self._condition:
+            self._refill_locked()
+            self.rate = rate if rate and rate > 0 else None
+            self.burst = burst or self.rate or 0.0
+            self._tokens = min(self._tokens, self.burst)
+            self._condition.notify_all()
+
+    def consume(self, amount: int, wait: bool = True):
+        with self._condition:
+            if self.rate is None:
+                return
+            self._refill_locked()
+            self._tokens -= amount
+            while wait and self.rate is not None and self._tokens < 0:
+                self._condition.wait(-self._tokens / self.rate)
+                self._refill_locked()
+
+    def _refill_locked(self):
+        now = time.monotonic()
+        if self.rate is not None:
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class HostLimiter:
+    def __init__(self, limit: Optional[int] = HOST_CONCURRENCY):
+        self.limit = limit
+        self._active: Dict[str, int] = {}
+        self._condition = threading.Condition()
+
+    def set_limit(self, limit: Optional[int]):
+        with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, url: str, priority: int = PRIORITY_BULK):
+        host = urlparse(url).hostname or ""
+        with self._condition:
+            while self.limit and self._active.get(host, 0) >= self.limit + (priority < PRIORITY_BULK):
+                self._condition.wait()
+            self._active[host] = self._active.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active[host] -= 1
+                if not self._active[host]:
+                    del self._active[host]
+                self._condition.notify_all()
+
+    def active(self) -> Dict[str, int]:
+        with self._condition:
+            return dict(self._active)
+
+
+class TransferScheduler:
+    def __init__(self, bandwidth: Optional[float] = None, host_limit: Optional[int] = HOST_CONCURRENCY):
+        self.bucket = TokenBucket(bandwidth)
+        self.hosts = HostLimiter(host_limit)
+
+    @property
+    def bandwidth(self) -> Optional[float]:
+        return self.bucket.rate
+
+    def set_bandwidth(self, bytes_per_second: Optional[float]):
+        self.bucket.set_rate(bytes_per_second)
+
+    def set_host_limit(self, limit: Optional[int]):
+        self.hosts.set_limit(limit)
+
+    def host_slot(self, url: str, priority: int = PRIORITY_BULK):
+        return self.hosts.slot(url, priority)
+
+    def throttle(self, priority: int = PRIORITY_BULK) -> Callable[[int], None]:
+        wait = priority >= PRIORITY_BULK
+        return lambda size: self.bucket.consume(size, wait)
+
+    def status(self) -> dict:
+        return {"bandwidth": self.bucket.rate, "host_limit": self.hosts.limit, "active": self.hosts.active()}
+
+
+transfer_scheduler = TransferScheduler()
@@ -0,0 +1,40 @@
+import re
+from typing import Optional, Tuple
+
+TRACK_URL_PATTERN = re.compile(
+    r'^(https://open\.spotify\.com/(?:intl-[a-z]{2}/)?track/|'
+    r'spotify:track:)([A-Za-z0-9]+)(\?.*)?$'
+)
+
+COLLECTION_URL_PATTERN = re.compile(
+    r'^(?:https://open\.spotify\.com/(?:intl-[a-z]{2}/)?(playlist|album)/|'
+    r'spotify:(playlist|album):)([A-Za-z0-9]+)(\?.*)?$'
+)
+
+
+def is_valid_spotify_track_url(url: str) -> bool:
+    return TRACK_URL_PATTERN.match(url) is not None
+
+
+def extract_track_id(url: str) -> Optional[str]:
+    match = TRACK_URL_PATTERN.match(url.strip())
+    return match.group(2) if match else None
+
+
+def is_valid_spotify_collection_url(url: str) -> bool:
+    return COLLECTION_URL_PATTERN.match(url) is not None
+
+
+def is_valid_spotify_url(url: str) -> bool:
+    return is_valid_spotify_track_url(url) or is_valid_spotify_collection_url(url)
+
+
+def parse_collection_url(url: str) -> Optional[Tuple[str, str]]:
+    match = COLLECTION_URL_PATTERN.match(url.strip())
+    if match is None:
+        return None
+    return match.group(1) or match.group(2), match.group(3)
+
+
+def track_url(track_id: str) -> str:
+    return f"https://open.spotify.com/track/{track_id}"
@@ -0,0 +1,22 @@
+from batch import DownloadQueue, DONE
+
+TRACK = "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQX"
+LOCALIZED = "https://open.spotify.com/intl-fr/track/4uLU6hMCjMI75M1A2tKUQX?si=abc"
+
+
+class IdleQueue(DownloadQueue):
+    def _ensure_workers(self):
+        pass
+
+
+def test_submit_returns_the_unfinished_job_for_the_same_track(tmp_path):
+    queue = IdleQueue(str(tmp_path))
+    first = queue.submit(TRACK)
+    assert queue.submit(LOCALIZED) is first
+    assert queue.jobs == [first]
+
+    queue._update_job(first, state=DONE)
+    queue._finish_job(first, True)
+    again = queue.submit(LOCALIZED)
+    assert again is not first
+    queue.close()
@@ -0,0 +1,176 @@
+import threading
+import time
+from driver_pool import DriverPool, MultiplexedDriverPool
+
+
+class FakeDriver:
+    def __init__(self, download_directory=None):
+        self.download_directory = download_directory
+        self.window_handles = ["main"]
+        self.quit_calls = 0
+
+    def execute_cdp_cmd(self, command, params):
+        self.download_directory = params.get("downloadPath")
+
+    def quit(self):
+        self.quit_calls += 1
+        self.window_handles = []
+
+
+def make_pool(**options):
+    created = []
+
+    def factory(download_directory=None):
+        driver = FakeDriver(download_directory)
+        created.append(driver)
+        return driver
+
+    return DriverPool(driver_factory=factory, **options), created
+
+
+def test_release_reuses_the_idle_driver():
+    pool, created = make_pool(max_size=1)
+    first = pool.lease()
+    pool.release(first)
+    second = pool.lease()
+    assert second is first
+    assert len(created) == 1
+    pool.release(second)
+    pool.close()
+
+
+def test_release_wakes_a_blocked_lease_while_the_reaper_runs():
+    pool, created = make_pool(max_size=1, idle_timeout=2.0)
+    first = pool.lease()
+    leased = []
+    waiter = threading.Thread(target=lambda: leased.append(pool.lease(timeout=5)))
+    waiter.start()
+    time.sleep(0.2)
+    pool.release(first)
+    waiter.join(1.0)
+    assert leased == [first]
+    assert pool.idle_count == 0
+    pool.release(leased[0])
+    pool.close()
+
+
+def test_lease_times_out_when_the_pool_is_full():
+    pool, _ = make_pool(max_size=1)
+    pooled = pool.lease()
+    started = time.monotonic()
+    try:
+        pool.lease(timeout=0.2)
+    except TimeoutError:
+        pass
+    else:
+        raise AssertionError("lease did not time out")
+    assert time.monotonic() - started >= 0.2
+    pool.release(pooled)
+    pool.close()
+
+
+def test_recycles_after_max_jobs_and_unhealthy_release():
+    pool, created = make_pool(max_size=1, max_jobs_per_driver=2)
+    pooled = pool.lease()
+    pool.release(pooled)
+    pool.release(pool.lease())
+    assert created[0].quit_calls == 1
+    assert pool.size == 0
+    pool.release(pool.lease(), healthy=False)
+    assert created[1].quit_calls == 1
+    assert pool.size == 0
+    pool.close()
+
+
+def test_evict_idle_quits_expired_drivers():
+    pool, created = make_pool(max_size=2, idle_timeout=0.05)
+    pool.release(pool.lease())
+    time.sleep(0.1)
+    pool.evict_idle()
+    assert pool.idle_count == 0
+    assert pool.size == 0
+    assert created[0].quit_calls == 1
+    pool.close()
+
+
+def test_reaper_evicts_idle_drivers_and_stops_on_close():
+    pool, created = make_pool(max_size=1, idle_timeout=0.5)
+    pool.release(pool.lease())
+    deadline = time.monotonic() + 5
+    while pool.idle_count and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.idle_count == 0
+    assert created[0].quit_calls == 1
+    pool.close()
+    pool._reaper.join(2.0)
+    assert not pool._reaper.is_alive()
+
+
+def test_closed_pool_refuses_leases():
+    pool, _ = make_pool(max_size=1)
+    pool.close()
+    try:
+        pool.lease()
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("closed pool handed out a driver")
+
+
+class FakeChrome:
+    def __init__(self):
+        self.window_handles = ["home"]
+        self.current_window_handle = "home"
+        self.contexts = {}
+        self.windows = {"home": None}
+        self.download_paths = {}
+        self.switch_to = self
+
+    def window(self, handle):
+        self.current_window_handle = handle
+
+    def close(self):
+        del self.windows[self.current_window_handle]
+        self.window_handles = list(self.windows)
+
+    def quit(self):
+        self.windows = {}
+        self.window_handles = []
+
+    def execute(self, command, params=None):
+        return {"value": self.cdp(params["cmd"], params["params"])}
+
+    def execute_cdp_cmd(self, command, params):
+        return self.execute("executeCdpCommand", {"cmd": command, "params": params})["value"]
+
+    def cdp(self, command, params):
+        if command == "Target.createBrowserContext":
+            context = f"context-{len(self.contexts)}"
+            self.contexts[context] = True
+            return {"browserContextId": context}
+        if command == "Target.createTarget":
+            handle = f"tab-{len(self.windows)}"
+            self.windows[handle] = params["browserContextId"]
+            self.window_handles = list(self.windows)
+            return {"targetId": handle}
+        if command == "Target.disposeBrowserContext":
+            del self.contexts[params["browserContextId"]]
+        elif command == "Browser.setDownloadBehavior":
+            self.download_paths[params["browserContextId"]] = params["downloadPath"]
+        elif command == "Page.setDownloadBehavior":
+            raise AssertionError("tabs must not change the shared context's download path")
+        return {}
+
+
+def test_tabs_get_their_own_download_context():
+    chrome = FakeChrome()
+    pool = MultiplexedDriverPool(max_tabs=2, browser_factory=lambda download_directory=None: chrome)
+    first = pool.lease("/staging/a")
+    second = pool.lease("/staging/b")
+    assert chrome.download_paths == {"context-0": "/staging/a", "context-1": "/staging/b"}
+
+    pool.release(first, healthy=False)
+    assert list(chrome.contexts) == ["context-1"]
+    assert chrome.windows == {"home": None, "tab-2": "context-1"}
+    pool.release(second)
+    pool.close()
@@ -0,0 +1,56 @@
+import pytest
+from expanders import CollectionExpander, ExpandError, SpotifyEmbedExpander
+
+TRACKS = ["4uLU6hMCjMI75M1A2tKUQ" + str(i) for i in range(4)]
+
+
+class FakeResponse:
+    def __init__(self, chunks, status=200):
+        self.status = status
+        self.chunks = chunks
+        self.sent = 0
+        self.released = False
+
+    def stream(self, size):
+        for chunk in self.chunks:
+            self.sent += 1
+            yield chunk
+
+    def release_conn(self):
+        self.released = True
+
+
+class FakeHttp:
+    def __init__(self, response):
+        self.response = response
+
+    def request(self, method, url, **options):
+        return self.response
+
+
+def embed_chunks(tracks):
+    page = "".join(f'<li data-uri="spotify:track:{track_id}">x</li>' for track_id in tracks).encode("utf-8")
+    return [page[i:i + 25] for i in range(0, len(page), 25)]
+
+
+def test_embed_tracks_are_yielded_as_the_page_streams_in():
+    response = FakeResponse(embed_chunks(TRACKS + TRACKS[:1]))
+    tracks = SpotifyEmbedExpander(http=FakeHttp(response)).expand("playlist", "abc")
+    assert next(tracks) == TRACKS[0]
+    assert response.sent < len(response.chunks)
+    assert list(tracks) == TRACKS[1:]
+    assert response.released
+
+
+def test_embed_page_at_the_track_limit_is_reported_incomplete():
+    response = FakeResponse(embed_chunks(TRACKS))
+    found = []
+    with pytest.raises(ExpandError, match="first 4 tracks"):
+        for track_id in SpotifyEmbedExpander(http=FakeHttp(response), track_limit=4).expand("playlist", "abc"):
+            found.append(track_id)
+    assert found == TRACKS
+
+
+def test_collection_expander_is_abstract():
+    with pytest.raises(TypeError):
+        CollectionExpander()
@@ -0,0 +1,62 @@
+import threading
+import expanders
+from batch import DownloadQueue
+from expanders import CollectionExpander, FixtureExpander
+from journal import JobJournal
+from spotify_url import track_url
+
+TRACKS = ["4uLU6hMCjMI75M1A2tKUQ" + str(i) for i in range(4)]
+
+
+class IdleQueue(DownloadQueue):
+    def _ensure_workers(self):
+        pass
+
+
+class StallingExpander(CollectionExpander):
+    def __init__(self, tracks, stall_after):
+        self.tracks = tracks
+        self.stall_after = stall_after
+        self.stalled = threading.Event()
+        self.release = threading.Event()
+
+    def expand(self, kind, collection_id):
+        for i, track_id in enumerate(self.tracks):
+            if i == self.stall_after:
+                self.stalled.set()
+                self.release.wait()
+            yield track_id
+
+
+def test_interrupted_expansion_resumes_after_its_cursor(tmp_path, monkeypatch):
+    monkeypatch.setattr(expanders, "find_entry_by_track_id", lambda track_id: None)
+    path = str(tmp_path / "jobs.jsonl")
+    url = "https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M"
+
+    journal = JobJournal(path)
+    first = IdleQueue(str(tmp_path), journal=journal)
+    stalling = StallingExpander(TRACKS, stall_after=2)
+    first.expand(url, expander=stalling)
+    assert stalling.stalled.wait(5)
+    journal.close()
+    stalling.release.set()
+    first.close()
+
+    journal = JobJournal(path)
+    expansion_records = [record for record in journal.unfinished() if record["url"] == url]
+    assert [record["cursor"] for record in expansion_records] == [2]
+
+    expanders.set_expander(FixtureExpander({"37i9dQZF1DXcBWIGoYBM5M": TRACKS}))
+    try:
+        second = IdleQueue(str(tmp_path), journal=journal)
+        resumed = second.resume()
+        expansion, = second.expansions
+        assert expansion.wait(5)
+    finally:
+        expanders.set_expander(None)
+
+    assert [job.url for job in resumed] == [track_url(track_id) for track_id in TRACKS[:2]]
+    assert sorted(job.url for job in second.jobs) == sorted(track_url(track_id) for track_id in TRACKS)
+    assert all(record["url"] != url for record in journal.unfinished())
+    second.close()
+    journal.close()
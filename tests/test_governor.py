@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+import governor
+
+
+def spawn_sleeper():
+    return subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+
+
+def test_kill_works_without_waitpid(monkeypatch):
+    monkeypatch.delattr(os, "WNOHANG", raising=False)
+    process = spawn_sleeper()
+    try:
+        assert governor._kill(process.pid)
+    finally:
+        monkeypatch.undo()
+        process.kill()
+    assert process.wait(5) != 0
+
+
+def test_kill_reaps_its_own_child():
+    process = spawn_sleeper()
+    try:
+        assert governor._is_child(process.pid)
+        assert governor._kill(process.pid)
+    finally:
+        process.kill()
+    try:
+        os.waitpid(process.pid, 0)
+    except ChildProcessError:
+        pass
+
+
+def test_kill_leaves_other_processes_to_their_parent(monkeypatch):
+    process = spawn_sleeper()
+    monkeypatch.setattr(governor, "_is_child", lambda pid: False)
+    waited = []
+    monkeypatch.setattr(os, "waitpid", lambda *args: waited.append(args))
+    try:
+        assert governor._kill(process.pid)
+        assert waited == []
+    finally:
+        monkeypatch.undo()
+        process.kill()
+        process.wait(5)
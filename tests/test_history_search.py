@@ -0,0 +1,67 @@
+import threading
+from history_search import SearchIndex, fold, scan
+from history_store import open_store
+
+
+def make_entries(count):
+    artists = ["Sérgio Mendes", "Björk", "Sigur Rós", "Daft Punk", "Røyksopp"]
+    return [{"title": f"Song {i} Title" if i % 3 else f"Água {i}",
+             "artist": artists[i % len(artists)],
+             "url": f"https://open.spotify.com/track/{i:022d}",
+             "file": ""}
+            for i in range(count)]
+
+
+def test_fold_strips_case_and_accents():
+    assert fold("Sérgio  MENDES!") == "sergio mendes"
+    assert fold("Røyksopp") == "royksopp"
+
+
+def test_index_agrees_with_scan():
+    entries = make_entries(500)
+    index = SearchIndex(entries)
+    for query in ["sergio", "ti", "a t", "song 1", "agua", "ro", "daft punk 4", "nothing here",
+                  "https://open.spotify.com/track/" + "7".rjust(22, "0")]:
+        assert index.search(query).positions() == scan(entries, query).positions(), query
+
+
+def test_result_pages_lazily():
+    entries = make_entries(2000)
+    result = SearchIndex(entries).search("song title")
+    first = result.page(0, 10)
+    assert len(first) == 10 and not result.complete
+    everything = result.positions()
+    assert result.complete and result.total == len(everything)
+    assert result.page(len(everything) - 5, 10) == everything[-5:]
+
+
+def test_scan_stops_at_its_deadline():
+    entries = make_entries(2000)
+    result = scan(entries, "song 1999")
+    assert result.page(0, 50, deadline=0) == []
+    assert not result.complete and result.total > 0
+    assert result.page(0, 50) == [1999]
+    assert result.complete and result.total == 1
+
+
+def test_store_builds_the_index_once(tmp_path, monkeypatch):
+    store = open_store("jsonl", str(tmp_path / "history.json"))
+    store.replace_all(make_entries(3000))
+    builds = []
+    start = threading.Thread.start
+
+    def counting_start(thread):
+        builds.append(thread)
+        start(thread)
+
+    monkeypatch.setattr(threading.Thread, "start", counting_start)
+    store.page(0, 20, "bjork")
+    store.page(20, 20, "bjork")
+    store.prepare_search(wait=True)
+    monkeypatch.undo()
+
+    assert len(builds) == 1
+    total, page = store.page(0, 20, "bjork")
+    assert total == 600 and len(page) == 20
+    assert all(entry["artist"] == "Björk" for entry in page)
+    store.close()
@@ -0,0 +1,33 @@
+import json
+from history_store import open_store
+
+ENTRY = {"title": "Song", "artist": "Artist", "url": "https://open.spotify.com/track/4uLU6hMCjMI75M1A2tKUQX",
+         "file": ""}
+
+
+def test_migration_keeps_an_existing_backup(tmp_path):
+    legacy = tmp_path / "history.json"
+    earlier = tmp_path / "history.json.migrated"
+    earlier.write_text("earlier backup", encoding="utf-8")
+    legacy.write_text(json.dumps({"download_history": [ENTRY]}), encoding="utf-8")
+
+    store = open_store("jsonl", str(legacy))
+    assert store.load_all() == [ENTRY]
+    store.close()
+
+    assert not legacy.exists()
+    assert earlier.read_text(encoding="utf-8") == "earlier backup"
+    backup = json.loads((tmp_path / "history.json.migrated.1").read_text(encoding="utf-8"))
+    assert backup == {"download_history": [ENTRY]}
+
+
+def test_append_after_a_torn_line_keeps_the_new_entry(tmp_path):
+    path = tmp_path / "history.jsonl"
+    path.write_text('{"title": "a"}\n[1, 2]\n{"title": "tor', encoding="utf-8")
+    store = open_store("jsonl", str(tmp_path / "history.json"))
+    store.append([{"title": "b"}])
+    store.close()
+
+    reopened = open_store("jsonl", str(tmp_path / "history.json"))
+    assert [entry["title"] for entry in reopened.load_all()] == ["a", "b"]
+    reopened.close()
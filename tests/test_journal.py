@@ -0,0 +1,47 @@
+import json
+import os
+import pytest
+from journal import JobJournal, JournalError
+
+
+def test_second_journal_cannot_open_a_journal_in_use(tmp_path):
+    path = str(tmp_path / "jobs.jsonl")
+    first = JobJournal(path)
+    first.record("k1", "https://open.spotify.com/track/a", "/music", "transferring")
+    with pytest.raises(JournalError):
+        JobJournal(path)
+    first.record("k1", "https://open.spotify.com/track/a", "/music", "done", finished=True)
+    first.close()
+
+    reopened = JobJournal(path)
+    assert reopened.unfinished() == []
+    reopened.close()
+
+
+def test_unfinished_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.jsonl")
+    journal = JobJournal(path)
+    journal.record("k1", "https://open.spotify.com/track/a", "/music", "transferring")
+    journal.record("k2", "https://open.spotify.com/track/b", "/music", "resolving")
+    journal.record("k2", "https://open.spotify.com/track/b", "/music", "done", finished=True)
+    journal.close()
+
+    reopened = JobJournal(path)
+    assert [entry["key"] for entry in reopened.unfinished()] == ["k1"]
+    reopened.close()
+
+
+def test_record_follows_a_replaced_file(tmp_path):
+    path = str(tmp_path / "jobs.jsonl")
+    journal = JobJournal(path)
+    journal.record("k1", "https://open.spotify.com/track/a", "/music", "transferring")
+    replacement = str(tmp_path / "other.jsonl")
+    with open(replacement, "w", encoding="utf-8") as f:
+        f.write("")
+    os.replace(replacement, path)
+
+    journal.record("k2", "https://open.spotify.com/track/b", "/music", "resolving")
+    with open(path, "r", encoding="utf-8") as f:
+        keys = {json.loads(line)["key"] for line in f}
+    assert keys == {"k1", "k2"}
+    journal.close()
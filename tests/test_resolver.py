@@ -0,0 +1,117 @@
+import json
+from urllib.parse import parse_qs
+import pytest
+from urllib3 import HTTPHeaderDict
+from benchmarks.stub_site import StubSite, track_artist, track_title
+from downloader import Downloader
+from resolver import HttpLinkResolver, ResolveError
+
+TRACK_ID = "4uLU6hMCjMI75M1A2tKUQX"
+SONG_URL = f"https://open.spotify.com/track/{TRACK_ID}"
+
+HOME = """<form action="/action" method="post">
+  <input type="hidden" name="token" value="abc">
+  <input id="url" name="link" type="text">
+  <button id="send" name="go" value="1">Download</button>
+</form>"""
+
+RESULT = """<div><img src="/cover.jpg"><h3>Águas de Março</h3><p>Elis &amp; Tom</p></div>
+<form action="/action/track" method="post">
+  <input type="hidden" name="data" value="xyz">
+  <button type="submit">Download MP3</button>
+</form>"""
+
+LINK = '<a class="abutton is-success" href="/dl/song.mp3">Download Mp3</a>'
+
+
+class FakeResponse:
+    def __init__(self, body: str, content_type: str = "text/html", status: int = 200, cookies=()):
+        self.status = status
+        self.data = body.encode("utf-8")
+        self.headers = HTTPHeaderDict({"Content-Type": content_type})
+        for cookie in cookies:
+            self.headers.add("Set-Cookie", cookie)
+
+
+class FakeHttp:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+
+    def request(self, method, url, body=None, headers=None, timeout=None):
+        self.requests.append((method, url, parse_qs(body or ""), dict(headers or {})))
+        return self.pages[(method, url.split("://", 1)[1].split("/", 1)[1])]
+
+
+def resolver_for(pages) -> HttpLinkResolver:
+    return HttpLinkResolver("https://site.test", http=FakeHttp(pages))
+
+
+def test_resolves_a_track_against_the_stub_site():
+    with StubSite(payload_size=1000) as site:
+        link = HttpLinkResolver(site.url).resolve(SONG_URL)
+    assert link.download_url == f"{site.url}/dl/{TRACK_ID}.mp3"
+    assert link.title == track_title(TRACK_ID)
+    assert link.artist == track_artist(TRACK_ID)
+    assert link.cover_url == f"{site.url}/cover/{TRACK_ID}.jpg"
+
+
+def test_submits_hidden_fields_the_url_input_and_the_send_button():
+    resolver = resolver_for({
+        ("GET", ""): FakeResponse(HOME, cookies=["session=s1; Path=/"]),
+        ("POST", "action"): FakeResponse(RESULT),
+        ("POST", "action/track"): FakeResponse(LINK),
+    })
+    link = resolver.resolve(SONG_URL)
+
+    _, _, search, headers = resolver.http.requests[1]
+    assert search == {"token": ["abc"], "link": [SONG_URL], "go": ["1"]}
+    assert headers["Cookie"] == "session=s1"
+    assert resolver.http.requests[2][2] == {"data": ["xyz"]}
+    assert link.download_url == "https://site.test/dl/song.mp3"
+    assert (link.title, link.artist) == ("Águas de Março", "Elis & Tom")
+    assert link.cover_url == "https://site.test/cover.jpg"
+
+
+def test_unwraps_json_responses():
+    resolver = resolver_for({
+        ("GET", ""): FakeResponse(HOME),
+        ("POST", "action"): FakeResponse(json.dumps({"status": "ok", "data": RESULT + LINK}), "application/json"),
+    })
+    link = resolver.resolve(SONG_URL)
+    assert link.download_url == "https://site.test/dl/song.mp3"
+    assert len(resolver.http.requests) == 2
+
+
+def test_reports_json_errors():
+    resolver = resolver_for({
+        ("GET", ""): FakeResponse(HOME),
+        ("POST", "action"): FakeResponse(json.dumps({"error": True, "message": "Track not found"}),
+                                         "application/json"),
+    })
+    with pytest.raises(ResolveError, match="Track not found"):
+        resolver.resolve(SONG_URL)
+
+
+def test_fails_when_the_download_button_is_missing():
+    resolver = resolver_for({
+        ("GET", ""): FakeResponse(HOME),
+        ("POST", "action"): FakeResponse("<h3>Title</h3><p>Artist</p>"),
+    })
+    with pytest.raises(ResolveError, match="Download MP3 button not found"):
+        resolver.resolve(SONG_URL)
+
+
+def test_downloader_falls_back_to_the_browser_when_the_button_is_missing(tmp_path):
+    class BrowserlessDownloader(Downloader):
+        def _resolve_in_browser(self, song_url):
+            return "https://site.test/from-browser.mp3"
+
+    updates = []
+    downloader = BrowserlessDownloader(str(tmp_path), progress_callback=updates.append, site_url="https://site.test")
+    downloader.resolver = resolver_for({
+        ("GET", ""): FakeResponse(HOME),
+        ("POST", "action"): FakeResponse("<h3>Title</h3><p>Artist</p>"),
+    })
+    assert downloader._resolve(SONG_URL, None) == "https://site.test/from-browser.mp3"
+    assert any(update["status"] == "warning" and "using browser" in update["message"] for update in updates)
@@ -0,0 +1,22 @@
+import threading
+from scheduler import JobQueue, PRIORITY_INTERACTIVE
+
+
+def test_close_drains_pending_items_by_default():
+    queue = JobQueue()
+    queue.put("a")
+    queue.put("b", PRIORITY_INTERACTIVE)
+    queue.close()
+    assert [queue.get(), queue.get(), queue.get()] == ["b", "a", None]
+
+
+def test_close_with_discard_drops_pending_items():
+    queue = JobQueue()
+    queue.put("a")
+    queue.put("b")
+    queue.close(discard=True)
+    assert queue.get() is None
+    joined = threading.Thread(target=queue.join)
+    joined.start()
+    joined.join(1)
+    assert not joined.is_alive()
@@ -0,0 +1,42 @@
+import time
+import pytest
+from selenium.common import TimeoutException
+from downloader import Downloader
+from metrics import MetricsRegistry
+from timeouts import AdaptiveTimeouts
+
+
+class FakeDriverDownloader(Downloader):
+    driver = object()
+
+
+def fast_timeouts(**options) -> AdaptiveTimeouts:
+    registry = MetricsRegistry()
+    for _ in range(5):
+        registry.record("page", 0.001)
+    return AdaptiveTimeouts(registry=registry, floor=0.05, **options)
+
+
+def test_timeouts_widen_the_wait_and_successes_narrow_it():
+    timeouts = fast_timeouts(max_backoff=4.0)
+    assert timeouts.stage_wait("page", 1.0) == 0.05
+    timeouts.observe_timeout("page")
+    assert timeouts.stage_wait("page", 1.0) == 0.1
+    for _ in range(5):
+        timeouts.observe_timeout("page")
+    assert timeouts.stage_wait("page", 1.0) == 0.2
+    timeouts.observe_success("page")
+    timeouts.observe_success("page")
+    assert timeouts.stage_wait("page", 1.0) == 0.05
+
+
+def test_wait_retries_once_at_the_ceiling_before_failing(tmp_path):
+    timeouts = fast_timeouts(ceiling_factor=1.5)
+    downloader = FakeDriverDownloader(str(tmp_path), timeouts=timeouts, use_http_resolver=False)
+    ready_at = time.monotonic() + 0.1
+    assert downloader._wait_for("page", lambda driver: time.monotonic() > ready_at, default=1.0)
+    assert timeouts.stage_wait("page", 1.0) == 0.05
+
+    with pytest.raises(TimeoutException):
+        downloader._wait_for("page", lambda driver: False, default=1.0)
+    assert timeouts.stage_wait("page", 1.0) == 0.1
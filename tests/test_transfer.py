@@ -0,0 +1,29 @@
+import os
+import threading
+from benchmarks.stub_site import StubSite
+from transfer import HttpTransfer
+
+SIZE = 200_000
+
+
+def test_concurrent_transfers_of_one_track_keep_separate_files(tmp_path):
+    results, errors = [], []
+
+    def fetch(url, part_name):
+        try:
+            results.append(HttpTransfer().download(url, str(tmp_path), part_name))
+        except Exception as e:
+            errors.append(e)
+
+    with StubSite(payload_size=SIZE, bytes_per_second=2_000_000) as site:
+        url = f"{site.url}/dl/4uLU6hMCjMI75M1A2tKUQX.mp3"
+        threads = [threading.Thread(target=fetch, args=(url, f"4uLU6hMCjMI75M1A2tKUQX.job-{n}")) for n in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert len(set(results)) == 2
+    assert all(os.path.getsize(path) == SIZE for path in results)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".part")]
@@ -0,0 +1,37 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+
+def import_without_inotify(monkeypatch):
+    monkeypatch.delattr(os, "O_NONBLOCK", raising=False)
+    monkeypatch.setattr(sys, "platform", "win32")
+    monkeypatch.delitem(sys.modules, "watcher", raising=False)
+    return importlib.import_module("watcher")
+
+
+def test_imports_without_inotify(monkeypatch):
+    watcher = import_without_inotify(monkeypatch)
+    assert watcher.IN_NONBLOCK == 0
+    assert not watcher.DownloadWatcher(".").use_inotify
+
+
+def test_polling_fallback_follows_the_rename(monkeypatch, tmp_path):
+    watcher = import_without_inotify(monkeypatch)
+    temp = tmp_path / "Song.mp3.crdownload"
+
+    def browser_download():
+        time.sleep(0.1)
+        temp.write_bytes(b"partial")
+        time.sleep(0.2)
+        os.replace(temp, tmp_path / "Song.mp3")
+
+    with watcher.DownloadWatcher(str(tmp_path), poll_interval=0.05) as download:
+        assert not download.using_inotify
+        thread = threading.Thread(target=browser_download)
+        thread.start()
+        assert download.wait(5)
+        thread.join()
+        assert download.completed_path == str(tmp_path / "Song.mp3")
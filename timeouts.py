@@ -0,0 +1,80 @@
+import threading
+from typing import Optional, Dict
+from metrics import MetricsRegistry, metrics
+
+STAGE_WAIT = 5.0
+
+
+class AdaptiveTimeouts:
+    def __init__(self,
+                 registry: MetricsRegistry = metrics,
+                 quantile: float = 0.99,
+                 headroom: float = 2.0,
+                 min_samples: int = 5,
+                 floor: float = 1.0,
+                 ceiling_factor: float = 3.0,
+                 max_backoff: float = 8.0,
+                 transfer_base: float = 15.0,
+                 stall_timeout: float = 30.0,
+                 min_throughput: float = 32e3,
+                 smoothing: float = 0.3):
+        self.registry = registry
+        self.quantile = quantile
+        self.headroom = headroom
+        self.min_samples = min_samples
+        self.floor = floor
+        self.ceiling_factor = ceiling_factor
+        self.max_backoff = max_backoff
+        self.transfer_base = transfer_base
+        self.stall_timeout = stall_timeout
+        self.min_throughput = min_throughput
+        self.smoothing = smoothing
+        self.throughput: Optional[float] = None
+        self._backoff: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def stage_wait(self, stage: str, default: float = STAGE_WAIT) -> float:
+        if self.registry.count(stage) < self.min_samples:
+            return default
+        observed = self.registry.percentile(stage, self.quantile)
+        if observed is None:
+            return default
+        with self._lock:
+            backoff = self._backoff.get(stage, 1.0)
+        return min(max(observed * self.headroom, self.floor) * backoff, self.retry_wait(default))
+
+    def retry_wait(self, default: float = STAGE_WAIT) -> float:
+        return default * self.ceiling_factor
+
+    def observe_timeout(self, stage: str):
+        with self._lock:
+            self._backoff[stage] = min(self._backoff.get(stage, 1.0) * 2, self.max_backoff)
+
+    def observe_success(self, stage: str):
+        with self._lock:
+            backoff = self._backoff.get(stage, 1.0) / 2
+            if backoff > 1.0:
+                self._backoff[stage] = backoff
+            else:
+                self._backoff.pop(stage, None)
+
+    def observe_throughput(self, size: Optional[int], seconds: Optional[float]):
+        if not size or not seconds or seconds <= 0:
+            return
+        rate = size / seconds
+        with self._lock:
+            if self.throughput is None:
+                self.throughput = rate
+            else:
+                self.throughput += self.smoothing * (rate - self.throughput)
+
+    def transfer_timeout(self, size: Optional[int]) -> float:
+        if not size:
+            return self.transfer_base + self.stall_timeout
+        with self._lock:
+            observed = self.throughput
+        rate = max((observed or self.min_throughput) / self.headroom, self.min_throughput)
+        return self.transfer_base + size / rate
+
+
+adaptive_timeouts = AdaptiveTimeouts()
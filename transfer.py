@@ -0,0 +1,166 @@
+import os
+import re
+import threading
+import time
+from typing import Optional, Callable, Dict, Tuple
+from urllib.parse import urlparse, unquote
+import urllib3
+
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+_shared_pool = None
+_rename_lock = threading.Lock()
+
+
+def shared_pool_manager() -> urllib3.PoolManager:
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = urllib3.PoolManager(
+            num_pools=4,
+            maxsize=8,
+            block=False,
+            retries=urllib3.Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504)),
+        )
+    return _shared_pool
+
+
+class TransferError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def filename_from_headers(headers, url: str) -> Optional[str]:
+    disposition = headers.get("Content-Disposition", "")
+    match = re.search(r"filename\*\s*=\s*[^']*''([^;]+)", disposition, re.IGNORECASE)
+    if match:
+        return unquote(match.group(1).strip().strip('"'))
+    match = re.search(r'filename\s*=\s*"?([^";]+)"?', disposition, re.IGNORECASE)
+    if match:
+        return match.group(1).strip()
+    name = os.path.basename(unquote(urlparse(url).path))
+    return name or None
+
+
+def safe_filename(name: str) -> str:
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .")
+    return name or "download.mp3"
+
+
+def unique_path(directory: str, name: str) -> str:
+    path = os.path.join(directory, name)
+    stem, ext = os.path.splitext(name)
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{stem} ({counter}){ext}")
+        counter += 1
+    return path
+
+
+def move_to_unique_path(source_path: str, directory: str, name: str,
+                        before_move: Optional[Callable[[str], None]] = None) -> str:
+    with _rename_lock:
+        target = unique_path(directory, name)
+        if before_move is not None:
+            before_move(target)
+        os.replace(source_path, target)
+    return target
+
+
+class HttpTransfer:
+    def __init__(self,
+                 http: Optional[urllib3.PoolManager] = None,
+                 chunk_size: int = CHUNK_SIZE,
+                 connect_timeout: float = 10.0,
+                 read_timeout: float = 30.0):
+        self.http = http if http is not None else shared_pool_manager()
+        self.chunk_size = chunk_size
+        self.timeout = urllib3.Timeout(connect=connect_timeout, read=read_timeout)
+        self.total_size: Optional[int] = None
+
+    def probe(self, url: str, headers: Optional[Dict[str, str]] = None) -> Tuple[int, Optional[int]]:
+        request_headers = dict(headers or {}, Range="bytes=0-0")
+        response = self.http.request("GET", url,
+                                     headers=request_headers,
+                                     preload_content=False,
+                                     timeout=self.timeout)
+        try:
+            if response.status == 206:
+                return response.status, self._total_from_content_range(response.headers)
+            length = response.headers.get("Content-Length")
+            return response.status, int(length) if length and length.isdigit() else None
+        finally:
+            response.release_conn()
+
+    def download(self,
+                 url: str,
+                 directory: str,
+                 part_name: str,
+                 headers: Optional[Dict[str, str]] = None,
+                 progress_callback: Optional[Callable[[int, Optional[int], float], None]] = None,
+                 throttle: Optional[Callable[[int], None]] = None) -> str:
+        part_path = os.path.join(directory, part_name + PART_SUFFIX)
+        resume_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+        request_headers = dict(headers or {})
+        if resume_from:
+            request_headers["Range"] = f"bytes={resume_from}-"
+
+        response = self.http.request("GET", url,
+                                     headers=request_headers,
+                                     preload_content=False,
+                                     timeout=self.timeout)
+        try:
+            if response.status == 416 and resume_from:
+                total = self._total_from_content_range(response.headers)
+                if total != resume_from:
+                    os.remove(part_path)
+                    raise TransferError("Partial file does not match the remote file", response.status)
+                self.total_size = total
+                return self._complete(part_path, directory, response.headers, url)
+
+            if response.status >= 400:
+                raise TransferError(f"HTTP {response.status} while downloading", response.status)
+
+            if response.status == 206:
+                mode = "ab"
+                done = resume_from
+                self.total_size = self._total_from_content_range(response.headers)
+            else:
+                mode = "wb"
+                done = 0
+                length = response.headers.get("Content-Length")
+                self.total_size = int(length) if length and length.isdigit() else None
+
+            start_time = time.monotonic()
+            start_bytes = done
+            with open(part_path, mode) as f:
+                for chunk in response.stream(self.chunk_size):
+                    f.write(chunk)
+                    done += len(chunk)
+                    if throttle:
+                        throttle(len(chunk))
+                    if progress_callback:
+                        elapsed = time.monotonic() - start_time
+                        speed = (done - start_bytes) / elapsed if elapsed > 0 else 0.0
+                        progress_callback(done, self.total_size, speed)
+
+            if self.total_size is not None and done < self.total_size:
+                raise TransferError(f"Connection closed after {done} of {self.total_size} bytes")
+
+            return self._complete(part_path, directory, response.headers, url)
+        finally:
+            response.release_conn()
+
+    @staticmethod
+    def _total_from_content_range(headers) -> Optional[int]:
+        match = re.search(r"/(\d+)\s*$", headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def _complete(part_path: str, directory: str, headers, url: str) -> str:
+        name = safe_filename(filename_from_headers(headers, url) or os.path.basename(part_path)[:-len(PART_SUFFIX)])
+        if not name.lower().endswith(".mp3"):
+            name += ".mp3"
+        return move_to_unique_path(part_path, directory, name)
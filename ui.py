@@ -1,19 +1,21 @@
 import os
-import re
 import threading
 from pathlib import Path
 import customtkinter as ctk
 from tkinter import filedialog
-from downloader import Downloader
-from history import load_history
-
-
-def is_valid_spotify_track_url(url: str) -> bool:
-    pattern = (
-        r'^(https://open\.spotify\.com/(?:intl-[a-z]{2}/)?track/|'
-        r'spotify:track:)([A-Za-z0-9]+)(\?.*)?$'
-    )
-    return re.match(pattern, url) is not None
+from batch import DownloadQueue, parse_url_list, read_url_file
+from downloader import Downloader, TRANSFER_HTTP
+from driver_pool import DriverPool, MultiplexedDriverPool, LitePageProfile
+from governor import BrowserGovernor
+from history import history_page, flush_history, prepare_history_search
+from history_view import HistoryListView
+from journal import JobJournal, JournalError
+from pipeline import PipelinedDownloadQueue
+from metrics import metrics
+from progress_bus import ProgressBus
+from resolver import SITE_URL
+from scheduler import transfer_scheduler, PRIORITY_INTERACTIVE, PRIORITY_BULK, HOST_CONCURRENCY
+from spotify_url import is_valid_spotify_url, is_valid_spotify_collection_url
 
 
 class SpotifyDownloaderApp(ctk.CTk):
@@ -43,6 +45,27 @@ class SpotifyDownloaderApp(ctk.CTk):
     BTN_WIDTH = 120
     BTN_HEIGHT = 40
 
+    WORKERS = 2
+    RESOLVE_WORKERS = 1
+    PIPELINE = True
+    JOURNAL = True
+    INTERACTIVE_WORKERS = 1
+    POOL_SIZE = WORKERS + INTERACTIVE_WORKERS
+    POOL_IDLE_TIMEOUT = 300.0
+    POOL_MAX_JOBS_PER_DRIVER = 25
+    MAX_BROWSER_RSS = 1_500_000_000
+    TRANSFER_MODE = TRANSFER_HTTP
+    BANDWIDTH_LIMIT = None
+    HOST_CONNECTIONS = HOST_CONCURRENCY
+    PROGRESS_FRAME_MS = 50
+    METRICS_FILE = "download_metrics.jsonl"
+    STATS_PORT = None
+    PREWARM_ON_STARTUP = True
+    PREWARM_ON_TYPING = True
+    LITE_PAGE = True
+    BROWSER_TABS = True
+    LITE_EXTRA_HOSTS = ()
+
     def __init__(self, default_download_dir: str):
         super().__init__()
 
@@ -52,15 +75,62 @@ class SpotifyDownloaderApp(ctk.CTk):
         self.url_entry = None
         self.download_button = None
         self.history_button = None
+        self.import_button = None
         self.status_label = None
         self.progress_bar = None
         self.detail_label = None
         self.download_frame = None
         self.history_frame = None
-        self.history_list = None
+        self.history_view = None
         self.back_button = None
 
         self.download_dir = Path(default_download_dir)
+        self._prewarm_thread = None
+        metrics.open_sink(self.METRICS_FILE)
+        if self.STATS_PORT:
+            metrics.serve(self.STATS_PORT)
+        self.journal = None
+        self._journal_error = None
+        if self.JOURNAL:
+            try:
+                self.journal = JobJournal()
+            except JournalError as e:
+                self._journal_error = str(e)
+        self.progress_bus = ProgressBus()
+        self.progress_subscription = self.progress_bus.subscribe()
+        self.governor = BrowserGovernor(max_rss=self.MAX_BROWSER_RSS)
+        transfer_scheduler.set_bandwidth(self.BANDWIDTH_LIMIT)
+        transfer_scheduler.set_host_limit(self.HOST_CONNECTIONS)
+        if self.BROWSER_TABS:
+            self.driver_pool = MultiplexedDriverPool(max_tabs=self.POOL_SIZE,
+                                                     idle_timeout=self.POOL_IDLE_TIMEOUT,
+                                                     max_jobs_per_driver=self.POOL_MAX_JOBS_PER_DRIVER,
+                                                     lite=self._lite_profile(),
+                                                     governor=self.governor)
+        else:
+            self.driver_pool = DriverPool(max_size=self.POOL_SIZE,
+                                          idle_timeout=self.POOL_IDLE_TIMEOUT,
+                                          max_jobs_per_driver=self.POOL_MAX_JOBS_PER_DRIVER,
+                                          lite=self._lite_profile(),
+                                          governor=self.governor)
+        metrics.add_reporter("browsers", self.driver_pool.memory_usage)
+        if self.PIPELINE:
+            self.download_queue = PipelinedDownloadQueue(str(self.download_dir),
+                                                         resolve_workers=self.RESOLVE_WORKERS,
+                                                         transfer_workers=self.WORKERS,
+                                                         pool=self.driver_pool,
+                                                         progress_callback=self.progress_bus.publish,
+                                                         transfer_mode=self.TRANSFER_MODE,
+                                                         journal=self.journal,
+                                                         interactive_workers=self.INTERACTIVE_WORKERS)
+        else:
+            self.download_queue = DownloadQueue(str(self.download_dir),
+                                                workers=self.WORKERS,
+                                                pool=self.driver_pool,
+                                                progress_callback=self.progress_bus.publish,
+                                                transfer_mode=self.TRANSFER_MODE,
+                                                journal=self.journal,
+                                                interactive_workers=self.INTERACTIVE_WORKERS)
 
         self.title("Spotify Song Downloader")
         self.geometry("700x520")
@@ -82,6 +152,12 @@ class SpotifyDownloaderApp(ctk.CTk):
         self.create_status_frame()
         self.create_history_frame()
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.after(self.PROGRESS_FRAME_MS, self._pump_progress)
+        if self.PREWARM_ON_STARTUP:
+            self.after_idle(self.prewarm)
+        self.after_idle(self.resume_jobs)
+
     def create_title_frame(self):
         frame = ctk.CTkFrame(self, fg_color="transparent")
         frame.grid(row=0, column=0, columnspan=2, sticky="ew",
@@ -146,7 +222,7 @@ class SpotifyDownloaderApp(ctk.CTk):
         url_container.grid_columnconfigure(0, weight=1)
 
         url_label = ctk.CTkLabel(url_container,
-                                 text="Spotify Track URL",
+                                 text="Spotify Track URLs",
                                  font=ctk.CTkFont(size=14, weight="bold"),
                                  text_color=self.COLORS['text_primary'],
                                  anchor="w")
@@ -164,10 +240,12 @@ class SpotifyDownloaderApp(ctk.CTk):
                                       border_color=self.COLORS['border'],
                                       placeholder_text_color=self.COLORS['text_secondary'])
         self.url_entry.grid(row=0, column=0, sticky="ew", padx=(0, 15))
+        if self.PREWARM_ON_TYPING:
+            self.url_entry.bind("<Key>", lambda _event: self.prewarm())
 
         self.download_button = ctk.CTkButton(input_frame,
                                              text="Download",
-                                             command=self.start_download_thread,
+                                             command=self.start_download,
                                              width=self.BTN_WIDTH,
                                              height=45,
                                              fg_color=self.COLORS['primary'],
@@ -176,7 +254,21 @@ class SpotifyDownloaderApp(ctk.CTk):
                                              corner_radius=8)
         self.download_button.grid(row=0, column=1)
 
-        self.history_button = ctk.CTkButton(frame,
+        actions_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        actions_frame.grid(row=1, column=0, pady=(10, self.PADDING_Y))
+
+        self.import_button = ctk.CTkButton(actions_frame,
+                                           text="📄 Import List",
+                                           command=self.import_url_file,
+                                           width=150,
+                                           height=self.BTN_HEIGHT,
+                                           fg_color=self.COLORS['accent'],
+                                           hover_color="#666666",
+                                           font=ctk.CTkFont(size=14, weight="bold"),
+                                           corner_radius=8)
+        self.import_button.grid(row=0, column=0, padx=(0, 10))
+
+        self.history_button = ctk.CTkButton(actions_frame,
                                             text="📋 View History",
                                             command=self.show_history,
                                             width=150,
@@ -185,7 +277,7 @@ class SpotifyDownloaderApp(ctk.CTk):
                                             hover_color="#666666",
                                             font=ctk.CTkFont(size=14, weight="bold"),
                                             corner_radius=8)
-        self.history_button.grid(row=1, column=0, pady=(10, self.PADDING_Y))
+        self.history_button.grid(row=0, column=1)
 
     def create_status_frame(self):
         frame = ctk.CTkFrame(self, fg_color=self.COLORS['card'], corner_radius=12)
@@ -247,10 +339,12 @@ class SpotifyDownloaderApp(ctk.CTk):
                               text_color=self.COLORS['text_primary'])
         header.grid(row=0, column=0, sticky="w")
 
-        self.history_list = ctk.CTkScrollableFrame(self.history_frame,
-                                                   fg_color=self.COLORS['background'],
-                                                   corner_radius=8)
-        self.history_list.grid(row=1, column=0, sticky="nsew", padx=self.PADDING_X, pady=(0, 10))
+        self.history_view = HistoryListView(self.history_frame,
+                                            colors=self.COLORS,
+                                            loader=self._load_history_page,
+                                            on_open_url=self.open_url,
+                                            on_open_file=self.open_file_location)
+        self.history_view.grid(row=1, column=0, sticky="nsew", padx=self.PADDING_X, pady=(0, 10))
 
         button_frame = ctk.CTkFrame(self.history_frame, fg_color="transparent")
         button_frame.grid(row=2, column=0, sticky="ew", padx=self.PADDING_X, pady=(0, self.PADDING_Y))
@@ -273,6 +367,7 @@ class SpotifyDownloaderApp(ctk.CTk):
         folder = filedialog.askdirectory(initialdir=self.download_dir)
         if folder:
             self.download_dir = Path(folder)
+            self.download_queue.download_directory = str(self.download_dir)
             self.folder_label.configure(text=self._trim_path(self.download_dir))
 
     @staticmethod
@@ -281,12 +376,28 @@ class SpotifyDownloaderApp(ctk.CTk):
         return text if len(text) <= max_len else text[:55] + "…"
 
     def progress_callback(self, info: dict):
-        self.after(0, self._update_ui, info)
+        self.progress_bus.publish(info)
+
+    def _pump_progress(self):
+        updates = self.progress_subscription.drain()
+        if updates:
+            self._update_ui(updates[-1])
+        self.after(self.PROGRESS_FRAME_MS, self._pump_progress)
 
     def _update_ui(self, info: dict):
         msg = info.get('message', '')
         prog = info.get('progress')
         status = info.get('status', 'info')
+        batch = info.get('batch')
+        if batch and batch['total'] > 1:
+            finished = batch['done'] + batch['failed'] + batch['skipped']
+            if finished == batch['total'] and not batch.get('expanding'):
+                msg = (f"Batch finished: {batch['done']} downloaded, "
+                       f"{batch['skipped']} skipped, {batch['failed']} failed")
+                status = 'success' if not batch['failed'] else 'warning'
+            else:
+                msg = f"[{finished}/{batch['total']}] {msg}"
+            prog = batch['progress']
         color = self.COLOR_MAP.get(status, self.COLORS['text_secondary'])
         self.status_label.configure(text=msg, text_color=color)
         if prog is not None:
@@ -297,45 +408,74 @@ class SpotifyDownloaderApp(ctk.CTk):
             self.progress_bar.set(0)
             self.detail_label.configure(text="")
 
-    def start_download_thread(self):
-        self.download_button.configure(state="disabled", text="Downloading...")
-        self.download_button.configure(fg_color=self.COLORS['accent'])
-        threading.Thread(target=self.download_song, daemon=True).start()
-
-    def download_song(self):
-        url = self.url_entry.get().strip()
-        if not url:
+    def _lite_profile(self):
+        if not self.LITE_PAGE:
+            return None
+        return LitePageProfile.for_site(SITE_URL,
+                                        restrict_hosts=self.TRANSFER_MODE == TRANSFER_HTTP,
+                                        extra_hosts=self.LITE_EXTRA_HOSTS)
+
+    def prewarm(self):
+        if self._prewarm_thread is not None and self._prewarm_thread.is_alive():
+            return
+        if self.driver_pool.idle_count or self.download_queue.summary()["running"]:
+            return
+        warmer = Downloader(str(self.download_dir), pool=self.driver_pool)
+        self._prewarm_thread = threading.Thread(target=warmer.warm_up, daemon=True)
+        self._prewarm_thread.start()
+
+    def start_download(self):
+        urls = parse_url_list(self.url_entry.get())
+        if not urls:
             self.progress_callback({'message': "Please enter a URL first!", 'progress': 0, 'status': 'error'})
-            return self._restore_button()
-        if not is_valid_spotify_track_url(url):
-            self.progress_callback({'message': "Invalid Spotify track URL!", 'progress': 0, 'status': 'error'})
-            return self._restore_button()
-
-        downloader = Downloader(str(self.download_dir), progress_callback=self.progress_callback)
+            return
+        priority = PRIORITY_INTERACTIVE if len(urls) == 1 else PRIORITY_BULK
+        if self.queue_urls(urls, priority):
+            self.url_entry.delete(0, "end")
+
+    def import_url_file(self):
+        path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt"), ("All files", "*.*")])
+        if not path:
+            return
         try:
-            downloader.download_from_url(url)
-            downloader.wait_for_download_completion()
-            self.progress_callback(
-                {'message': "Download completed successfully!", 'progress': 1.0, 'status': 'success'})
-        except Exception as e:
-            self.progress_callback({'message': f"Download failed: {e}", 'progress': 0, 'status': 'error'})
-        finally:
-            downloader.close()
-            self._restore_button()
-
-    def _restore_button_state(self):
-        self.download_button.configure(state="normal", text="Download")
-        self.download_button.configure(fg_color=self.COLORS['primary'])
-
-    def _restore_button(self):
-        self.after(0, self._restore_button_state)
-
-    def clear_history_widgets(self):
-        for widget in self.history_list.winfo_children():
-            try:
-                widget.destroy()
-            except:
-                pass
+            urls = read_url_file(path)
+        except (OSError, UnicodeDecodeError) as e:
+            self.progress_callback({'message': f"Could not read file: {e}", 'progress': 0, 'status': 'error'})
+            return
+        if not urls:
+            self.progress_callback({'message': "No URLs found in file", 'progress': 0, 'status': 'warning'})
+            return
+        self.queue_urls(urls)
+
+    def queue_urls(self, urls: list, priority: int = PRIORITY_BULK) -> bool:
+        invalid = [url for url in urls if not is_valid_spotify_url(url)]
+        if invalid:
+            self.progress_callback({'message': f"Invalid Spotify track, album or playlist URL: {invalid[0]}",
+                                    'progress': 0, 'status': 'error'})
+            return False
+
+        summary = self.download_queue.summary()
+        if not summary['queued'] and not summary['running'] and not summary['expanding']:
+            self.download_queue.clear_finished()
+        for url in urls:
+            if is_valid_spotify_collection_url(url):
+                self.download_queue.expand(url, str(self.download_dir))
+            else:
+                self.download_queue.submit(url, str(self.download_dir), priority=priority)
+        return True
+
+    def resume_jobs(self):
+        if self._journal_error:
+            self.progress_callback({'message': f"{self._journal_error}; downloads will not be resumed after a crash",
+                                    'progress': 0, 'status': 'warning'})
+            return
+        jobs = self.download_queue.resume()
+        expansions = self.download_queue.expansions
+        if jobs or expansions:
+            message = f"Resuming {len(jobs)} unfinished download(s)"
+            if expansions:
+                message += f" and {len(expansions)} playlist(s) or album(s)"
+            self.progress_callback({'message': message, 'progress': 0, 'status': 'info'})
 
     def open_url(self, url):
         try:
@@ -358,104 +498,35 @@ class SpotifyDownloaderApp(ctk.CTk):
         except Exception:
             pass
 
-    def show_history(self):
+    @staticmethod
+    def _load_history_page(offset: int, limit: int, query: str):
         try:
-            history = load_history()
+            return history_page(offset, limit, query)
         except Exception:
-            history = []
-
-        self.clear_history_widgets()
-
-        if not history:
-            empty_frame = ctk.CTkFrame(self.history_list, fg_color=self.COLORS['card'], corner_radius=10)
-            empty_frame.pack(fill="x", pady=20, padx=10)
-
-            empty_icon = ctk.CTkLabel(empty_frame, text="📭", font=ctk.CTkFont(size=40))
-            empty_icon.pack(pady=(20, 10))
-
-            empty_label = ctk.CTkLabel(empty_frame,
-                                       text="No downloads yet",
-                                       font=ctk.CTkFont(size=16, weight="bold"),
-                                       text_color=self.COLORS['text_secondary'])
-            empty_label.pack(pady=(0, 20))
-        else:
-            for i, entry in enumerate(history):
-                if not isinstance(entry, dict):
-                    continue
-
-                card = ctk.CTkFrame(self.history_list,
-                                    fg_color=self.COLORS['card'],
-                                    corner_radius=10,
-                                    border_width=1,
-                                    border_color=self.COLORS['border'])
-                card.pack(fill="x", pady=(0, 12), padx=10)
-
-                main_frame = ctk.CTkFrame(card, fg_color="transparent")
-                main_frame.pack(fill="x", padx=15, pady=15)
-                main_frame.grid_columnconfigure(1, weight=1)
-
-                track_icon = ctk.CTkLabel(main_frame, text="🎵", font=ctk.CTkFont(size=16))
-                track_icon.grid(row=0, column=0, sticky="nw", padx=(0, 10))
-
-                info_frame = ctk.CTkFrame(main_frame, fg_color="transparent")
-                info_frame.grid(row=0, column=1, sticky="ew")
-                info_frame.grid_columnconfigure(0, weight=1)
-
-                title = entry.get("title", "Unknown Title")
-                artist = entry.get("artist", "Unknown Artist")
-                url = entry.get("url", "")
-                file_path = entry.get("file", "")
-
-                header_text = f"{artist} - {title}"
-                if len(header_text) > 60:
-                    header_text = header_text[:57] + "..."
-
-                header = ctk.CTkLabel(info_frame,
-                                      text=header_text,
-                                      font=ctk.CTkFont(size=14, weight="bold"),
-                                      text_color=self.COLORS['text_primary'],
-                                      anchor="w")
-                header.grid(row=0, column=0, sticky="w", pady=(0, 5))
-
-                if url:
-                    display_url = url[:60] + "..." if len(url) > 60 else url
-                    url_label = ctk.CTkLabel(info_frame,
-                                             text=f"🔗 {display_url}",
-                                             font=ctk.CTkFont(size=11),
-                                             text_color=self.COLORS['primary'],
-                                             anchor="w",
-                                             cursor="hand2")
-                    url_label.bind("<Button-1>", lambda e, link=url: self.open_url(link))
-                    url_label.grid(row=1, column=0, sticky="w", pady=(0, 3))
-
-                if file_path and os.path.exists(file_path):
-                    file_name = Path(file_path).name
-                    if len(file_name) > 60:
-                        file_name = file_name[:57] + "..."
-
-                    file_label = ctk.CTkLabel(info_frame,
-                                              text=f"📁 {file_name}",
-                                              font=ctk.CTkFont(size=11),
-                                              text_color=self.COLORS['text_secondary'],
-                                              anchor="w",
-                                              cursor="hand2")
-                    file_label.bind("<Button-1>", lambda e, path=file_path: self.open_file_location(path))
-                    file_label.grid(row=2, column=0, sticky="w")
-                else:
-                    file_label = ctk.CTkLabel(info_frame,
-                                              text="File not found",
-                                              font=ctk.CTkFont(size=11),
-                                              text_color=self.COLORS['error'],
-                                              anchor="w")
-                    file_label.grid(row=2, column=0, sticky="w")
+            return 0, []
 
+    def show_history(self):
         self.download_frame.grid_remove()
         self.history_frame.grid()
+        threading.Thread(target=prepare_history_search, daemon=True).start()
+        self.history_view.refresh()
 
     def hide_history(self):
         self.history_frame.grid_remove()
         self.download_frame.grid()
 
+    def on_close(self):
+        self.progress_subscription.close()
+        self.download_queue.close(wait=False)
+        self.driver_pool.close()
+        self.governor.close(at_exit=True)
+        flush_history()
+        if self.journal is not None:
+            self.journal.close()
+        metrics.stop_server()
+        metrics.close_sink()
+        self.destroy()
+
 
 if __name__ == "__main__":
     default_folder = os.path.expanduser("~/Downloads")
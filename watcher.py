@@ -0,0 +1,238 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Set
+
+TEMP_SUFFIX = ".crdownload"
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = getattr(os, "O_NONBLOCK", 0)
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+_WATCH_MASK = IN_CREATE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+
+_claims: Dict[str, Set[str]] = {}
+_finalized = deque(maxlen=256)
+_claims_lock = threading.Lock()
+
+
+def mark_finalized(directory: str, name: str):
+    with _claims_lock:
+        _finalized.append((os.path.abspath(directory), name))
+
+
+def _claim(directory: str, name: str) -> bool:
+    with _claims_lock:
+        claimed = _claims.setdefault(directory, set())
+        if name in claimed:
+            return False
+        claimed.add(name)
+        return True
+
+
+def _unclaim(directory: str, name: Optional[str]):
+    if name is None:
+        return
+    with _claims_lock:
+        claimed = _claims.get(directory)
+        if claimed is not None:
+            claimed.discard(name)
+            if not claimed:
+                del _claims[directory]
+
+
+def is_temp_file(name: str) -> bool:
+    return name.lower().endswith(TEMP_SUFFIX)
+
+
+def is_mp3_file(name: str) -> bool:
+    return name.lower().endswith(".mp3")
+
+
+class _Inotify:
+    _libc = None
+
+    def __init__(self, directory: str):
+        libc = self._load_libc()
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        wd = libc.inotify_add_watch(self.fd, os.fsencode(directory), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed")
+
+    @classmethod
+    def _load_libc(cls):
+        if cls._libc is None:
+            cls._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        return cls._libc
+
+    def read_events(self, timeout: float):
+        readable, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            _, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            events.append((mask, cookie, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DownloadWatcher:
+    def __init__(self, directory: str, poll_interval: float = 0.5, use_inotify: bool = True):
+        self.directory = os.path.abspath(directory)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and sys.platform.startswith("linux")
+
+        self._inotify: Optional[_Inotify] = None
+        self._baseline: Set[str] = set()
+        self._temp_name: Optional[str] = None
+        self._completed_name: Optional[str] = None
+        self._rename_cookie: Optional[int] = None
+
+    @property
+    def using_inotify(self) -> bool:
+        return self._inotify is not None
+
+    @property
+    def temp_path(self) -> Optional[str]:
+        return os.path.join(self.directory, self._temp_name) if self._temp_name else None
+
+    @property
+    def completed_path(self) -> Optional[str]:
+        return os.path.join(self.directory, self._completed_name) if self._completed_name else None
+
+    def start(self) -> "DownloadWatcher":
+        if self.use_inotify:
+            try:
+                self._inotify = _Inotify(self.directory)
+            except (OSError, AttributeError):
+                self._inotify = None
+        if self._inotify is None:
+            self._baseline = set(self._list_directory())
+        return self
+
+    def temp_size(self) -> Optional[int]:
+        path = self.temp_path
+        if path is None:
+            return None
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return None
+
+    def wait(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while self._completed_name is None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if self._inotify is not None:
+                for mask, cookie, name in self._inotify.read_events(remaining):
+                    self._handle_event(mask, cookie, name)
+            else:
+                self._poll_once()
+                if self._completed_name is None:
+                    time.sleep(min(self.poll_interval, max(deadline - time.monotonic(), 0)))
+        return self._completed_name is not None
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        _unclaim(self.directory, self._temp_name)
+        _unclaim(self.directory, self._completed_name)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _handle_event(self, mask: int, cookie: int, name: str):
+        if mask & IN_MOVED_FROM:
+            if name == self._temp_name:
+                self._rename_cookie = cookie
+            return
+
+        if mask & IN_DELETE:
+            if name == self._temp_name and self._rename_cookie is None:
+                _unclaim(self.directory, self._temp_name)
+                self._temp_name = None
+            return
+
+        if mask & IN_MOVED_TO and self._rename_cookie is not None and cookie == self._rename_cookie:
+            self._rename_cookie = None
+            self._follow_rename(name)
+            return
+
+        if self._temp_name is None and self._completed_name is None:
+            if is_temp_file(name) or mask & IN_CREATE:
+                self._adopt(name)
+
+    def _poll_once(self):
+        if self._temp_name is not None:
+            if os.path.exists(self.temp_path):
+                return
+            final_name = self._temp_name[:-len(TEMP_SUFFIX)]
+            if os.path.exists(os.path.join(self.directory, final_name)):
+                self._follow_rename(final_name)
+                return
+            _unclaim(self.directory, self._temp_name)
+            self._temp_name = None
+
+        new_names = [name for name in self._list_directory() if name not in self._baseline]
+        for name in sorted(new_names, key=is_mp3_file):
+            if self._adopt(name):
+                return
+
+    def _follow_rename(self, name: str):
+        if not _claim(self.directory, name):
+            return
+        _unclaim(self.directory, self._temp_name)
+        if is_temp_file(name):
+            self._temp_name = name
+        else:
+            self._temp_name = None
+            self._completed_name = name
+
+    def _adopt(self, name: str) -> bool:
+        if is_temp_file(name) and _claim(self.directory, name):
+            self._temp_name = name
+            return True
+        if is_mp3_file(name) and not self._was_finalized(name) and _claim(self.directory, name):
+            self._completed_name = name
+            return True
+        return False
+
+    def _was_finalized(self, name: str) -> bool:
+        with _claims_lock:
+            return (self.directory, name) in _finalized
+
+    def _list_directory(self):
+        with os.scandir(self.directory) as entries:
+            return [entry.name for entry in entries if is_temp_file(entry.name) or is_mp3_file(entry.name)]